@@ -0,0 +1,474 @@
+"""
+Сквозной нагрузочный бенчмарк sensors_api
+
+Поднимает локально:
+  - sensors_api (create_app) под gunicorn gthread в отдельном процессе - с PostgreSQL
+    по --database-url или с InMemoryRepository;
+  - замену state_monitoring_api (benchmarks/fake_statemon.py) с задержкой и долей ошибок.
+Заполняет базу датчиками через bulk API, затем по очереди нагружает каждый маршрут
+create_app с заданной параллельностью и выводит JSON отчет: пропускная способность,
+p50/p95/p99 и статусы ответов по маршрутам. Созданные датчики удаляются в конце.
+
+Маршруты нагружаются по отдельности, чтобы задержка одного не зависела от других;
+порядок - чтение, затем запись, поэтому чтения видят одну и ту же базу. Клиенты - потоки
+с requests.Session в этом процессе; задержки включают клиентскую часть, поэтому
+сравнивать имеет смысл прогоны на одной машине с одинаковыми параметрами.
+Остальные настройки приложения (READING_CACHE_TTL, STATE_MONITORING_*, ...) берутся из окружения.
+
+Запуск из apps/sensors_api:
+    python -m benchmarks.bench_load --concurrency 16 --requests 1000 --output after.json
+    python -m benchmarks.bench_load --database-url postgresql://... --baseline before.json
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import platform
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import requests
+from gunicorn.app.base import BaseApplication
+from benchmarks.fake_statemon import create_server
+from benchmarks.memory_repository import InMemoryRepository
+
+
+# Максимальный размер bulk-запроса sensors_api (MAX_BULK_ITEMS)
+SEED_BATCH_SIZE = 1000
+LOCATION_PREFIX = "bench-"
+
+
+class BenchmarkServer(BaseApplication):
+    """gunicorn с настройками из кода вместо gunicorn.conf.py и командной строки"""
+
+    def __init__(self, load_app: Callable[[], Any], options: Dict[str, Any]):
+        self.load_app = load_app
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.load_app()
+
+
+def serve_sensors_api(port: int, workers: int, threads: int, database_url: Optional[str], statemon_url: str) -> None:
+    """Процесс sensors_api (с InMemoryRepository, если database_url не задан)"""
+    # Повторы запросов к state_monitoring_api при внедренных ошибках логируются как WARNING
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.environ["STATE_MONITORING_API_URL"] = statemon_url
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    os.environ["GUNICORN_THREADS"] = str(threads)
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+
+    def load_app():
+        from app import create_app
+        return create_app(None if database_url else InMemoryRepository())
+
+    BenchmarkServer(load_app, {
+        "bind": f"127.0.0.1:{port}",
+        "workers": workers,
+        "threads": threads,
+        "worker_class": "gthread",
+        "keepalive": 5,
+        "loglevel": "warning",
+        "accesslog": None,
+    }).run()
+
+
+def free_port() -> int:
+    """Свободный локальный порт"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    """Дождаться ответа /health"""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if requests.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"sensors_api did not start at {base_url}")
+        time.sleep(0.1)
+
+
+class Context:
+    """Датчики, по которым строятся запросы, и датчики для удаления"""
+
+    def __init__(self, sensor_ids: List[int], locations: List[str], bulk_size: int):
+        self.sensor_ids = sensor_ids
+        self.locations = locations
+        self.bulk_size = bulk_size
+        # ID, созданные маршрутами создания; их используют маршруты удаления
+        self.created: List[int] = []
+        self.created_lock = threading.Lock()
+        self.disposable: List[int] = []
+
+    def sensor_id(self, i: int) -> int:
+        return self.sensor_ids[i * 7919 % len(self.sensor_ids)]
+
+    def location(self, i: int) -> str:
+        return self.locations[i % len(self.locations)]
+
+    def sensor_batch(self, i: int) -> List[int]:
+        return [self.sensor_id(i * self.bulk_size + k) for k in range(self.bulk_size)]
+
+    def add_created(self, ids: List[int]) -> None:
+        with self.created_lock:
+            self.created.extend(ids)
+
+
+def new_sensor(i: int, location: str) -> dict:
+    return {"name": f"bench sensor {i}", "type": "temperature", "location": location, "unit": "°C"}
+
+
+class Scenario(NamedTuple):
+    """Нагрузка на маршрут: имя в отчете, endpoint create_app, ожидаемый статус, запрос по номеру"""
+
+    name: str
+    endpoint: str
+    expected: int
+    build: Callable[[Context, int], Tuple[str, str, Any]]
+    # ID созданных датчиков из ответа (для маршрутов создания)
+    created: Optional[Callable[[Any], List[int]]] = None
+    # Сколько датчиков удаляет один запрос (для маршрутов удаления)
+    deletes: int = 0
+
+
+def scenarios(bulk_size: int, page_size: int) -> List[Scenario]:
+    """Сценарии в порядке запуска: чтение, изменение, создание, удаление"""
+    return [
+        Scenario("GET /health", "health_check", 200, lambda ctx, i: ("GET", "/health", None)),
+        Scenario("GET /health/cache", "cache_stats", 200, lambda ctx, i: ("GET", "/health/cache", None)),
+        Scenario("GET /metrics", "metrics", 200, lambda ctx, i: ("GET", "/metrics", None)),
+        Scenario("GET /api/v1/sensors", "get_sensors", 200,
+                 lambda ctx, i: ("GET", "/api/v1/sensors", None)),
+        Scenario("GET /api/v1/sensors?stream=1", "get_sensors", 200,
+                 lambda ctx, i: ("GET", "/api/v1/sensors?stream=1", None)),
+        Scenario("GET /api/v1/sensors?after_id&limit", "get_sensors", 200,
+                 lambda ctx, i: ("GET", f"/api/v1/sensors?after_id={ctx.sensor_id(i) - 1}&limit={page_size}", None)),
+        Scenario("GET /api/v1/sensors?fields", "get_sensors", 200,
+                 lambda ctx, i: ("GET", f"/api/v1/sensors?after_id={ctx.sensor_id(i) - 1}&limit={page_size}"
+                                        "&fields=id,name,location", None)),
+        Scenario("GET /api/v1/sensors/<id>", "get_sensor_by_id", 200,
+                 lambda ctx, i: ("GET", f"/api/v1/sensors/{ctx.sensor_id(i)}", None)),
+        Scenario("GET /api/v1/sensors/location/<location>", "get_temperature_by_location", 200,
+                 lambda ctx, i: ("GET", f"/api/v1/sensors/location/{ctx.location(i)}", None)),
+        Scenario("GET /api/v1/sensors/location/<location>?all=1", "get_temperature_by_location", 200,
+                 lambda ctx, i: ("GET", f"/api/v1/sensors/location/{ctx.location(i)}?all=1", None)),
+        Scenario("PUT /api/v1/sensors/<id>", "update_sensor", 200,
+                 lambda ctx, i: ("PUT", f"/api/v1/sensors/{ctx.sensor_id(i)}", {"name": f"bench sensor {i}"})),
+        Scenario("PUT /api/v1/sensors/bulk", "update_sensors", 200,
+                 lambda ctx, i: ("PUT", "/api/v1/sensors/bulk",
+                                 [{"id": sensor_id, "name": f"bench sensor {i}"} for sensor_id in ctx.sensor_batch(i)])),
+        Scenario("POST /api/v1/sensors", "create_sensor", 201,
+                 lambda ctx, i: ("POST", "/api/v1/sensors", new_sensor(i, ctx.location(i))),
+                 created=lambda body: [body["id"]]),
+        Scenario("POST /api/v1/sensors/bulk", "create_sensors", 201,
+                 lambda ctx, i: ("POST", "/api/v1/sensors/bulk",
+                                 [new_sensor(i, ctx.location(i * bulk_size + k)) for k in range(bulk_size)]),
+                 created=lambda body: [sensor["id"] for sensor in body["items"]]),
+        Scenario("DELETE /api/v1/sensors/<id>", "delete_sensor", 200,
+                 lambda ctx, i: ("DELETE", f"/api/v1/sensors/{ctx.disposable[i]}", None),
+                 deletes=1),
+        Scenario("DELETE /api/v1/sensors/bulk", "delete_sensors", 200,
+                 lambda ctx, i: ("DELETE", "/api/v1/sensors/bulk", ctx.disposable[i * bulk_size:(i + 1) * bulk_size]),
+                 deletes=bulk_size),
+    ]
+
+
+def check_coverage(selected: List[Scenario]) -> List[str]:
+    """Маршруты create_app, для которых нет сценария"""
+    from app import create_app
+    app = create_app(InMemoryRepository())
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules()} - {"static"}
+    return sorted(endpoints - {scenario.endpoint for scenario in selected})
+
+
+def create_sensors(session: requests.Session, base_url: str, count: int, locations: List[str]) -> List[int]:
+    """Создать count датчиков через bulk API (вне замеров)"""
+    ids = []
+    for start in range(0, count, SEED_BATCH_SIZE):
+        items = [new_sensor(i, locations[i % len(locations)]) for i in range(start, min(count, start + SEED_BATCH_SIZE))]
+        response = session.post(f"{base_url}/api/v1/sensors/bulk", json=items, timeout=60)
+        response.raise_for_status()
+        ids.extend(sensor["id"] for sensor in response.json()["items"])
+    return ids
+
+
+def delete_sensors(session: requests.Session, base_url: str, ids: List[int]) -> None:
+    """Удалить датчики через bulk API (вне замеров)"""
+    for start in range(0, len(ids), SEED_BATCH_SIZE):
+        session.delete(f"{base_url}/api/v1/sensors/bulk", json=ids[start:start + SEED_BATCH_SIZE], timeout=60)
+
+
+def percentile(latencies: List[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу из отсортированного списка"""
+    return latencies[max(0, math.ceil(q * len(latencies)) - 1)]
+
+
+def run_scenario(
+    base_url: str,
+    scenario: Scenario,
+    ctx: Context,
+    requests_count: int,
+    warmup: int,
+    concurrency: int,
+    timeout: float,
+) -> Dict[str, Any]:
+    """
+    Прогон сценария: warmup запросов в одном потоке, затем requests_count запросов
+    в concurrency потоках
+
+    Returns:
+        Результаты маршрута для отчета
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors = 0
+    lock = threading.Lock()
+    counter = itertools.count(warmup)
+    total = warmup + requests_count
+
+    def send(session: requests.Session, i: int) -> Tuple[Optional[int], float]:
+        method, path, body = scenario.build(ctx, i)
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, json=body, timeout=timeout)
+        except requests.RequestException:
+            return None, time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+        if scenario.created and response.status_code == scenario.expected:
+            ctx.add_created(scenario.created(response.json()))
+        return response.status_code, elapsed
+
+    def worker():
+        nonlocal errors
+        local_latencies = []
+        local_statuses = Counter()
+        local_errors = 0
+        with requests.Session() as session:
+            while True:
+                i = next(counter)
+                if i >= total:
+                    break
+                status, elapsed = send(session, i)
+                local_latencies.append(elapsed)
+                local_statuses[str(status) if status else "error"] += 1
+                if status != scenario.expected:
+                    local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+            errors += local_errors
+
+    with requests.Session() as session:
+        for i in range(warmup):
+            send(session, i)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": scenario.endpoint,
+        "requests": len(latencies),
+        "errors": errors,
+        "status": dict(sorted(statuses.items())),
+        "duration_s": round(duration, 3),
+        "rps": round(len(latencies) / duration, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "mean": round(statistics.fmean(latencies) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+    }
+
+
+def compare(report: dict, baseline: dict) -> List[str]:
+    """
+    Сравнение с прошлым отчетом
+
+    Returns:
+        Маршруты, у которых p99 или пропускная способность хуже baseline больше чем на
+        --max-regression процентов (пусто, если порог не задан)
+    """
+    threshold = report["config"]["max_regression"]
+    regressed = []
+    changed = [
+        key for key, value in report["config"].items()
+        if key != "max_regression" and baseline.get("config", {}).get(key) != value
+    ]
+    if changed:
+        print(f"warning: baseline was run with different {', '.join(changed)}", file=sys.stderr)
+    print(f"{'route':<50}{'rps':>21}{'p50 ms':>21}{'p99 ms':>21}", file=sys.stderr)
+    for name, result in report["routes"].items():
+        before = baseline.get("routes", {}).get(name)
+        if before is None:
+            continue
+        changes = {
+            "rps": (before["rps"], result["rps"]),
+            "p50": (before["latency_ms"]["p50"], result["latency_ms"]["p50"]),
+            "p99": (before["latency_ms"]["p99"], result["latency_ms"]["p99"]),
+        }
+        deltas = {key: (new - old) / old * 100 if old else 0.0 for key, (old, new) in changes.items()}
+        columns = "".join(f"{new:>12.1f} {deltas[key]:>+6.1f}%" for key, (_, new) in changes.items())
+        print(f"{name:<50}{columns}", file=sys.stderr)
+        if threshold is not None and (deltas["p99"] > threshold or -deltas["rps"] > threshold):
+            regressed.append(name)
+    return regressed
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark for sensors_api")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"),
+                        help="PostgreSQL URL (default: DATABASE_URL, without it - in-memory repository)")
+    parser.add_argument("--sensors", type=int, default=1000, help="sensors created before the run")
+    parser.add_argument("--locations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads per route")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per route")
+    parser.add_argument("--bulk-size", type=int, default=50, help="items per bulk request")
+    parser.add_argument("--page-size", type=int, default=100, help="limit of paged list requests")
+    parser.add_argument("--routes", help="comma-separated substrings of route names to run")
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per request, seconds")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers (PostgreSQL only)")
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--statemon-latency-ms", type=float, default=0.0)
+    parser.add_argument("--statemon-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--statemon-error-rate", type=float, default=0.0)
+    parser.add_argument("--statemon-error-status", type=int, default=503)
+    parser.add_argument("--statemon-no-batch", action="store_true", help="fake statemon without batch endpoint")
+    parser.add_argument("--output", help="write the JSON report to a file instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare with")
+    parser.add_argument("--max-regression", type=float,
+                        help="exit with status 1 if p99 or rps of a route is worse than baseline by more percent")
+    args = parser.parse_args()
+    if args.workers > 1 and not args.database_url:
+        parser.error("--workers > 1 needs --database-url: every worker would have its own in-memory repository")
+    return args
+
+
+def main():
+    args = parse_args()
+    selected = scenarios(args.bulk_size, args.page_size)
+    if args.routes:
+        patterns = [pattern.strip() for pattern in args.routes.split(",") if pattern.strip()]
+        selected = [scenario for scenario in selected if any(pattern in scenario.name for pattern in patterns)]
+
+    # Серверы - отдельные процессы, чтобы клиентские потоки не делили с ними GIL
+    fork = multiprocessing.get_context("fork")
+    statemon = create_server(
+        latency_ms=args.statemon_latency_ms,
+        jitter_ms=args.statemon_jitter_ms,
+        error_rate=args.statemon_error_rate,
+        error_status=args.statemon_error_status,
+        batch=not args.statemon_no_batch,
+    )
+    statemon_url = f"http://127.0.0.1:{statemon.server_address[1]}"
+    statemon_process = fork.Process(target=statemon.serve_forever, daemon=True)
+    statemon_process.start()
+    statemon.server_close()
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server_process = fork.Process(
+        target=serve_sensors_api,
+        args=(port, args.workers, args.threads, args.database_url, statemon_url),
+        daemon=True,
+    )
+    server_process.start()
+
+    session = requests.Session()
+    ctx = None
+    try:
+        wait_ready(base_url)
+        # После запуска серверов: create_app запускает потоки, а fork из многопоточного процесса небезопасен
+        missing = check_coverage(selected) if not args.routes else []
+        if missing:
+            sys.exit(f"no scenario for routes: {', '.join(missing)}")
+
+        locations = [f"{LOCATION_PREFIX}{k}" for k in range(args.locations)]
+        ctx = Context(create_sensors(session, base_url, args.sensors, locations), locations, args.bulk_size)
+        report = {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "config": {
+                "repository": "postgres" if args.database_url else "memory",
+                "sensors": args.sensors,
+                "locations": args.locations,
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "warmup": args.warmup,
+                "bulk_size": args.bulk_size,
+                "page_size": args.page_size,
+                "workers": args.workers,
+                "threads": args.threads,
+                "statemon_latency_ms": args.statemon_latency_ms,
+                "statemon_jitter_ms": args.statemon_jitter_ms,
+                "statemon_error_rate": args.statemon_error_rate,
+                "statemon_error_status": args.statemon_error_status,
+                "statemon_batch": not args.statemon_no_batch,
+                "max_regression": args.max_regression,
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+            },
+            "routes": {},
+        }
+        for scenario in selected:
+            if scenario.deletes:
+                # Удаляются датчики, созданные маршрутами создания; недостающие создаются заранее
+                needed = (args.warmup + args.requests) * scenario.deletes
+                if len(ctx.created) < needed:
+                    ctx.add_created(create_sensors(session, base_url, needed - len(ctx.created), locations))
+                ctx.disposable, ctx.created = ctx.created[:needed], ctx.created[needed:]
+            print(f"{scenario.name} ...", file=sys.stderr)
+            report["routes"][scenario.name] = run_scenario(
+                base_url, scenario, ctx, args.requests, args.warmup, args.concurrency, args.timeout
+            )
+    finally:
+        if ctx is not None:
+            delete_sensors(session, base_url, ctx.sensor_ids + ctx.created)
+        session.close()
+        server_process.terminate()
+        server_process.join(30)
+        statemon_process.terminate()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressed = compare(report, json.load(f))
+        if regressed:
+            sys.exit(f"regressions over {args.max_regression}%: {', '.join(regressed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Накладные расходы гистограмм этапов
+
+Измеряет стоимость одного наблюдения (STAGES.observe с замером времени и декоратор STAGES.timed)
+и расходы на запрос списка сенсоров: те же замеры, что выполняются при GET /api/v1/sensors
+(версия таблицы и список - ожидание пула и запрос к БД для каждого, state_monitoring_api,
+сборка ответов, кодирование JSON, длительность запроса) вместе со сбором длительностей
+этапов для строки лога запроса. Завершается с ошибкой, если
+расходы на запрос больше бюджета (по умолчанию 6 мкс).
+
+Запуск из apps/sensors_api:
+    python -m benchmarks.bench_metrics [бюджет в мкс]
+"""
+
+import statistics
+import sys
+import time
+from metrics import HistogramFamily, collect_request_stages
+
+
+def measure_ns(fn, number: int = 100000, repeat: int = 5) -> float:
+    """Медиана времени одного вызова в наносекундах"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter_ns() - start) / number)
+    return statistics.median(timings)
+
+
+def main():
+    budget_us = float(sys.argv[1]) if len(sys.argv) > 1 else 6.0
+    stages = HistogramFamily("bench_stage_seconds", "Benchmark", "stage", per_request=True)
+    requests = HistogramFamily("bench_request_seconds", "Benchmark", "endpoint")
+
+    def noop():
+        pass
+
+    def observe():
+        start = time.perf_counter()
+        stages.observe("observe", time.perf_counter() - start)
+
+    timed = stages.timed("timed")(noop)
+
+    def cursor():
+        # Замеры PostgresRepository.get_cursor
+        start = time.perf_counter()
+        acquired = time.perf_counter()
+        stages.observe("db_pool_wait", acquired - start)
+        stages.observe("db_query", time.perf_counter() - acquired)
+
+    statemon = stages.timed("statemon_get_data_many")(noop)
+    build = stages.timed("build_responses")(noop)
+
+    def request():
+        start = time.perf_counter()
+        collect_request_stages()
+        cursor()
+        cursor()
+        statemon()
+        build()
+        encode_start = time.perf_counter()
+        stages.observe("json_encode", time.perf_counter() - encode_start)
+        requests.observe("get_sensors", time.perf_counter() - start)
+
+    def request_baseline():
+        # Те же вызовы функций без замеров
+        noop()
+        noop()
+        noop()
+        noop()
+
+    baseline = measure_ns(noop)
+    print(f"{'observe':<14}{measure_ns(observe) - baseline:>8.0f} ns")
+    print(f"{'@timed':<14}{measure_ns(timed) - baseline:>8.0f} ns")
+
+    per_request_us = (measure_ns(request) - measure_ns(request_baseline)) / 1000
+    print(f"{'per request':<14}{per_request_us:>8.2f} us (budget {budget_us} us)")
+    if per_request_us > budget_us:
+        sys.exit("metrics overhead exceeds budget")
+
+
+if __name__ == '__main__':
+    main()
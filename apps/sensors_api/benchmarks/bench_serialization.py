@@ -0,0 +1,128 @@
+"""
+Бенчмарк сериализации списка сенсоров
+
+Сравнивает прежний путь (словарь строки -> SensorResponse -> model_dump -> стандартный jsonify) с текущим
+(SensorRow -> словари напрямую -> FastJSONProvider) на N строках и проверяет, что тела ответов
+совпадают побайтно, в том числе на строках с не-ASCII символами и нестандартными показаниями.
+
+Запуск из apps/sensors_api:
+    python -m benchmarks.bench_serialization [строк]
+"""
+
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from benchmarks.bench_rows import legacy_row_to_dict
+from json_provider import FastJSONProvider
+from models.schemas import SensorResponse
+from repositories.rows import SensorRow
+from services.helpers import build_sensor_responses
+
+
+def legacy_build_sensor_responses(rows, readings):
+    """Прежняя сборка ответов через словари и pydantic"""
+    result = []
+    for sensor in map(legacy_row_to_dict, rows):
+        data = readings.get(sensor['id'], {})
+        try:
+            result.append(SensorResponse(
+                **sensor,
+                value=data.get('value', None),
+                unit=data.get('unit', None),
+                status=data.get('status', None),
+            ).model_dump())
+        except Exception:
+            continue
+    return result
+
+
+def make_rows(count: int):
+    """Строки в том виде, в котором их возвращает репозиторий, и показания"""
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    sensors, readings = [], {}
+    for sensor_id in range(1, count + 1):
+        created_at = start + timedelta(seconds=sensor_id, microseconds=sensor_id)
+        sensors.append(SensorRow(
+            sensor_id, f"sensor-{sensor_id}", 'temperature', f"room-{sensor_id % 50}",
+            created_at + timedelta(hours=1), created_at,
+        ))
+        if sensor_id % 10:
+            readings[sensor_id] = {'value': 15 + sensor_id % 200 / 10, 'unit': 'C', 'status': 'active'}
+    return sensors, readings
+
+
+def edge_rows():
+    """Строки, на которых быстрый путь должен уступить проверке моделью или стандартному json"""
+    last_updated = datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=3)))
+    created_at = datetime(2024, 1, 1)
+    sensors = [
+        SensorRow(sensor_id, name, 'temperature', location, last_updated, created_at)
+        for sensor_id, name, location in (
+            (1, 'Гостиная', 'Дом'),
+            (2, 'int value', 'x'),
+            (3, 'bad status', 'x'),
+            (4, 'string value', 'x'),
+            (5, 'tiny', 'x'),
+            (6, 'empty unit', 'x'),
+            (7, 'del\x7f', 'x'),
+            (8, '', 'x'),
+        )
+    ]
+    readings = {
+        1: {'value': 21.5, 'unit': '°C', 'status': 'active'},
+        2: {'value': 21, 'unit': 'C', 'status': 'inactive'},
+        3: {'value': 21.5, 'unit': 'C', 'status': 'ACTIVE'},
+        4: {'value': '21.5', 'unit': 'C', 'status': 'error'},
+        5: {'value': 1e-7, 'unit': 'C', 'status': None},
+        6: {'value': 1e20, 'unit': '', 'status': 'maintenance'},
+    }
+    return sensors, readings
+
+
+def measure(fn, repeat: int) -> float:
+    """Медиана времени вызова в миллисекундах"""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    legacy_app = Flask("legacy")
+    legacy_app.json = DefaultJSONProvider(legacy_app)
+    fast_app = Flask("fast")
+    fast_app.json = FastJSONProvider(fast_app)
+
+    def legacy(sensors, readings):
+        return legacy_app.json.response(legacy_build_sensor_responses(sensors, readings)).get_data()
+
+    def fast(sensors, readings):
+        return fast_app.json.response(build_sensor_responses(sensors, readings)).get_data()
+
+    for name, (sensors, readings) in (("edge cases", edge_rows()), (f"{count} rows", make_rows(count))):
+        if legacy(sensors, readings) != fast(sensors, readings):
+            sys.exit(f"{name}: response bodies differ")
+        print(f"{name}: response bodies are byte-identical")
+
+    sensors, readings = make_rows(count)
+    size = len(fast(sensors, readings))
+    results = {
+        "build legacy": measure(lambda: legacy_build_sensor_responses(sensors, readings), 5),
+        "build fast": measure(lambda: build_sensor_responses(sensors, readings), 5),
+        "build+encode legacy": measure(lambda: legacy(sensors, readings), 5),
+        "build+encode fast": measure(lambda: fast(sensors, readings), 5),
+    }
+    print(f"{count} rows, {size} bytes")
+    for name, value in results.items():
+        print(f"{name:<22}{value:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Локальная замена state_monitoring_api для бенчмарков
+
+Отвечает на GET /api/v1/sensor/data?sensor_id= и POST /api/v1/sensor/data/batch так же,
+как state_monitoring_api, с настраиваемой задержкой и долей ошибок.
+
+Отдельный запуск из apps/sensors_api:
+    python -m benchmarks.fake_statemon --port 7676 --latency-ms 5 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def reading(sensor_id: int) -> dict:
+    """Последнее показание датчика (значение зависит только от ID)"""
+    return {
+        "id": sensor_id,
+        "sensor_id": sensor_id,
+        "value": round(15.0 + sensor_id % 150 / 10, 1),
+        "unit": "C",
+        "status": "active",
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+class FakeStateMonitoringHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов; параметры задержки и ошибок - атрибуты сервера"""
+
+    protocol_version = "HTTP/1.1"
+    # Заголовки и тело уходят одной записью: иначе задержанный ACK добавляет ~40 мс к ответу
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: object) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay(self) -> bool:
+        """Задержка ответа; False - вместо ответа отправлена ошибка"""
+        server = self.server
+        latency = server.latency + random.uniform(0.0, server.jitter)
+        if latency > 0:
+            time.sleep(latency)
+        if server.error_rate and random.random() < server.error_rate:
+            self._send(server.error_status, {"error": "injected failure"})
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        sensor_id = parse_qs(url.query).get("sensor_id", [""])[0]
+        if url.path != "/api/v1/sensor/data" or not sensor_id.isdecimal():
+            self._send(404, {"error": "not found"})
+            return
+        if self._delay():
+            self._send(200, reading(int(sensor_id)))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path != "/api/v1/sensor/data/batch" or not self.server.batch:
+            self._send(404, {"error": "not found"})
+            return
+        if self._delay():
+            self._send(200, [reading(sensor_id) for sensor_id in json.loads(body)["sensor_ids"]])
+
+
+def create_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 503,
+    batch: bool = True,
+) -> ThreadingHTTPServer:
+    """
+    Сервер state_monitoring_api (запускается serve_forever)
+
+    Args:
+        host: Адрес
+        port: Порт (0 - свободный порт)
+        latency_ms: Задержка каждого ответа в миллисекундах
+        jitter_ms: Случайная добавка к задержке от 0 до jitter_ms
+        error_rate: Доля ответов с ошибкой
+        error_status: HTTP статус ошибки (502/503/504 клиент повторяет)
+        batch: Поддерживать batch endpoint (без него - 404, как у старой версии)
+    """
+    server = ThreadingHTTPServer((host, port), FakeStateMonitoringHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000
+    server.jitter = jitter_ms / 1000
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.batch = batch
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake state_monitoring_api")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7676)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--no-batch", action="store_true", help="respond 404 to batch requests")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency_ms, args.jitter_ms,
+                           args.error_rate, args.error_status, not args.no_batch)
+    print(f"fake state_monitoring_api on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Репозиторий сенсоров в памяти процесса для бенчмарков без PostgreSQL"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from exceptions import DatabaseError, NotFoundError
+from repositories.queries import SENSOR_COLUMNS, page_query
+from repositories.rows import SensorRow
+
+
+class InMemoryRepository:
+    """
+    Замена PostgresRepository с тем же интерфейсом и семантикой ошибок
+
+    Сенсоры хранятся в словаре по id, рядом - отсортированный список id (для keyset
+    страниц) и id по локациям (как индексы таблицы), поэтому стоимость чтения не растет
+    с числом сенсоров сильнее, чем у PostgreSQL. Все операции под одной блокировкой.
+    Бенчмарк с этим репозиторием измеряет сервис, контроллеры и клиента
+    state_monitoring_api без сети и БД.
+    """
+
+    def __init__(self):
+        self._rows: Dict[int, SensorRow] = {}
+        self._ids: List[int] = []
+        self._by_location: Dict[str, List[int]] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._page_rows: Dict[Tuple[str, ...], Any] = {}
+
+    def _insert(self, data: dict) -> SensorRow:
+        """Добавить строку (id выдаются по возрастанию, как из sequence)"""
+        row = SensorRow(self._next_id, data['name'], data['type'], data['location'],
+                        data['last_updated'], data['created_at'])
+        self._next_id += 1
+        self._rows[row.id] = row
+        self._ids.append(row.id)
+        self._by_location.setdefault(row.location, []).append(row.id)
+        return row
+
+    def _remove(self, sensor_id: int) -> bool:
+        """Удалить строку, если она есть"""
+        row = self._rows.pop(sensor_id, None)
+        if row is None:
+            return False
+        del self._ids[bisect_left(self._ids, sensor_id)]
+        ids = self._by_location[row.location]
+        del ids[bisect_left(ids, sensor_id)]
+        if not ids:
+            del self._by_location[row.location]
+        return True
+
+    def _update(self, sensor_id: int, data: dict, now: datetime) -> Optional[SensorRow]:
+        """Заменить переданные поля строки (None - поле не меняется)"""
+        row = self._rows.get(sensor_id)
+        if row is None:
+            return None
+        fields = {key: data[key] for key in ('name', 'type', 'location') if data.get(key) is not None}
+        updated = row._replace(last_updated=now, **fields)
+        if updated.location != row.location:
+            old = self._by_location[row.location]
+            del old[bisect_left(old, sensor_id)]
+            if not old:
+                del self._by_location[row.location]
+            new = self._by_location.setdefault(updated.location, [])
+            new.insert(bisect_left(new, sensor_id), sensor_id)
+        self._rows[sensor_id] = updated
+        return updated
+
+    def get_sensors(self) -> List[SensorRow]:
+        """Получить все сенсоры"""
+        with self._lock:
+            return list(self._rows.values())
+
+    def get_sensors_version(self) -> Tuple[int, Optional[int], Optional[datetime]]:
+        """(количество сенсоров, max(id), max(last_updated))"""
+        with self._lock:
+            if not self._rows:
+                return 0, None, None
+            return len(self._rows), self._ids[-1], max(row.last_updated for row in self._rows.values())
+
+    def iter_sensors(self, chunk_size: int = 500) -> Iterator[List[SensorRow]]:
+        """Все сенсоры пачками по chunk_size"""
+        rows = self.get_sensors()
+        for start in range(0, len(rows), chunk_size):
+            yield rows[start:start + chunk_size]
+
+    def get_sensors_page(
+        self,
+        after_id: int,
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """Страница сенсоров с id больше after_id (именованные кортежи, если заданы колонки)"""
+        with self._lock:
+            start = bisect_right(self._ids, after_id)
+            rows = [self._rows[sensor_id] for sensor_id in self._ids[start:start + limit]]
+        if not columns:
+            return rows
+        columns = tuple(columns)
+        row_type = self._page_rows.get(columns)
+        if row_type is None:
+            try:
+                page_query(columns)
+            except ValueError as e:
+                raise DatabaseError(str(e))
+            row_type = self._page_rows[columns] = namedtuple('Row', columns)
+        indexes = [SENSOR_COLUMNS.index(column) for column in columns]
+        return [row_type._make([row[index] for index in indexes]) for row in rows]
+
+    def create_sensor(self, data: dict) -> SensorRow:
+        """Создать новый датчик"""
+        with self._lock:
+            return self._insert(data)
+
+    def create_sensors(self, rows: List[dict]) -> List[SensorRow]:
+        """Создать несколько датчиков"""
+        with self._lock:
+            return [self._insert(data) for data in rows]
+
+    def get_sensor_by_id(self, sensor_id: int) -> SensorRow:
+        """Получить датчик по ID (NotFoundError, если его нет)"""
+        row = self._rows.get(sensor_id)
+        if row is None:
+            raise NotFoundError(f"Sensor with id {sensor_id} not found")
+        return row
+
+    def update_sensor(self, sensor_id: int, data: dict) -> SensorRow:
+        """Обновить датчик"""
+        if not any(key in data for key in ('name', 'type', 'location')):
+            raise DatabaseError("No fields to update")
+        with self._lock:
+            row = self._update(sensor_id, data, datetime.now())
+        if row is None:
+            raise NotFoundError(f"Sensor with id {sensor_id} not found")
+        return row
+
+    def update_sensors(self, updates: Dict[int, dict]) -> List[SensorRow]:
+        """Обновить несколько датчиков (не найденные ID отсутствуют в результате)"""
+        now = datetime.now()
+        with self._lock:
+            updated = [self._update(sensor_id, data, now) for sensor_id, data in updates.items()]
+        return sorted((row for row in updated if row is not None), key=lambda row: row.id)
+
+    def get_sensor_by_location(self, location: str) -> SensorRow:
+        """Первый датчик локации (NotFoundError, если в локации нет датчиков)"""
+        with self._lock:
+            ids = self._by_location.get(location)
+            if not ids:
+                raise NotFoundError(f"Sensor with location {location} not found")
+            return self._rows[ids[0]]
+
+    def get_sensors_by_location(self, location: str) -> List[SensorRow]:
+        """Все датчики локации по возрастанию id"""
+        with self._lock:
+            return [self._rows[sensor_id] for sensor_id in self._by_location.get(location, ())]
+
+    def delete_sensor(self, sensor_id: int) -> bool:
+        """Удалить датчик (NotFoundError, если его нет)"""
+        with self._lock:
+            if not self._remove(sensor_id):
+                raise NotFoundError(f"Sensor with id {sensor_id} not found")
+        return True
+
+    def delete_sensors(self, sensor_ids: List[int]) -> List[int]:
+        """Удалить несколько датчиков, вернуть ID удаленных"""
+        with self._lock:
+            return [sensor_id for sensor_id in sensor_ids if self._remove(sensor_id)]
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Пулов подключений нет"""
+        return {}
+
+    def close(self):
+        pass
@@ -0,0 +1,210 @@
+"""Сжатие ответов по Accept-Encoding (zstd, br, gzip)"""
+
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Sequence
+import logging
+
+try:
+    import brotli
+except ImportError:  # без brotli br не предлагается
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # без zstandard zstd не предлагается
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Кодировки в порядке предпочтения сервера (при равном q у клиента выбирается первая)
+DEFAULT_ENCODINGS = ("zstd", "br", "gzip")
+
+# Уровни по умолчанию - быстрые: ответы динамические и сжимаются на каждый запрос
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+
+# Тела меньше порога не сжимаются: выигрыш меньше накладных расходов
+DEFAULT_MIN_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = frozenset({"application/json", "application/x-ndjson"})
+
+
+class _GzipEncoder:
+    """Потоковый gzip: каждый кусок сбрасывается (Z_SYNC_FLUSH), чтобы клиент получал его сразу"""
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    """Потоковый brotli со сбросом после каждого куска"""
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    """Потоковый zstd: каждый кусок завершает блок"""
+
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def _compress_gzip(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+# Кодировка -> (сжатие тела целиком, потоковый кодировщик)
+_CODECS: Dict[str, tuple] = {"gzip": (_compress_gzip, _GzipEncoder)}
+if brotli is not None:
+    _CODECS["br"] = (lambda data, level: brotli.compress(data, quality=level), _BrotliEncoder)
+if zstandard is not None:
+    _CODECS["zstd"] = (lambda data, level: zstandard.ZstdCompressor(level=level).compress(data), _ZstdEncoder)
+
+
+class ResponseCompressor:
+    """
+    Сжатие JSON и NDJSON ответов в кодировке, выбранной по Accept-Encoding
+
+    Обычные ответы сжимаются целиком, если тело не меньше min_size. Потоковые
+    (NDJSON) сжимаются по мере выдачи: каждый кусок кодируется и сбрасывается
+    отдельно, без буферизации всего тела. Ко всем JSON ответам добавляется
+    Vary: Accept-Encoding. Работает с ответами Flask и Quart.
+    """
+
+    def __init__(
+        self,
+        encodings: Sequence[str] = DEFAULT_ENCODINGS,
+        min_size: int = DEFAULT_MIN_SIZE,
+        levels: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Args:
+            encodings: Разрешенные кодировки в порядке предпочтения (пусто - сжатие выключено)
+            min_size: Минимальный размер тела в байтах для сжатия
+            levels: Уровни сжатия по кодировкам (по умолчанию DEFAULT_LEVELS)
+        """
+        unavailable = [encoding for encoding in encodings if encoding not in _CODECS]
+        if unavailable:
+            logger.warning("Compression encodings are not available: %s", ", ".join(unavailable))
+        self.encodings = [encoding for encoding in encodings if encoding in _CODECS]
+        self.min_size = min_size
+        self.levels = {**DEFAULT_LEVELS, **(levels or {})}
+
+    def choose_encoding(self, accept_encodings: Any) -> Optional[str]:
+        """Кодировка для ответа (accept_encodings - request.accept_encodings) или None"""
+        if not self.encodings:
+            return None
+        return accept_encodings.best_match(self.encodings)
+
+    def compress(self, data: bytes, encoding: str) -> bytes:
+        """Сжать тело целиком"""
+        return _CODECS[encoding][0](data, self.levels[encoding])
+
+    def _encoder(self, encoding: str):
+        """Потоковый кодировщик"""
+        return _CODECS[encoding][1](self.levels[encoding])
+
+    @staticmethod
+    def _is_compressible(response: Any) -> bool:
+        """Ответ с телом JSON/NDJSON, еще не сжатый"""
+        return (
+            200 <= response.status_code < 300
+            and response.status_code != 204
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and 'Content-Encoding' not in response.headers
+        )
+
+    def compress_response(self, response: Any, accept_encodings: Any) -> Any:
+        """Сжать ответ Flask (для after_request)"""
+        if not self._is_compressible(response) or response.direct_passthrough:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_stream(
+                response.iter_encoded(), encoding, getattr(response.response, 'close', None)
+            )
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress_stream(
+        self,
+        chunks: Iterable[bytes],
+        encoding: str,
+        close: Optional[Callable[[], None]],
+    ) -> Iterator[bytes]:
+        """Сжатие потока по кускам (close закрывает исходный поток, например курсор БД)"""
+        encoder = self._encoder(encoding)
+        try:
+            for chunk in chunks:
+                data = encoder.compress(chunk)
+                if data:
+                    yield data
+            yield encoder.finish()
+        finally:
+            if close is not None:
+                close()
+
+    async def compress_response_async(self, response: Any, accept_encodings: Any) -> Any:
+        """Сжать ответ Quart (для after_request)"""
+        # Quart импортируется здесь, чтобы Flask приложению он был не нужен
+        from quart.wrappers.response import DataBody, IterableBody
+
+        if not self._is_compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(accept_encodings)
+        if encoding is None:
+            return response
+
+        body = response.response
+        if isinstance(body, IterableBody):
+            response.response = IterableBody(self._compress_stream_async(body, encoding))
+            response.headers.pop('Content-Length', None)
+        elif isinstance(body, DataBody):
+            data = await response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, encoding))
+        else:
+            return response
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    async def _compress_stream_async(self, body: Any, encoding: str) -> AsyncIterator[bytes]:
+        """Асинхронное сжатие потока по кускам (выход из body закрывает исходный генератор)"""
+        encoder = self._encoder(encoding)
+        async with body as chunks:
+            async for chunk in chunks:
+                data = encoder.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+                if data:
+                    yield data
+        yield encoder.finish()
@@ -0,0 +1,235 @@
+"""Асинхронный контроллер (Quart)"""
+
+from quart import jsonify, request, Response, current_app
+from functools import wraps
+from typing import Callable, Any, Tuple, List, Dict
+from services.async_service import AsyncSensorService
+from services.conditional import Validators, is_not_modified
+from metrics import STAGES, REQUESTS, POOL_GAUGES, CONTENT_TYPE, render_metrics, render_stats
+from request_log import annotate
+from services.helpers import DEFAULT_PAGE_SIZE
+from controllers.controller import MAX_JSON_PAYLOAD, MAX_BULK_JSON_PAYLOAD
+from controllers.payload import payload_limit, check_content_length, read_body_async, parse_json_body
+from exceptions import (
+    SensorAPIException,
+    UnsupportedMediaTypeError
+)
+import logging
+logger = logging.getLogger(__name__)
+
+
+def validate_content_type(f: Callable) -> Callable:
+    """Декоратор для проверки Content-Type"""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        if request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
+            content_type = request.headers.get('Content-Type', '')
+            if not content_type.startswith('application/json'):
+                annotate(content_type=content_type)
+                raise UnsupportedMediaTypeError()
+        return await f(*args, **kwargs)
+    return decorated_function
+
+
+def limit_payload_size(max_payload: int) -> Callable:
+    """Декоратор для проверки размера payload с заданным лимитом (как в controller.limit_payload_size)"""
+    def decorator(f: Callable) -> Callable:
+        @wraps(f)
+        async def decorated_function(*args, **kwargs):
+            limit = payload_limit(current_app.config, request.endpoint, max_payload)
+            check_content_length(request.content_length, limit)
+            raw = await read_body_async(request.body, limit)
+            return await f(*args, body=parse_json_body(raw, current_app.json), **kwargs)
+        return decorated_function
+    return decorator
+
+
+validate_payload_size = limit_payload_size(MAX_JSON_PAYLOAD)
+validate_bulk_payload_size = limit_payload_size(MAX_BULK_JSON_PAYLOAD)
+
+
+def error_handler(f: Callable) -> Callable:
+    """Централизованная обработка ошибок"""
+    @wraps(f)
+    async def decorated_function(*args, **kwargs):
+        try:
+            return await f(*args, **kwargs)
+        except SensorAPIException as e:
+            # Ошибки клиента попадают в итоговую строку запроса, ошибки сервера - в отдельную запись
+            annotate(error=e.message)
+            if e.status_code >= 500:
+                logger.error("Sensors API Exception: code: %s message: %s", e.status_code, e.message)
+            return jsonify({
+                "error": e.message,
+                "status_code": e.status_code
+            }), e.status_code
+        except ValueError as e:
+            annotate(error=f"Invalid value: {e}")
+            return jsonify({
+                "error": f"Invalid value: {str(e)}",
+                "status_code": 400
+            }), 400
+        except Exception as e:
+            # Не раскрываем внутренние ошибки клиенту
+            logger.exception("Unhandled error: %s", e)
+            return jsonify({
+                "error": "Internal server error",
+                "status_code": 500
+            }), 500
+    return decorated_function
+
+
+def not_modified(validators: Validators) -> bool:
+    """Есть ли у клиента актуальное представление (If-None-Match / If-Modified-Since)"""
+    return is_not_modified(validators, request.if_none_match, request.if_modified_since)
+
+
+def conditional_response(validators: Validators, body: Any) -> Tuple[Response, int]:
+    """JSON ответ с ETag и Last-Modified или 304 без тела, если body is None"""
+    if body is None:
+        response = Response(b"", status=304)
+        del response.headers['Content-Type']
+    else:
+        response = jsonify(body)
+    response.set_etag(validators.etag, weak=True)
+    if validators.last_modified is not None:
+        response.last_modified = validators.last_modified
+    return response, response.status_code
+
+
+class AsyncSensorController:
+    """Асинхронный контроллер сенсоров: те же маршруты и форматы ответов, что у SensorController"""
+
+    def __init__(self, sensor_service: AsyncSensorService):
+        self.sensor_service = sensor_service
+
+    @error_handler
+    async def get_sensors(self) -> Tuple[Any, int]:
+        """Получить сенсоры (параметры как у SensorController.get_sensors)"""
+        args = request.args
+        if args.get('stream') in ('1', 'true'):
+            return await self._stream_sensors()
+
+        if not any(name in args for name in ('after_id', 'limit', 'fields')):
+            validators, sensors = await self.sensor_service.get_sensors_conditional(not_modified)
+            return conditional_response(validators, sensors)
+
+        fields = args.get('fields')
+        page = await self.sensor_service.get_sensors_page(
+            after_id=int(args.get('after_id', 0)),
+            limit=int(args.get('limit', DEFAULT_PAGE_SIZE)),
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields is not None else None,
+        )
+        return jsonify(page), 200
+
+    async def _stream_sensors(self) -> Tuple[Any, int]:
+        """Отдать все сенсоры потоком NDJSON (одна строка на сенсор)"""
+        chunks = self.sensor_service.iter_sensor_chunks()
+        # Первая пачка читается до ответа, чтобы ошибки БД вернулись обычным кодом ошибки
+        first = await anext(chunks, [])
+        json = current_app.json
+
+        def encode(sensors: List[Dict[str, Any]]) -> str:
+            return ''.join(json.dumps(sensor, separators=(',', ':')) + '\n' for sensor in sensors)
+
+        async def generate():
+            try:
+                yield encode(first)
+                async for chunk in chunks:
+                    yield encode(chunk)
+            except Exception as e:
+                # Заголовки уже отправлены - остается только оборвать поток
+                logger.error("Error while streaming sensors: %s", e)
+            finally:
+                await chunks.aclose()
+
+        return Response(generate(), mimetype='application/x-ndjson'), 200
+
+    @error_handler
+    @validate_content_type
+    @validate_payload_size
+    async def create_sensor(self, body: Any) -> Tuple[Any, int]:
+        """Создать новый датчик"""
+        sensor = await self.sensor_service.create_sensor(body)
+        return jsonify(sensor), 201
+
+    @error_handler
+    async def get_sensor_by_id(self, id: int) -> Tuple[Any, int]:
+        """Получить датчик по ID"""
+        validators, sensor = await self.sensor_service.get_sensor_by_id_conditional(id, not_modified)
+        return conditional_response(validators, sensor)
+
+    @error_handler
+    @validate_content_type
+    @validate_payload_size
+    async def update_sensor(self, id: int, body: Any) -> Tuple[Any, int]:
+        """Обновить датчик"""
+        sensor = await self.sensor_service.update_sensor(id, body)
+        return jsonify(sensor), 200
+
+    @error_handler
+    async def delete_sensor(self, id: int) -> Tuple[Any, int]:
+        """Удалить датчик"""
+        await self.sensor_service.delete_sensor(id)
+        return jsonify({"message": "Sensor deleted successfully"}), 200
+
+    @error_handler
+    @validate_content_type
+    @validate_bulk_payload_size
+    async def create_sensors(self, body: Any) -> Tuple[Any, int]:
+        """Создать несколько датчиков"""
+        result = await self.sensor_service.create_sensors(body)
+        return jsonify(result), 201
+
+    @error_handler
+    @validate_content_type
+    @validate_bulk_payload_size
+    async def update_sensors(self, body: Any) -> Tuple[Any, int]:
+        """Обновить несколько датчиков"""
+        result = await self.sensor_service.update_sensors(body)
+        return jsonify(result), 200
+
+    @error_handler
+    @validate_content_type
+    @validate_bulk_payload_size
+    async def delete_sensors(self, body: Any) -> Tuple[Any, int]:
+        """Удалить несколько датчиков"""
+        result = await self.sensor_service.delete_sensors(body)
+        return jsonify(result), 200
+
+    @error_handler
+    async def get_temperature_by_location(self, location: str) -> Tuple[Any, int]:
+        """Получить данные датчика по локации (с all=1 - всех датчиков локации списком)"""
+        if request.args.get('all') in ('1', 'true'):
+            sensors = await self.sensor_service.get_sensors_by_location(location)
+            return jsonify(sensors), 200
+
+        sensor = await self.sensor_service.get_sensor_by_location(location)
+        if sensor is None:
+            return jsonify({"error": "no sensor found", "status_code": 404}), 400
+        return jsonify(sensor), 200
+
+    @error_handler
+    async def health_check(self) -> Tuple[Any, int]:
+        """Проверка здоровья сервиса"""
+        return jsonify({"status": "healthy"}), 200
+
+    @error_handler
+    async def cache_stats(self) -> Tuple[Any, int]:
+        """Счетчики кэша показаний"""
+        return jsonify(self.sensor_service.get_cache_stats()), 200
+
+    @error_handler
+    async def metrics(self) -> Tuple[Any, int]:
+        """Метрики в формате Prometheus: гистограммы этапов, пулы БД, кэш показаний, индекс локаций"""
+        service = self.sensor_service
+        body = render_metrics(
+            (STAGES, REQUESTS),
+            render_stats("sensors_api_db", "Database connection pool stats",
+                         service.get_pool_stats(), "pool", POOL_GAUGES),
+            render_stats("sensors_api_reading_cache", "Reading cache stats",
+                         {"readings": service.get_cache_stats()}, "cache", ("size", "max_entries")),
+            render_stats("sensors_api_location_index", "Location index stats",
+                         {"locations": service.get_location_index_stats()}, "index", ("locations", "sensors")),
+        )
+        return Response(body, content_type=CONTENT_TYPE), 200
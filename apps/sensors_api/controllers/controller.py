@@ -1,13 +1,15 @@
 """Контроллер"""
 
-from flask import jsonify, request, Request
+from flask import jsonify, request, Request, Response, current_app, stream_with_context
 from functools import wraps
-from typing import Callable, Any, Tuple
-from services.service import SensorService
+from typing import Callable, Any, Tuple, List, Dict
+from services.service import SensorService, DEFAULT_PAGE_SIZE
+from services.conditional import Validators, is_not_modified
+from metrics import STAGES, REQUESTS, POOL_GAUGES, CONTENT_TYPE, render_metrics, render_stats
+from request_log import annotate
+from controllers.payload import payload_limit, check_content_length, read_body, parse_json_body
 from exceptions import (
     SensorAPIException,
-    ValidationError,
-    PayloadTooLargeError,
     UnsupportedMediaTypeError
 )
 import logging
@@ -17,42 +19,44 @@ logger = logging.getLogger(__name__)
 # Лимиты
 MAX_CONTENT_LENGTH = 1024 * 1024  # 1MB
 MAX_JSON_PAYLOAD = 100 * 1024  # 100KB
+MAX_BULK_JSON_PAYLOAD = 5 * 1024 * 1024  # 5MB
 
 
 def validate_content_type(f: Callable) -> Callable:
     """Декоратор для проверки Content-Type"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if request.method in ['POST', 'PUT', 'PATCH']:
+        if request.method in ['POST', 'PUT', 'PATCH', 'DELETE']:
             content_type = request.headers.get('Content-Type', '')
             if not content_type.startswith('application/json'):
-                logger.error(f"Unsupported Media Type: {content_type}")
+                annotate(content_type=content_type)
                 raise UnsupportedMediaTypeError()
         return f(*args, **kwargs)
     return decorated_function
 
 
-def validate_payload_size(f: Callable) -> Callable:
-    """Декоратор для проверки размера payload"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if request.method in ['POST', 'PUT', 'PATCH']:
-            content_length = request.content_length
-            if content_length and content_length > MAX_JSON_PAYLOAD:
-                logger.error(f"Payload too large: {content_length}")
-                raise PayloadTooLargeError(
-                    f"Payload size {content_length} exceeds limit {MAX_JSON_PAYLOAD}"
-                )
-            
-            # Дополнительная проверка после парсинга
-            if request.is_json:
-                data = request.get_json()
-                if data and len(str(data)) > MAX_JSON_PAYLOAD:
-                    logger.error(f"JSON payload too large: {len(str(data))}")
-                    raise PayloadTooLargeError("JSON payload too large")
-        
-        return f(*args, **kwargs)
-    return decorated_function
+def limit_payload_size(max_payload: int) -> Callable:
+    """
+    Декоратор для проверки размера payload с заданным лимитом
+
+    Тело читается из потока с подсчетом байт: запрос отклоняется по Content-Length
+    до чтения или как только прочитано больше лимита. JSON разбирается один раз
+    и передается во view аргументом body. Лимит маршрута можно переопределить
+    в app.config['PAYLOAD_LIMITS'] (имя маршрута -> байты).
+    """
+    def decorator(f: Callable) -> Callable:
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            limit = payload_limit(current_app.config, request.endpoint, max_payload)
+            check_content_length(request.content_length, limit)
+            raw = read_body(request.stream, limit)
+            return f(*args, body=parse_json_body(raw, current_app.json), **kwargs)
+        return decorated_function
+    return decorator
+
+
+validate_payload_size = limit_payload_size(MAX_JSON_PAYLOAD)
+validate_bulk_payload_size = limit_payload_size(MAX_BULK_JSON_PAYLOAD)
 
 
 def error_handler(f: Callable) -> Callable:
@@ -62,21 +66,23 @@ def error_handler(f: Callable) -> Callable:
         try:
             return f(*args, **kwargs)
         except SensorAPIException as e:
-            logger.error(f"Sensors API Exception: code: {e.status_code} message: {e.message}")
+            # Ошибки клиента попадают в итоговую строку запроса, ошибки сервера - в отдельную запись
+            annotate(error=e.message)
+            if e.status_code >= 500:
+                logger.error("Sensors API Exception: code: %s message: %s", e.status_code, e.message)
             return jsonify({
                 "error": e.message,
                 "status_code": e.status_code
             }), e.status_code
         except ValueError as e:
-            logger.error(f"Invalid value: {str(e)}")
+            annotate(error=f"Invalid value: {e}")
             return jsonify({
                 "error": f"Invalid value: {str(e)}",
                 "status_code": 400
             }), 400
         except Exception as e:
             # Не раскрываем внутренние ошибки клиенту
-            logger.error(f"Error: {str(e)}")
-            logger.exception(e)
+            logger.exception("Unhandled error: %s", e)
             return jsonify({
                 "error": "Internal server error",
                 "status_code": 500
@@ -84,6 +90,25 @@ def error_handler(f: Callable) -> Callable:
     return decorated_function
 
 
+def not_modified(validators: Validators) -> bool:
+    """Есть ли у клиента актуальное представление (If-None-Match / If-Modified-Since)"""
+    return is_not_modified(validators, request.if_none_match, request.if_modified_since)
+
+
+def conditional_response(validators: Validators, body: Any) -> Tuple[Response, int]:
+    """JSON ответ с ETag и Last-Modified или 304 без тела, если body is None"""
+    if body is None:
+        response = Response(status=304)
+        del response.headers['Content-Type']
+    else:
+        response = jsonify(body)
+    # Слабый ETag: одинаковый для сжатого и несжатого тела
+    response.set_etag(validators.etag, weak=True)
+    if validators.last_modified is not None:
+        response.last_modified = validators.last_modified
+    return response, response.status_code
+
+
 class SensorController:
     """Контроллер для обработки HTTP запросов сенсоров"""
     
@@ -92,44 +117,71 @@ class SensorController:
     
     @error_handler
     def get_sensors(self) -> Tuple[Any, int]:
-        """Получить все сенсоры"""
-        sensors = self.sensor_service.get_sensors()
-        return jsonify(sensors), 200
+        """
+        Получить сенсоры
+        
+        Без параметров возвращает весь список. С любым из параметров after_id, limit, fields
+        возвращает страницу {"items": [...], "next_cursor": ...}. С stream=1 отдает весь
+        список потоком в формате NDJSON.
+        """
+        args = request.args
+        if args.get('stream') in ('1', 'true'):
+            return self._stream_sensors()
+        
+        if not any(name in args for name in ('after_id', 'limit', 'fields')):
+            validators, sensors = self.sensor_service.get_sensors_conditional(not_modified)
+            return conditional_response(validators, sensors)
+        
+        fields = args.get('fields')
+        page = self.sensor_service.get_sensors_page(
+            after_id=int(args.get('after_id', 0)),
+            limit=int(args.get('limit', DEFAULT_PAGE_SIZE)),
+            fields=[field.strip() for field in fields.split(',') if field.strip()] if fields is not None else None,
+        )
+        return jsonify(page), 200
+    
+    def _stream_sensors(self) -> Tuple[Any, int]:
+        """Отдать все сенсоры потоком NDJSON (одна строка на сенсор)"""
+        chunks = self.sensor_service.iter_sensor_chunks()
+        # Первая пачка читается до ответа, чтобы ошибки БД вернулись обычным кодом ошибки
+        first = next(chunks, [])
+        
+        def encode(sensors: List[Dict[str, Any]]) -> str:
+            return ''.join(current_app.json.dumps(sensor, separators=(',', ':')) + '\n' for sensor in sensors)
+        
+        def generate():
+            try:
+                yield encode(first)
+                for chunk in chunks:
+                    yield encode(chunk)
+            except Exception as e:
+                # Заголовки уже отправлены - остается только оборвать поток
+                logger.error("Error while streaming sensors: %s", e)
+            finally:
+                chunks.close()
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson'), 200
     
     @error_handler
     @validate_content_type
     @validate_payload_size
-    def create_sensor(self) -> Tuple[Any, int]:
-        """Создать новый датй"""
-        if not request.is_json:
-            raise ValidationError("Request body must be JSON")
-        
-        data = request.get_json()
-        if not data:
-            raise ValidationError("Empty request body")
-        
-        sensor = self.sensor_service.create_sensor(data)
+    def create_sensor(self, body: Any) -> Tuple[Any, int]:
+        """Создать новый датчик"""
+        sensor = self.sensor_service.create_sensor(body)
         return jsonify(sensor), 201
     
     @error_handler
     def get_sensor_by_id(self, id: int) -> Tuple[Any, int]:
         """Получить датчик по ID"""
-        sensor = self.sensor_service.get_sensor_by_id(id)
-        return jsonify(sensor), 200
+        validators, sensor = self.sensor_service.get_sensor_by_id_conditional(id, not_modified)
+        return conditional_response(validators, sensor)
     
     @error_handler
     @validate_content_type
     @validate_payload_size
-    def update_sensor(self, id: int) -> Tuple[Any, int]:
+    def update_sensor(self, id: int, body: Any) -> Tuple[Any, int]:
         """Обновить датчик"""
-        if not request.is_json:
-            raise ValidationError("Request body must be JSON")
-        
-        data = request.get_json()
-        if not data:
-            raise ValidationError("Empty request body")
-        
-        sensor = self.sensor_service.update_sensor(id, data)
+        sensor = self.sensor_service.update_sensor(id, body)
         return jsonify(sensor), 200
     
     @error_handler
@@ -138,9 +190,37 @@ class SensorController:
         self.sensor_service.delete_sensor(id)
         return jsonify({"message": "Sensor deleted successfully"}), 200
     
+    @error_handler
+    @validate_content_type
+    @validate_bulk_payload_size
+    def create_sensors(self, body: Any) -> Tuple[Any, int]:
+        """Создать несколько датчиков"""
+        result = self.sensor_service.create_sensors(body)
+        return jsonify(result), 201
+    
+    @error_handler
+    @validate_content_type
+    @validate_bulk_payload_size
+    def update_sensors(self, body: Any) -> Tuple[Any, int]:
+        """Обновить несколько датчиков"""
+        result = self.sensor_service.update_sensors(body)
+        return jsonify(result), 200
+    
+    @error_handler
+    @validate_content_type
+    @validate_bulk_payload_size
+    def delete_sensors(self, body: Any) -> Tuple[Any, int]:
+        """Удалить несколько датчиков"""
+        result = self.sensor_service.delete_sensors(body)
+        return jsonify(result), 200
+    
     @error_handler
     def get_temperature_by_location(self, location: str) -> Tuple[Any, int]:
-        """Получить данные датчика по локации"""
+        """Получить данные датчика по локации (с all=1 - всех датчиков локации списком)"""
+        if request.args.get('all') in ('1', 'true'):
+            sensors = self.sensor_service.get_sensors_by_location(location)
+            return jsonify(sensors), 200
+        
         sensor = self.sensor_service.get_sensor_by_location(location)
         if sensor is None:
             return jsonify({"error": "no sensor found", "status_code": 404}), 400
@@ -149,4 +229,24 @@ class SensorController:
     @error_handler
     def health_check(self) -> Tuple[Any, int]:
         """Проверка здоровья сервиса"""
-        return jsonify({"status": "healthy"}), 200
\ No newline at end of file
+        return jsonify({"status": "healthy"}), 200
+    
+    @error_handler
+    def cache_stats(self) -> Tuple[Any, int]:
+        """Счетчики кэша показаний"""
+        return jsonify(self.sensor_service.get_cache_stats()), 200
+    
+    @error_handler
+    def metrics(self) -> Tuple[Any, int]:
+        """Метрики в формате Prometheus: гистограммы этапов, пулы БД, кэш показаний, индекс локаций"""
+        service = self.sensor_service
+        body = render_metrics(
+            (STAGES, REQUESTS),
+            render_stats("sensors_api_db", "Database connection pool stats",
+                         service.get_pool_stats(), "pool", POOL_GAUGES),
+            render_stats("sensors_api_reading_cache", "Reading cache stats",
+                         {"readings": service.get_cache_stats()}, "cache", ("size", "max_entries")),
+            render_stats("sensors_api_location_index", "Location index stats",
+                         {"locations": service.get_location_index_stats()}, "index", ("locations", "sensors")),
+        )
+        return Response(body, content_type=CONTENT_TYPE), 200
\ No newline at end of file
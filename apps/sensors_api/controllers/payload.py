@@ -0,0 +1,110 @@
+"""Чтение и разбор JSON тела запроса с ограничением размера"""
+
+from typing import Any, Dict, List, Mapping, Optional
+from werkzeug.exceptions import RequestEntityTooLarge
+from exceptions import ValidationError, PayloadTooLargeError
+from request_log import annotate
+
+
+# Размер куска при чтении тела запроса
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def parse_payload_limits(value: str) -> Dict[str, int]:
+    """
+    Лимиты тела запроса по маршрутам из строки вида "create_sensors=10485760,update_sensor=4096"
+
+    Ключ - имя маршрута (endpoint в add_url_rule), значение - лимит в байтах.
+    """
+    limits = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        endpoint, _, limit = item.partition('=')
+        limits[endpoint.strip()] = int(limit)
+    return limits
+
+
+def payload_limit(config: Mapping[str, Any], endpoint: Optional[str], default: int) -> int:
+    """Лимит тела для маршрута: из PAYLOAD_LIMITS конфигурации приложения или по умолчанию"""
+    return config.get('PAYLOAD_LIMITS', {}).get(endpoint, default)
+
+
+def check_content_length(content_length: Optional[int], limit: int) -> None:
+    """Отклонить запрос по Content-Length, не читая тело"""
+    if content_length and content_length > limit:
+        raise PayloadTooLargeError(f"Payload size {content_length} exceeds limit {limit}")
+
+
+class BodyReader:
+    """
+    Накопление тела запроса по кускам со счетчиком байт
+
+    Content-Length может отсутствовать (chunked) или быть неверным, поэтому
+    лимит проверяется по фактически прочитанным байтам.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.size = 0
+        self._chunks: List[bytes] = []
+
+    def remaining(self) -> int:
+        """Сколько байт прочитать, чтобы заметить превышение лимита"""
+        return self.limit + 1 - self.size
+
+    def feed(self, chunk: bytes) -> None:
+        """Добавить кусок; PayloadTooLargeError, как только тело превысило лимит"""
+        self.size += len(chunk)
+        if self.size > self.limit:
+            raise PayloadTooLargeError(f"Payload size exceeds limit {self.limit}")
+        self._chunks.append(chunk)
+
+    def data(self) -> bytes:
+        """Прочитанное тело"""
+        return b''.join(self._chunks)
+
+
+def read_body(stream: Any, limit: int) -> bytes:
+    """Прочитать тело из потока WSGI не больше чем limit байт"""
+    reader = BodyReader(limit)
+    while True:
+        chunk = stream.read(min(READ_CHUNK_SIZE, reader.remaining()))
+        if not chunk:
+            return reader.data()
+        reader.feed(chunk)
+
+
+async def read_body_async(body: Any, limit: int) -> bytes:
+    """Прочитать тело запроса Quart по мере поступления не больше чем limit байт"""
+    reader = BodyReader(limit)
+    try:
+        async for chunk in body:
+            reader.feed(chunk)
+    except RequestEntityTooLarge:
+        # Превышен общий MAX_CONTENT_LENGTH сервера Quart
+        raise PayloadTooLargeError()
+    return reader.data()
+
+
+def parse_json_body(raw: bytes, json: Any) -> Any:
+    """
+    Разобрать JSON тело один раз
+
+    Args:
+        raw: Тело запроса
+        json: JSON провайдер приложения (current_app.json)
+
+    Raises:
+        ValidationError: Тело пустое или не является JSON
+    """
+    if not raw.strip():
+        raise ValidationError("Empty request body")
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        annotate(json_error=str(e))
+        raise ValidationError("Request body must be valid JSON")
+    if not data:
+        raise ValidationError("Empty request body")
+    return data
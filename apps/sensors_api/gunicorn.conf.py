@@ -0,0 +1,38 @@
+"""
+Конфигурация gunicorn для sensors_api
+
+Запуск (WSGI, Flask):
+    gunicorn 'app:create_app()'
+Запуск (ASGI, Quart):
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn asgi:app
+
+Количество воркеров задается через WEB_CONCURRENCY (а не -w): по нему же
+app.get_db_pool_limits делит DATABASE_MAX_CONNECTIONS между воркерами.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 8081)}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# Пул подключений к БД создается в воркере при первом запросе, поэтому preload безопасен
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") in ("1", "true")
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+
+# Строку на запрос пишет приложение (request_log), access log gunicorn ее дублирует
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# Приложение читает те же значения при расчете размера пула подключений
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["GUNICORN_THREADS"] = str(threads)
@@ -0,0 +1,73 @@
+"""JSON провайдер с быстрым кодированием ответов через orjson"""
+
+import time
+from typing import Any
+from flask.json.provider import DefaultJSONProvider
+from metrics import STAGES
+
+try:
+    import orjson
+except ImportError:  # без orjson ответы кодируются стандартным json
+    orjson = None
+
+# Числа, которые orjson записывает иначе, чем json: экспонента (цифра перед "e" после замены
+# всех цифр на 0) и малые числа вида 0.00001. Совпадение с текстом внутри строки только
+# отправляет кодирование в стандартный json. Поиск подстрок заметно быстрее регулярного выражения
+_DIGITS_TO_ZERO = bytes.maketrans(b'0123456789', b'0000000000')
+
+
+def _numbers_may_differ(out: bytes) -> bool:
+    """Может ли запись чисел orjson отличаться от стандартного json"""
+    return b'0.0000' in out or b'0e' in out.translate(_DIGITS_TO_ZERO)
+
+COMPACT_SEPARATORS = (',', ':')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Побайтно тот же вывод, что у DefaultJSONProvider (sort_keys, ensure_ascii, даты в формате HTTP)
+
+    Компактный JSON кодируется orjson. Если результат мог бы отличаться (не-ASCII символы,
+    экспоненциальная запись чисел, нестроковые ключи, подклассы str/int), объект кодируется
+    стандартным json. Работает и с Flask, и с Quart (Quart использует этот же базовый класс).
+    """
+
+    if orjson is not None:
+        _orjson_options = (
+            orjson.OPT_SORT_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_PASSTHROUGH_SUBCLASS
+        )
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Компактный JSON в байтах"""
+        if orjson is not None:
+            try:
+                out = orjson.dumps(obj, default=self.default, option=self._orjson_options)
+            except (orjson.JSONEncodeError, TypeError):
+                out = None
+            if (
+                out is not None
+                and out.isascii()
+                and b'\x7f' not in out
+                and not _numbers_may_differ(out)
+            ):
+                return out
+        return super().dumps(obj, separators=COMPACT_SEPARATORS).encode()
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        """Сериализация в строку; быстрый путь только для компактного вывода без других параметров"""
+        if kwargs == {'separators': COMPACT_SEPARATORS}:
+            return self.dumps_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        """JSON ответ (в режиме отладки - с отступами, как у DefaultJSONProvider)"""
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        start = time.perf_counter()
+        body = self.dumps_bytes(obj) + b"\n"
+        STAGES.observe("json_encode", time.perf_counter() - start)
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,227 @@
+"""Гистограммы длительности этапов обработки запросов и вывод метрик в формате Prometheus"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+# Границы корзин в секундах: от долей миллисекунды (кодирование, сборка ответа)
+# до секунд (state_monitoring_api с повторами)
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Показатели psycopg_pool.get_stats(), которые отражают текущее состояние, а не накапливаются
+POOL_GAUGES = frozenset({"pool_min", "pool_max", "pool_size", "pool_available", "requests_waiting"})
+
+
+# Длительности этапов текущего запроса (для строки лога запроса), None - не собираются
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def collect_request_stages() -> Dict[str, float]:
+    """
+    Начать сбор длительностей этапов текущего запроса
+
+    Возвращаемый словарь пополняется наблюдениями гистограмм с per_request=True, сделанными
+    в контексте запроса (в потоке запроса или в задачах, созданных из него).
+    """
+    stages: Dict[str, float] = {}
+    _request_stages.set(stages)
+    return stages
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (счетчики по корзинам, сумма и количество)"""
+
+    __slots__ = ("buckets", "counts", "total", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # Последняя ячейка - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Добавить наблюдение"""
+        index = bisect_left(self.buckets, value)
+        # acquire/release вдвое дешевле with; между ними нет кода, который может бросить исключение
+        lock = self._lock
+        lock.acquire()
+        self.counts[index] += 1
+        self.total += value
+        lock.release()
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Накопительные счетчики по корзинам (как le в Prometheus) и сумма"""
+        with self._lock:
+            counts, total = list(self.counts), self.total
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class HistogramFamily:
+    """
+    Гистограммы одной метрики с одной меткой (например, stage)
+
+    Гистограмма для значения метки создается при первом наблюдении.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        per_request: bool = False,
+    ):
+        """
+        Args:
+            name: Имя метрики
+            help: Описание
+            label: Имя метки
+            buckets: Границы корзин в секундах
+            per_request: Суммировать наблюдения и по текущему запросу (collect_request_stages)
+        """
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self.per_request = per_request
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, buckets: Sequence[float]) -> None:
+        """Задать границы корзин (накопленные наблюдения сбрасываются)"""
+        with self._lock:
+            self.buckets = tuple(sorted(buckets))
+            self._histograms = {}
+
+    def _histogram(self, value: str) -> Histogram:
+        """Гистограмма для значения метки"""
+        histogram = self._histograms.get(value)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(value, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, value: str, seconds: float) -> None:
+        """Добавить наблюдение для значения метки (то же, что Histogram.observe, без лишнего вызова)"""
+        histogram = self._histograms.get(value) or self._histogram(value)
+        index = bisect_left(histogram.buckets, seconds)
+        lock = histogram._lock
+        lock.acquire()
+        histogram.counts[index] += 1
+        histogram.total += seconds
+        lock.release()
+        if self.per_request:
+            stages = _request_stages.get()
+            if stages is not None:
+                stages[value] = stages.get(value, 0.0) + seconds
+
+    def timed(self, value: str) -> Callable:
+        """Декоратор, измеряющий длительность вызова функции (в том числе async)"""
+        def decorator(f: Callable) -> Callable:
+            if iscoroutinefunction(f):
+                @wraps(f)
+                async def async_wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await f(*args, **kwargs)
+                    finally:
+                        self.observe(value, time.perf_counter() - start)
+                return async_wrapper
+
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.observe(value, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def render(self) -> Iterable[str]:
+        """Строки в текстовом формате Prometheus"""
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for value, histogram in sorted(self._histograms.items()):
+            cumulative, total = histogram.snapshot()
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(histogram.buckets, cumulative):
+                yield f'{self.name}_bucket{{{label},le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative[-1]}'
+            yield f"{self.name}_sum{{{label}}} {total}"
+            yield f"{self.name}_count{{{label}}} {cumulative[-1]}"
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_stats(
+    name: str,
+    help: str,
+    stats: Mapping[str, Mapping[str, int]],
+    label: str,
+    gauges: Iterable[str],
+) -> Iterable[str]:
+    """
+    Счетчики вида {значение метки: {показатель: число}} в формате Prometheus
+
+    Показатели из gauges выводятся как gauge, остальные - как counter с суффиксом _total.
+
+    Args:
+        name: Префикс метрик
+        help: Описание
+        stats: Показатели по значениям метки (например, по пулам)
+        label: Имя метки
+        gauges: Показатели текущего состояния
+    """
+    gauges = frozenset(gauges)
+    series: Dict[str, List[str]] = {}
+    for value, values in sorted(stats.items()):
+        for key, number in sorted(values.items()):
+            metric = f"{name}_{key}" if key in gauges else f"{name}_{key}_total"
+            series.setdefault(metric, []).append(f'{metric}{{{label}="{_escape(value)}"}} {number}')
+    for metric, lines in series.items():
+        yield f"# HELP {metric} {help}"
+        yield f"# TYPE {metric} {'counter' if metric.endswith('_total') else 'gauge'}"
+        yield from lines
+
+
+def render_metrics(families: Iterable[HistogramFamily], *sections: Iterable[str]) -> str:
+    """Тело ответа /metrics из гистограмм и дополнительных секций (render_stats)"""
+    lines = []
+    for family in families:
+        lines.extend(family.render())
+    for section in sections:
+        lines.extend(section)
+    return "\n".join(lines) + "\n"
+
+
+# Этапы обработки запроса: ожидание подключения в пуле, запрос к БД, запросы к
+# state_monitoring_api, сборка ответов, кодирование JSON. Гистограммы общие для процесса
+# (у каждого воркера gunicorn - свои)
+STAGES = HistogramFamily(
+    "sensors_api_stage_duration_seconds",
+    "Duration of request processing stages",
+    "stage",
+    per_request=True,
+)
+
+# Полная длительность обработки запроса по маршрутам (без отправки потокового тела)
+REQUESTS = HistogramFamily(
+    "sensors_api_request_duration_seconds",
+    "Duration of request handling by endpoint",
+    "endpoint",
+)
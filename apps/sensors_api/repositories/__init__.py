@@ -1,4 +1,4 @@
 from .repository import PostgresRepository
+from .rows import SensorRow
 
-__all__ = ['PostgresRepository']
-
+__all__ = ['PostgresRepository', 'SensorRow']
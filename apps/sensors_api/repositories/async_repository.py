@@ -0,0 +1,314 @@
+"""Асинхронный репозиторий для работы с PostgreSQL"""
+
+import time
+from psycopg import errors as psycopg_errors
+from psycopg.rows import RowFactory, namedtuple_row, tuple_row
+from psycopg_pool import AsyncConnectionPool
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Sequence, AsyncIterator, Tuple
+from contextlib import asynccontextmanager
+from exceptions import DatabaseError, NotFoundError
+from repositories.queries import (
+    SENSOR_COLUMNS,
+    SELECT_SENSORS,
+    SELECT_SENSORS_VERSION,
+    SELECT_SENSOR_BY_ID,
+    SELECT_SENSOR_BY_LOCATION,
+    SELECT_SENSORS_BY_LOCATION,
+    INSERT_SENSOR,
+    UPDATE_SENSORS,
+    DELETE_SENSOR,
+    DELETE_SENSORS,
+    insert_params,
+    bulk_insert_query,
+    update_query,
+    bulk_update_params,
+    page_query,
+)
+from repositories.rows import SensorRow, sensor_row
+from repositories.connection import connection_kwargs, async_reset_connection, log_reconnect_failed
+from repositories.routing import ReadRouter
+from metrics import STAGES
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AsyncPostgresRepository:
+    """Асинхронный репозиторий с AsyncConnectionPool (методы повторяют PostgresRepository)"""
+
+    def __init__(
+        self,
+        db_url: str,
+        min_conn: int = 1,
+        max_conn: int = 10,
+        prepare: bool = True,
+        check_connections: bool = False,
+        max_lifetime: float = 3600.0,
+        read_urls: Sequence[str] = (),
+        read_strategy: str = "round_robin",
+        sticky_window: float = 2.0,
+    ):
+        """
+        Создание пулов подключений (пулы открываются в open())
+
+        Args:
+            db_url: URL подключения к БД (primary)
+            min_conn: Минимальное количество подключений в каждом пуле
+            max_conn: Максимальное количество подключений в каждом пуле
+            prepare: Использовать server-side prepared statements для фиксированных запросов
+            check_connections: Проверять подключение перед выдачей из пула
+            max_lifetime: Время жизни подключения в секундах
+            read_urls: URL реплик для чтения
+            read_strategy: Распределение чтения по репликам: round_robin или least_busy
+            sticky_window: Сколько секунд после записи чтения клиента идут в primary
+        """
+        self.prepare = prepare
+        self.router = ReadRouter(len(read_urls), read_strategy, sticky_window)
+        self._pools: Dict[Optional[int], AsyncConnectionPool] = {
+            replica: AsyncConnectionPool(
+                url,
+                min_size=min_conn,
+                max_size=max_conn,
+                name="primary" if replica is None else f"replica-{replica}",
+                max_lifetime=max_lifetime,
+                kwargs=connection_kwargs(prepare),
+                reset=async_reset_connection,
+                reconnect_failed=log_reconnect_failed,
+                check=AsyncConnectionPool.check_connection if check_connections else None,
+                open=False,
+            )
+            for replica, url in [(None, db_url), *enumerate(read_urls)]
+        }
+        self.pool = self._pools[None]
+
+    async def open(self):
+        """Открыть пулы подключений (вызывается в запущенном event loop)"""
+        try:
+            for pool in self._pools.values():
+                await pool.open()
+        except psycopg_errors.OperationalError as e:
+            raise DatabaseError(f"Database connection failed: {str(e)}")
+
+    async def close(self):
+        """Закрыть все подключения в пулах"""
+        for pool in self._pools.values():
+            await pool.close()
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Счетчики пулов подключений"""
+        return {pool.name: pool.get_stats() for pool in self._pools.values()}
+
+    @asynccontextmanager
+    async def get_cursor(self, read_only: bool = False, row_factory: RowFactory = sensor_row):
+        """Context manager для безопасной работы с курсором (транзакция только для записи в primary)"""
+        with self.router.route(read_only) as replica:
+            pool = self._pools[replica]
+            conn = None
+            start = time.perf_counter()
+            try:
+                conn = await pool.getconn()
+                acquired = time.perf_counter()
+                STAGES.observe("db_pool_wait", acquired - start)
+                async with conn.cursor(row_factory=row_factory) as cursor:
+                    if read_only:
+                        yield cursor
+                    else:
+                        async with conn.transaction():
+                            yield cursor
+            except psycopg_errors.Error as e:
+                raise DatabaseError(f"Database operation failed: {str(e)}")
+            finally:
+                if conn:
+                    STAGES.observe("db_query", time.perf_counter() - acquired)
+                    await pool.putconn(conn)
+
+    async def get_sensors(self) -> List[SensorRow]:
+        """Получить все сенсоры"""
+        try:
+            async with self.get_cursor(read_only=True) as cursor:
+                await cursor.execute(SELECT_SENSORS, prepare=self.prepare)
+                return await cursor.fetchall()
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensors: {str(e)}")
+
+    async def get_sensors_version(self) -> Tuple[int, Optional[int], Optional[datetime]]:
+        """Версия таблицы sensors для условных GET списка: (количество, max(id), max(last_updated))"""
+        try:
+            async with self.get_cursor(read_only=True, row_factory=tuple_row) as cursor:
+                await cursor.execute(SELECT_SENSORS_VERSION, prepare=self.prepare)
+                return await cursor.fetchone()
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensors version: {str(e)}")
+
+    async def iter_sensors(self, chunk_size: int = 500) -> AsyncIterator[List[SensorRow]]:
+        """Прочитать все сенсоры пачками через server-side курсор"""
+        with self.router.route(True) as replica:
+            start = time.perf_counter()
+            try:
+                async with self._pools[replica].connection() as conn, conn.transaction():
+                    STAGES.observe("db_pool_wait", time.perf_counter() - start)
+                    async with conn.cursor(name="sensors_stream", row_factory=sensor_row) as cursor:
+                        await cursor.execute(SELECT_SENSORS)
+                        while True:
+                            rows = await cursor.fetchmany(chunk_size)
+                            if not rows:
+                                break
+                            yield rows
+            except psycopg_errors.Error as e:
+                raise DatabaseError(f"Failed to stream sensors: {str(e)}")
+
+    async def get_sensors_page(
+        self,
+        after_id: int,
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """Получить страницу сенсоров по первичному ключу (keyset пагинация)"""
+        row_factory = namedtuple_row if columns else sensor_row
+        columns = tuple(columns or SENSOR_COLUMNS)
+        try:
+            query = page_query(columns)
+        except ValueError as e:
+            raise DatabaseError(str(e))
+
+        try:
+            async with self.get_cursor(read_only=True, row_factory=row_factory) as cursor:
+                await cursor.execute(query, (after_id, limit), prepare=self.prepare)
+                return await cursor.fetchall()
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensors page: {str(e)}")
+
+    async def create_sensor(self, data: dict) -> SensorRow:
+        """Создать новый датчик"""
+        try:
+            async with self.get_cursor() as cursor:
+                await cursor.execute(INSERT_SENSOR, insert_params(data), prepare=self.prepare)
+                row = await cursor.fetchone()
+                if not row:
+                    raise DatabaseError("Failed to create sensor")
+                return row
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to create sensor: {str(e)}")
+
+    async def create_sensors(self, rows: List[dict]) -> List[SensorRow]:
+        """Создать несколько датчиков одним INSERT в одной транзакции"""
+        query, values = bulk_insert_query(rows)
+        try:
+            async with self.get_cursor() as cursor:
+                await cursor.execute(query, values)
+                created = await cursor.fetchall()
+                if len(created) != len(rows):
+                    raise DatabaseError("Failed to create sensors")
+                # id выдаются из sequence в порядке VALUES
+                return sorted(created, key=lambda row: row.id)
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to create sensors: {str(e)}")
+
+    async def get_sensor_by_id(self, sensor_id: int) -> SensorRow:
+        """
+        Получить датчик по ID
+
+        Raises:
+            NotFoundError: Если датчик не найден
+        """
+        try:
+            async with self.get_cursor(read_only=True) as cursor:
+                await cursor.execute(SELECT_SENSOR_BY_ID, (sensor_id,), prepare=self.prepare)
+                row = await cursor.fetchone()
+                if not row:
+                    raise NotFoundError(f"Sensor with id {sensor_id} not found")
+                return row
+        except (DatabaseError, NotFoundError):
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensor: {str(e)}")
+
+    async def update_sensor(self, sensor_id: int, data: dict) -> SensorRow:
+        """Обновить датчик"""
+        try:
+            query, values = update_query(sensor_id, data)
+        except ValueError as e:
+            raise DatabaseError(str(e))
+
+        try:
+            async with self.get_cursor() as cursor:
+                await cursor.execute(query, values)
+                row = await cursor.fetchone()
+                if not row:
+                    raise NotFoundError(f"Sensor with id {sensor_id} not found")
+                return row
+        except (DatabaseError, NotFoundError):
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to update sensor: {str(e)}")
+
+    async def update_sensors(self, updates: Dict[int, dict]) -> List[SensorRow]:
+        """Обновить несколько датчиков одним UPDATE в одной транзакции"""
+        try:
+            async with self.get_cursor() as cursor:
+                await cursor.execute(UPDATE_SENSORS, bulk_update_params(updates), prepare=self.prepare)
+                return sorted(await cursor.fetchall(), key=lambda row: row.id)
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to update sensors: {str(e)}")
+
+    async def get_sensor_by_location(self, location: str) -> Optional[SensorRow]:
+        """Получить первый датчик по локации"""
+        try:
+            async with self.get_cursor(read_only=True) as cursor:
+                await cursor.execute(SELECT_SENSOR_BY_LOCATION, (location,), prepare=self.prepare)
+                row = await cursor.fetchone()
+                if not row:
+                    raise NotFoundError(f"Sensor with location {location} not found")
+                return row
+        except (DatabaseError, NotFoundError):
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensor by location: {str(e)}")
+
+    async def get_sensors_by_location(self, location: str) -> List[SensorRow]:
+        """Получить все датчики локации"""
+        try:
+            async with self.get_cursor(read_only=True) as cursor:
+                await cursor.execute(SELECT_SENSORS_BY_LOCATION, (location,), prepare=self.prepare)
+                return await cursor.fetchall()
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensors by location: {str(e)}")
+
+    async def delete_sensor(self, sensor_id: int) -> bool:
+        """Удалить датчик"""
+        try:
+            async with self.get_cursor(row_factory=tuple_row) as cursor:
+                await cursor.execute(DELETE_SENSOR, (sensor_id,), prepare=self.prepare)
+                row = await cursor.fetchone()
+                if not row:
+                    raise NotFoundError(f"Sensor with id {sensor_id} not found")
+                return True
+        except (DatabaseError, NotFoundError):
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to delete sensor: {str(e)}")
+
+    async def delete_sensors(self, sensor_ids: List[int]) -> List[int]:
+        """Удалить несколько датчиков одним DELETE"""
+        try:
+            async with self.get_cursor(row_factory=tuple_row) as cursor:
+                await cursor.execute(DELETE_SENSORS, (sensor_ids,), prepare=self.prepare)
+                return [row[0] for row in await cursor.fetchall()]
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to delete sensors: {str(e)}")
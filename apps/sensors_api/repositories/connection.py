@@ -0,0 +1,42 @@
+"""Настройки и хуки подключений пула PostgreSQL"""
+
+from typing import Any, Dict
+import psycopg
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def connection_kwargs(prepare: bool = True) -> Dict[str, Any]:
+    """
+    Параметры подключений пула
+
+    Подключения работают в autocommit: чтение не тратит round-trip на BEGIN/COMMIT,
+    запись открывает транзакцию явно. Без prepare автоматическая подготовка
+    запросов psycopg тоже отключается (pgbouncer в transaction mode).
+    """
+    kwargs = {"autocommit": True}
+    if not prepare:
+        kwargs["prepare_threshold"] = None
+    return kwargs
+
+
+def reset_connection(conn: psycopg.Connection) -> None:
+    """Хук пула при возврате подключения: восстанавливает измененные настройки сессии"""
+    if not conn.autocommit:
+        conn.autocommit = True
+    if conn.read_only is not None:
+        conn.read_only = None
+
+
+async def async_reset_connection(conn: psycopg.AsyncConnection) -> None:
+    """Асинхронный вариант reset_connection"""
+    if not conn.autocommit:
+        await conn.set_autocommit(True)
+    if conn.read_only is not None:
+        await conn.set_read_only(None)
+
+
+def log_reconnect_failed(pool) -> None:
+    """Хук пула: не удалось восстановить подключение за reconnect_timeout"""
+    logger.error("Pool %s failed to reconnect to the database", pool.name)
@@ -0,0 +1,116 @@
+"""SQL запросы к таблице sensors (общие для синхронного и асинхронного репозиториев)"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Колонки таблицы sensors, доступные для выборки
+SENSOR_COLUMNS = ('id', 'name', 'type', 'location', 'last_updated', 'created_at')
+
+SELECT_SENSORS = "SELECT id, name, type, location, last_updated, created_at FROM sensors ORDER BY id"
+
+# Версия таблицы для условных GET списка: меняется при создании, изменении (last_updated) и удалении
+SELECT_SENSORS_VERSION = "SELECT count(*), max(id), max(last_updated) FROM sensors"
+
+SELECT_SENSOR_BY_ID = "SELECT id, name, type, location, last_updated, created_at FROM sensors WHERE id = %s"
+
+SELECT_SENSOR_BY_LOCATION = (
+    "SELECT id, name, type, location, last_updated, created_at FROM sensors WHERE location = %s ORDER BY id LIMIT 1"
+)
+SELECT_SENSORS_BY_LOCATION = (
+    "SELECT id, name, type, location, last_updated, created_at FROM sensors WHERE location = %s ORDER BY id"
+)
+
+INSERT_SENSOR = """
+    INSERT INTO sensors (
+        name, type, location, last_updated, created_at
+    ) VALUES (
+        %s, %s, %s, %s, %s
+    )
+    RETURNING id, name, type, location, last_updated, created_at
+"""
+
+UPDATE_SENSORS = """
+    UPDATE sensors AS s
+    SET name = COALESCE(v.name, s.name),
+        type = COALESCE(v.type, s.type),
+        location = COALESCE(v.location, s.location),
+        last_updated = CURRENT_TIMESTAMP
+    FROM unnest(%s::int[], %s::varchar[], %s::varchar[], %s::varchar[]) AS v(id, name, type, location)
+    WHERE s.id = v.id
+    RETURNING s.id, s.name, s.type, s.location, s.last_updated, s.created_at
+"""
+
+DELETE_SENSOR = "DELETE FROM sensors WHERE id = %s RETURNING id"
+
+DELETE_SENSORS = "DELETE FROM sensors WHERE id = ANY(%s) RETURNING id"
+
+
+def insert_params(data: dict) -> Tuple[Any, ...]:
+    """Параметры INSERT для одного датчика"""
+    return (
+        data['name'],
+        data['type'],
+        data['location'],
+        data['last_updated'],
+        data['created_at']
+    )
+
+
+def bulk_insert_query(rows: List[dict]) -> Tuple[str, List[Any]]:
+    """Один INSERT на несколько датчиков"""
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    values = []
+    for data in rows:
+        values.extend(insert_params(data))
+    query = f"""
+        INSERT INTO sensors (
+            name, type, location, last_updated, created_at
+        ) VALUES {placeholders}
+        RETURNING id, name, type, location, last_updated, created_at
+    """
+    return query, values
+
+
+def update_query(sensor_id: int, data: dict) -> Tuple[str, List[Any]]:
+    """UPDATE только с переданными полями"""
+    update_fields = []
+    values = []
+
+    for key in ['name', 'type', 'location']:
+        if key in data:
+            update_fields.append(f"{key} = %s")
+            values.append(data[key])
+
+    if not update_fields:
+        raise ValueError("No fields to update")
+
+    # Обновляем last_updated
+    update_fields.append("last_updated = CURRENT_TIMESTAMP")
+    values.append(sensor_id)
+
+    query = f"""
+        UPDATE sensors
+        SET {', '.join(update_fields)}
+        WHERE id = %s
+        RETURNING id, name, type, location, last_updated, created_at
+    """
+    return query, values
+
+
+def bulk_update_params(updates: Dict[int, dict]) -> Tuple[List[Any], ...]:
+    """Параметры UPDATE_SENSORS: массивы id и полей (None - поле не меняется)"""
+    ids = list(updates)
+    return (
+        ids,
+        [updates[sensor_id].get('name') for sensor_id in ids],
+        [updates[sensor_id].get('type') for sensor_id in ids],
+        [updates[sensor_id].get('location') for sensor_id in ids],
+    )
+
+
+def page_query(columns: Sequence[str]) -> str:
+    """SELECT страницы сенсоров по первичному ключу"""
+    unknown = set(columns) - set(SENSOR_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    return f"SELECT {', '.join(columns)} FROM sensors WHERE id > %s ORDER BY id LIMIT %s"
+
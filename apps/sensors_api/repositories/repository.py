@@ -1,11 +1,37 @@
 """Репозиторий для работы с PostgreSQL"""
 
+import os
+import threading
+import time
 import psycopg
 from psycopg import errors as psycopg_errors
+from psycopg.rows import RowFactory, namedtuple_row, tuple_row
 from psycopg_pool import ConnectionPool
-from typing import Optional, List, Dict, Any
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Sequence, Iterator, Tuple
 from contextlib import contextmanager
 from exceptions import DatabaseError, NotFoundError
+from repositories.queries import (
+    SENSOR_COLUMNS,
+    SELECT_SENSORS,
+    SELECT_SENSORS_VERSION,
+    SELECT_SENSOR_BY_ID,
+    SELECT_SENSOR_BY_LOCATION,
+    SELECT_SENSORS_BY_LOCATION,
+    INSERT_SENSOR,
+    UPDATE_SENSORS,
+    DELETE_SENSOR,
+    DELETE_SENSORS,
+    insert_params,
+    bulk_insert_query,
+    update_query,
+    bulk_update_params,
+    page_query,
+)
+from repositories.rows import SensorRow, sensor_row
+from repositories.connection import connection_kwargs, reset_connection, log_reconnect_failed
+from repositories.routing import ReadRouter
+from metrics import STAGES
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,57 +39,216 @@ logger = logging.getLogger(__name__)
 class PostgresRepository:
     """Репозиторий с connection pooling и обработкой ошибок"""
     
-    def __init__(self, db_url: str, min_conn: int = 1, max_conn: int = 10):
+    def __init__(
+        self,
+        db_url: str,
+        min_conn: int = 1,
+        max_conn: int = 10,
+        prepare: bool = True,
+        check_connections: bool = False,
+        max_lifetime: float = 3600.0,
+        read_urls: Sequence[str] = (),
+        read_strategy: str = "round_robin",
+        sticky_window: float = 2.0,
+    ):
         """
-        Инициализация пула подключений
+        Инициализация пулов подключений (сами пулы создаются при первом обращении)
         
         Args:
-            db_url: URL подключения к БД
-            min_conn: Минимальное количество подключений
-            max_conn: Максимальное количество подключений
+            db_url: URL подключения к БД (primary)
+            min_conn: Минимальное количество подключений в каждом пуле
+            max_conn: Максимальное количество подключений в каждом пуле
+            prepare: Использовать server-side prepared statements для фиксированных запросов
+                (отключается при работе через pgbouncer в transaction mode)
+            check_connections: Проверять подключение перед выдачей из пула (лишний round-trip)
+            max_lifetime: Время жизни подключения в секундах, после которого пул его пересоздает
+            read_urls: URL реплик для чтения (без них все запросы идут в primary)
+            read_strategy: Распределение чтения по репликам: round_robin или least_busy
+            sticky_window: Сколько секунд после записи чтения клиента идут в primary
         """
+        self.db_url = db_url
+        self.read_urls = list(read_urls)
+        self.min_conn = min_conn
+        self.max_conn = max_conn
+        self.prepare = prepare
+        self.check_connections = check_connections
+        self.max_lifetime = max_lifetime
+        self.router = ReadRouter(len(self.read_urls), read_strategy, sticky_window)
+        self._pools: Dict[Optional[int], ConnectionPool] = {}
+        self._pool_pid = None
+        self._pool_lock = threading.Lock()
+    
+    @property
+    def pool(self) -> ConnectionPool:
+        """Пул подключений к primary"""
+        return self._get_pool(None)
+    
+    def _get_pool(self, replica: Optional[int]) -> ConnectionPool:
+        """
+        Пул подключений текущего процесса к primary (None) или к реплике с индексом replica
+        
+        При preload приложение создается в мастер-процессе gunicorn до fork, поэтому
+        пулы создаются лениво и пересоздаются в процессе с другим pid: соединения и
+        фоновые потоки пула не наследуются воркерами.
+        """
+        pid = os.getpid()
+        pool = self._pools.get(replica) if self._pool_pid == pid else None
+        if pool is None:
+            with self._pool_lock:
+                if self._pool_pid != pid:
+                    self._pools = {}
+                    self._pool_pid = pid
+                pool = self._pools.get(replica)
+                if pool is None:
+                    pool = self._pools[replica] = self._create_pool(replica)
+        return pool
+    
+    def _create_pool(self, replica: Optional[int]) -> ConnectionPool:
+        """Создать пул подключений к primary или реплике"""
         try:
-            self.pool = ConnectionPool(db_url, min_size=min_conn, max_size=max_conn)
+            return ConnectionPool(
+                self.db_url if replica is None else self.read_urls[replica],
+                min_size=self.min_conn,
+                max_size=self.max_conn,
+                name="primary" if replica is None else f"replica-{replica}",
+                max_lifetime=self.max_lifetime,
+                kwargs=connection_kwargs(self.prepare),
+                reset=reset_connection,
+                reconnect_failed=log_reconnect_failed,
+                check=ConnectionPool.check_connection if self.check_connections else None,
+            )
         except psycopg_errors.OperationalError as e:
             raise DatabaseError(f"Database connection failed: {str(e)}")
     
     @contextmanager
-    def get_cursor(self):
-        """Context manager для безопасной работы с курсором"""
+    def get_cursor(self, read_only: bool = False, row_factory: RowFactory = sensor_row):
+        """
+        Context manager для безопасной работы с курсором
+        
+        Подключения пула работают в autocommit. Запись выполняется в явной транзакции
+        в primary, чтение (read_only=True) - без BEGIN/COMMIT, одним обращением
+        к серверу, на реплике, если они настроены. Строки по умолчанию - SensorRow.
+        Ожидание подключения и работа с ним попадают в этапы db_pool_wait и db_query.
+        """
+        with self.router.route(read_only) as replica:
+            pool = self._get_pool(replica)
+            conn = None
+            start = time.perf_counter()
+            try:
+                conn = pool.getconn()
+                acquired = time.perf_counter()
+                STAGES.observe("db_pool_wait", acquired - start)
+                with conn.cursor(row_factory=row_factory) as cursor:
+                    if read_only:
+                        yield cursor
+                    else:
+                        with conn.transaction():
+                            yield cursor
+            except psycopg_errors.Error as e:
+                raise DatabaseError(f"Database operation failed: {str(e)}")
+            finally:
+                if conn:
+                    STAGES.observe("db_query", time.perf_counter() - acquired)
+                    pool.putconn(conn)
+    
+    def get_sensors(self) -> List[SensorRow]:
+        """Получить все сенсоры"""
+        try:
+            with self.get_cursor(read_only=True) as cursor:
+                cursor.execute(SELECT_SENSORS, prepare=self.prepare)
+                return cursor.fetchall()
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensors: {str(e)}")
+    
+    def get_sensors_version(self) -> Tuple[int, Optional[int], Optional[datetime]]:
+        """
+        Версия таблицы sensors для условных GET списка
+        
+        Returns:
+            (количество сенсоров, max(id), max(last_updated))
+        """
+        try:
+            with self.get_cursor(read_only=True, row_factory=tuple_row) as cursor:
+                cursor.execute(SELECT_SENSORS_VERSION, prepare=self.prepare)
+                return cursor.fetchone()
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensors version: {str(e)}")
+    
+    def iter_sensors(self, chunk_size: int = 500) -> Iterator[List[SensorRow]]:
+        """
+        Прочитать все сенсоры пачками через server-side курсор
+        
+        Соединение занято, пока генератор не исчерпан или не закрыт.
+        
+        Args:
+            chunk_size: Количество строк в одной пачке
+            
+        Yields:
+            Списки строк сенсоров
+        """
+        with self.router.route(True) as replica:
+            yield from self._iter_sensors(self._get_pool(replica), chunk_size)
+    
+    def _iter_sensors(self, pool: ConnectionPool, chunk_size: int) -> Iterator[List[SensorRow]]:
+        """Чтение пачками из указанного пула"""
         conn = None
-        cursor = None
         try:
-            conn = self.pool.getconn()
-            cursor = conn.cursor()
-            yield cursor
-            conn.commit()
+            start = time.perf_counter()
+            conn = pool.getconn()
+            STAGES.observe("db_pool_wait", time.perf_counter() - start)
+            # Server-side курсор живет только внутри транзакции; если генератор закроют
+            # посреди чтения (например, клиент отключился), транзакция откатится
+            with conn.transaction(), conn.cursor(name="sensors_stream", row_factory=sensor_row) as cursor:
+                cursor.execute(SELECT_SENSORS)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
         except psycopg_errors.Error as e:
-            if conn:
-                conn.rollback()
-            raise DatabaseError(f"Database operation failed: {str(e)}")
+            raise DatabaseError(f"Failed to stream sensors: {str(e)}")
         finally:
-            if cursor:
-                cursor.close()
             if conn:
-                self.pool.putconn(conn)
+                pool.putconn(conn)
     
-    def get_sensors(self) -> List[Dict[str, Any]]:
-        """Получить все сенсоры"""
+    def get_sensors_page(
+        self,
+        after_id: int,
+        limit: int,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Any]:
+        """
+        Получить страницу сенсоров по первичному ключу (keyset пагинация)
+        
+        Args:
+            after_id: Вернуть сенсоры с id больше указанного
+            limit: Максимальное количество сенсоров
+            columns: Выбираемые колонки (по умолчанию все)
+            
+        Returns:
+            Строки SensorRow (все колонки) или именованные кортежи с выбранными колонками
+        """
+        row_factory = namedtuple_row if columns else sensor_row
+        columns = tuple(columns or SENSOR_COLUMNS)
         try:
-            with self.get_cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, name, type, location, last_updated, created_at FROM sensors ORDER BY id"
-                )
-                rows = cursor.fetchall()
-                if not rows:
-                    return []
-                return [self._row_to_dict(row) for row in rows]
+            query = page_query(columns)
+        except ValueError as e:
+            raise DatabaseError(str(e))
+        
+        try:
+            with self.get_cursor(read_only=True, row_factory=row_factory) as cursor:
+                cursor.execute(query, (after_id, limit), prepare=self.prepare)
+                return cursor.fetchall()
         except DatabaseError:
             raise
         except Exception as e:
-            raise DatabaseError(f"Failed to fetch sensors: {str(e)}")
+            raise DatabaseError(f"Failed to fetch sensors page: {str(e)}")
     
-    def create_sensor(self, data: dict) -> Dict[str, Any]:
+    def create_sensor(self, data: dict) -> SensorRow:
         """
         Создать новый датчик
         
@@ -71,37 +256,45 @@ class PostgresRepository:
             data: Словарь с данными датчика
             
         Returns:
-            Словарь с созданным датчиком
+            Строка созданного датчика
         """
         try:
             with self.get_cursor() as cursor:
-                cursor.execute(
-                    """
-                    INSERT INTO sensors (
-                        name, type, location, last_updated, created_at
-                    ) VALUES (
-                        %s, %s, %s, %s, %s
-                    )
-                    RETURNING id, name, type, location, last_updated, created_at
-                    """,
-                    (
-                        data['name'], 
-                        data['type'], 
-                        data['location'], 
-                        data['last_updated'], 
-                        data['created_at']
-                    )
-                )
+                cursor.execute(INSERT_SENSOR, insert_params(data), prepare=self.prepare)
                 row = cursor.fetchone()
                 if not row:
                     raise DatabaseError("Failed to create sensor")
-                return self._row_to_dict(row)
+                return row
         except DatabaseError:
             raise
         except Exception as e:
             raise DatabaseError(f"Failed to create sensor: {str(e)}")
     
-    def get_sensor_by_id(self, sensor_id: int) -> Dict[str, Any]:
+    def create_sensors(self, rows: List[dict]) -> List[SensorRow]:
+        """
+        Создать несколько датчиков одним INSERT в одной транзакции
+        
+        Args:
+            rows: Список словарей с данными датчиков
+            
+        Returns:
+            Список созданных датчиков в порядке rows
+        """
+        query, values = bulk_insert_query(rows)
+        try:
+            with self.get_cursor() as cursor:
+                cursor.execute(query, values)
+                created = cursor.fetchall()
+                if len(created) != len(rows):
+                    raise DatabaseError("Failed to create sensors")
+                # id выдаются из sequence в порядке VALUES
+                return sorted(created, key=lambda row: row.id)
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to create sensors: {str(e)}")
+    
+    def get_sensor_by_id(self, sensor_id: int) -> SensorRow:
         """
         Получить датчик по ID
         
@@ -109,27 +302,24 @@ class PostgresRepository:
             sensor_id: ID датчика
             
         Returns:
-            Словарь с данными датчика
+            Строка датчика
             
         Raises:
             NotFoundError: Если датчик не найден
         """
         try:
-            with self.get_cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, name, type, location, last_updated, created_at FROM sensors WHERE id = %s",
-                    (sensor_id,)
-                )
+            with self.get_cursor(read_only=True) as cursor:
+                cursor.execute(SELECT_SENSOR_BY_ID, (sensor_id,), prepare=self.prepare)
                 row = cursor.fetchone()
                 if not row:
                     raise NotFoundError(f"Sensor with id {sensor_id} not found")
-                return self._row_to_dict(row)
+                return row
         except (DatabaseError, NotFoundError):
             raise
         except Exception as e:
             raise DatabaseError(f"Failed to fetch sensor: {str(e)}")
     
-    def update_sensor(self, sensor_id: int, data: dict) -> Dict[str, Any]:
+    def update_sensor(self, sensor_id: int, data: dict) -> SensorRow:
         """
         Обновить датчик
         
@@ -138,43 +328,46 @@ class PostgresRepository:
             data: Словарь с обновленными данными
             
         Returns:
-            Словарь с обновленным датчиком
+            Строка обновленного датчика
         """
         # Формируем динамический запрос только с переданными полями
-        update_fields = []
-        values = []
-        
-        for key in ['name', 'type', 'location']:
-            if key in data:
-                update_fields.append(f"{key} = %s")
-                values.append(data[key])
-        
-        if not update_fields:
-            raise DatabaseError("No fields to update")
-        
-        # Обновляем last_updated
-        update_fields.append("last_updated = CURRENT_TIMESTAMP")
-        values.append(sensor_id)
+        try:
+            query, values = update_query(sensor_id, data)
+        except ValueError as e:
+            raise DatabaseError(str(e))
         
         try:
             with self.get_cursor() as cursor:
-                query = f"""
-                    UPDATE sensors 
-                    SET {', '.join(update_fields)}
-                    WHERE id = %s
-                    RETURNING id, name, type, location, last_updated, created_at
-                """
                 cursor.execute(query, values)
                 row = cursor.fetchone()
                 if not row:
                     raise NotFoundError(f"Sensor with id {sensor_id} not found")
-                return self._row_to_dict(row)
+                return row
         except (DatabaseError, NotFoundError):
             raise
         except Exception as e:
             raise DatabaseError(f"Failed to update sensor: {str(e)}")
     
-    def get_sensor_by_location(self, location: str) -> Optional[Dict[str, Any]]:
+    def update_sensors(self, updates: Dict[int, dict]) -> List[SensorRow]:
+        """
+        Обновить несколько датчиков одним UPDATE в одной транзакции
+        
+        Args:
+            updates: Словарь ID датчика -> обновляемые поля (отсутствующие поля не меняются)
+            
+        Returns:
+            Список обновленных датчиков (не найденные ID отсутствуют)
+        """
+        try:
+            with self.get_cursor() as cursor:
+                cursor.execute(UPDATE_SENSORS, bulk_update_params(updates), prepare=self.prepare)
+                return sorted(cursor.fetchall(), key=lambda row: row.id)
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to update sensors: {str(e)}")
+    
+    def get_sensor_by_location(self, location: str) -> Optional[SensorRow]:
         """
         Получить первый датчик по локации
         
@@ -182,24 +375,40 @@ class PostgresRepository:
             location: Локация датчика
             
         Returns:
-            Словарь с данными датчика или None если не найден
+            Строка датчика или None если не найден
         """
         try:
-            with self.get_cursor() as cursor:
-                cursor.execute(
-                    "SELECT id, name, type, location, last_updated, created_at FROM sensors WHERE location = %s ORDER BY id LIMIT 1",
-                    (location,)
-                )
+            with self.get_cursor(read_only=True) as cursor:
+                cursor.execute(SELECT_SENSOR_BY_LOCATION, (location,), prepare=self.prepare)
                 row = cursor.fetchone()
                 if not row: # на всякий случай)
                     raise NotFoundError(f"Sensor with location {location} not found")
 
-                return self._row_to_dict(row)
+                return row
         except (DatabaseError, NotFoundError):
             raise
         except Exception as e:
             raise DatabaseError(f"Failed to fetch sensor by location: {str(e)}")
     
+    def get_sensors_by_location(self, location: str) -> List[SensorRow]:
+        """
+        Получить все датчики локации
+        
+        Args:
+            location: Локация датчиков
+            
+        Returns:
+            Строки датчиков по возрастанию id
+        """
+        try:
+            with self.get_cursor(read_only=True) as cursor:
+                cursor.execute(SELECT_SENSORS_BY_LOCATION, (location,), prepare=self.prepare)
+                return cursor.fetchall()
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to fetch sensors by location: {str(e)}")
+    
     def delete_sensor(self, sensor_id: int) -> bool:
         """
         Удалить датчик
@@ -211,8 +420,8 @@ class PostgresRepository:
             True если удален успешно
         """
         try:
-            with self.get_cursor() as cursor:
-                cursor.execute("DELETE FROM sensors WHERE id = %s RETURNING id", (sensor_id,))
+            with self.get_cursor(row_factory=tuple_row) as cursor:
+                cursor.execute(DELETE_SENSOR, (sensor_id,), prepare=self.prepare)
                 row = cursor.fetchone()
                 if not row:
                     raise NotFoundError(f"Sensor with id {sensor_id} not found")
@@ -222,23 +431,33 @@ class PostgresRepository:
         except Exception as e:
             raise DatabaseError(f"Failed to delete sensor: {str(e)}")
     
-    @staticmethod
-    def _row_to_dict(row: tuple) -> Dict[str, Any]:
-        """Преобразование строки БД в словарь"""
-        from datetime import datetime
-        
-        result = {
-            'id': row[0],
-            'name': row[1],
-            'type': row[2],
-            'location': row[3],
-            'last_updated': str(row[4].isoformat()) if row[4] else None,
-            'created_at': str(row[5].isoformat()) if row[5] else None
-        }
+    def delete_sensors(self, sensor_ids: List[int]) -> List[int]:
+        """
+        Удалить несколько датчиков одним DELETE
         
-        return result
+        Args:
+            sensor_ids: ID датчиков
+            
+        Returns:
+            Список ID удаленных датчиков
+        """
+        try:
+            with self.get_cursor(row_factory=tuple_row) as cursor:
+                cursor.execute(DELETE_SENSORS, (sensor_ids,), prepare=self.prepare)
+                return [row[0] for row in cursor.fetchall()]
+        except DatabaseError:
+            raise
+        except Exception as e:
+            raise DatabaseError(f"Failed to delete sensors: {str(e)}")
+    
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Счетчики пулов подключений текущего процесса"""
+        if self._pool_pid != os.getpid():
+            return {}
+        return {pool.name: pool.get_stats() for pool in list(self._pools.values())}
     
     def close(self):
-        """Закрыть все подключения в пуле"""
-        if self.pool:
-            self.pool.closeall()
\ No newline at end of file
+        """Закрыть все подключения в пулах"""
+        if self._pool_pid == os.getpid():
+            for pool in self._pools.values():
+                pool.close()
\ No newline at end of file
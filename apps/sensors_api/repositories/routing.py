@@ -0,0 +1,129 @@
+"""Маршрутизация запросов между primary и репликами для чтения"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+READ_STRATEGIES = ("round_robin", "least_busy")
+
+# Метка последней записи клиента: cookie для браузеров и HTTP-сессий и заголовок для
+# остальных клиентов. Значение - время записи в секундах Unix.
+WRITE_COOKIE = "last_write"
+WRITE_HEADER = "X-Last-Write"
+
+
+class WriteToken:
+    """
+    Метка записи клиента в рамках запроса
+
+    client_write - время последней записи из метки, которую прислал клиент,
+    written_at - время записи в этом запросе (тогда в ответ отправляется новая метка).
+    Метка приходит с клиентом, поэтому любой воркер направит его чтение в primary,
+    а не только тот, который выполнил запись.
+    """
+
+    __slots__ = ("client_write", "written_at")
+
+    def __init__(self, client_write: Optional[float] = None):
+        self.client_write = client_write
+        self.written_at: Optional[float] = None
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> "WriteToken":
+        """Метка из заголовка или cookie (неверное значение игнорируется)"""
+        try:
+            return cls(float(value)) if value else cls()
+        except ValueError:
+            return cls()
+
+    def last_write(self) -> Optional[float]:
+        """Время последней известной записи клиента"""
+        return self.written_at if self.written_at is not None else self.client_write
+
+    def header_value(self) -> Optional[str]:
+        """Новая метка для ответа или None, если в запросе не было записи"""
+        return None if self.written_at is None else f"{self.written_at:.3f}"
+
+
+# Метка записи текущего запроса (выставляется приложением), для read-your-writes
+current_write_token: ContextVar[Optional[WriteToken]] = ContextVar("current_write_token", default=None)
+
+
+class ReadRouter:
+    """
+    Выбор пула для запроса
+
+    Запись всегда идет в primary. Чтение распределяется по репликам (round_robin
+    или least_busy - реплика с наименьшим числом выполняющихся запросов), кроме
+    чтений клиента в течение sticky_window секунд после его записи: они идут в
+    primary, чтобы клиент видел свои изменения несмотря на отставание реплик.
+    Время записи клиента берется из его метки (WriteToken), а не из памяти процесса,
+    поэтому правило работает между воркерами и не смешивает клиентов за одним прокси.
+    """
+
+    def __init__(
+        self,
+        replicas: int,
+        strategy: str = "round_robin",
+        sticky_window: float = 2.0,
+    ):
+        """
+        Args:
+            replicas: Количество реплик (0 - все запросы в primary)
+            strategy: round_robin или least_busy
+            sticky_window: Сколько секунд после записи чтения клиента идут в primary
+        """
+        if strategy not in READ_STRATEGIES:
+            raise ValueError(f"Unknown read strategy: {strategy}")
+        self.replicas = replicas
+        self.strategy = strategy
+        self.sticky_window = sticky_window
+        self._counter = itertools.count()
+        self._in_flight = [0] * replicas
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def route(self, read_only: bool) -> Iterator[Optional[int]]:
+        """
+        Выбрать пул на время запроса
+
+        Yields:
+            Индекс реплики или None для primary
+        """
+        replica = self._choose() if read_only else None
+        if replica is not None:
+            with self._lock:
+                self._in_flight[replica] += 1
+        try:
+            yield replica
+        finally:
+            if replica is not None:
+                with self._lock:
+                    self._in_flight[replica] -= 1
+            elif not read_only:
+                self._record_write()
+
+    def _choose(self) -> Optional[int]:
+        """Реплика для чтения или None, если читать нужно из primary"""
+        if not self.replicas or self._is_sticky():
+            return None
+        if self.strategy == "least_busy":
+            with self._lock:
+                return min(range(self.replicas), key=self._in_flight.__getitem__)
+        return next(self._counter) % self.replicas
+
+    def _is_sticky(self) -> bool:
+        """Писал ли текущий клиент в последние sticky_window секунд"""
+        token = current_write_token.get()
+        written_at = token.last_write() if token is not None else None
+        # Метка из будущего больше чем на окно (расхождение часов, подделка) не учитывается
+        return written_at is not None and abs(time.time() - written_at) < self.sticky_window
+
+    def _record_write(self) -> None:
+        """Отметить запись в метке текущего запроса"""
+        token = current_write_token.get()
+        if self.replicas and token is not None:
+            token.written_at = time.time()
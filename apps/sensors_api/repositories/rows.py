@@ -0,0 +1,27 @@
+"""Компактные строки результатов запросов (общие для синхронного и асинхронного репозиториев)"""
+
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+from psycopg.rows import RowMaker
+
+
+class SensorRow(NamedTuple):
+    """
+    Строка таблицы sensors
+
+    Кортеж вместо словаря: psycopg создает его сразу из значений колонок, без
+    промежуточного кортежа, ключей и строк с датами, поэтому на строку приходится
+    меньше памяти и аллокаций. Даты остаются datetime и форматируются при сериализации.
+    """
+
+    id: int
+    name: str
+    type: str
+    location: str
+    last_updated: Optional[datetime]
+    created_at: Optional[datetime]
+
+
+def sensor_row(cursor: Any) -> RowMaker[SensorRow]:
+    """Фабрика строк psycopg для запросов, возвращающих колонки SENSOR_COLUMNS по порядку"""
+    return SensorRow._make
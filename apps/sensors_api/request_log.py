@@ -0,0 +1,206 @@
+"""
+Структурированное логирование: идентификатор запроса, выборка подробных событий,
+запись логов в отдельном потоке и одна итоговая строка на запрос
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+from metrics import collect_request_stages
+
+# Идентификатор текущего запроса (X-Request-ID или сгенерированный)
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+# Попал ли текущий запрос в выборку подробного логирования
+_sampled: ContextVar[bool] = ContextVar("request_sampled", default=False)
+
+# Дополнительные поля итоговой строки текущего запроса
+_request_fields: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_fields", default=None)
+
+# Атрибуты LogRecord, которые не выводятся как дополнительные поля
+_RESERVED_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "request_id"}
+
+request_logger = logging.getLogger("sensors_api.request")
+
+
+def is_sampled() -> bool:
+    """Логировать ли подробные события текущего запроса"""
+    return _sampled.get()
+
+
+def log_sampled(logger: logging.Logger, msg: str, *args: Any, level: int = logging.INFO) -> None:
+    """
+    Событие, которое происходит на каждый запрос или чаще (ответы state_monitoring_api и т.п.)
+
+    Пишется только для запросов из выборки (LOG_SAMPLE_RATE) и только если уровень включен;
+    аргументы форматируются лениво.
+    """
+    if _sampled.get() and logger.isEnabledFor(level):
+        logger.log(level, msg, *args)
+
+
+def annotate(**fields: Any) -> None:
+    """Добавить поля в итоговую строку текущего запроса (например, error)"""
+    request_fields = _request_fields.get()
+    if request_fields is not None:
+        request_fields.update(fields)
+
+
+class RequestLog:
+    """Состояние логирования одного запроса: идентификатор, начало и длительности этапов"""
+
+    __slots__ = ("request_id", "start", "stages", "fields")
+
+    def __init__(self, request_id: str, start: float, stages: Dict[str, float], fields: Dict[str, Any]):
+        self.request_id = request_id
+        self.start = start
+        self.stages = stages
+        self.fields = fields
+
+
+def begin_request(request_id: Optional[str], sample_rate: float) -> RequestLog:
+    """
+    Начать запрос: идентификатор, решение о выборке и сбор длительностей этапов
+
+    Args:
+        request_id: Идентификатор из заголовка X-Request-ID (None - сгенерировать)
+        sample_rate: Доля запросов с подробным логированием (0..1)
+    """
+    request_id = request_id[:64] if request_id else os.urandom(8).hex()
+    current_request_id.set(request_id)
+    _sampled.set(sample_rate >= 1.0 or (sample_rate > 0.0 and random.random() < sample_rate))
+    fields: Dict[str, Any] = {}
+    _request_fields.set(fields)
+    return RequestLog(request_id, time.perf_counter(), collect_request_stages(), fields)
+
+
+def end_request(log: RequestLog, method: str, path: str, endpoint: Optional[str], status: int) -> float:
+    """
+    Итоговая строка запроса с длительностями этапов в миллисекундах
+
+    Returns:
+        Длительность запроса в секундах
+    """
+    duration = time.perf_counter() - log.start
+    if request_logger.isEnabledFor(logging.INFO):
+        request_logger.info(
+            "%s %s %s %.1fms", method, path, status, duration * 1000,
+            extra={
+                "method": method,
+                "path": path,
+                "endpoint": endpoint,
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in log.stages.items()},
+                **log.fields,
+            },
+        )
+    return duration
+
+
+class RequestIdFilter(logging.Filter):
+    """Добавляет к записи идентификатор запроса (выполняется в потоке, который пишет в лог)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = current_request_id.get()
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """Одна JSON строка на запись: время, уровень, логгер, сообщение, request_id и поля из extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler без форматирования в потоке запроса
+
+    Стандартный QueueHandler.prepare форматирует сообщение до постановки в очередь;
+    очередь здесь внутри процесса, поэтому запись передается как есть, а форматирование
+    и вывод выполняются в потоке QueueListener. Аргументы записи не должны изменяться
+    после вызова логгера.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json", use_queue: bool = True) -> None:
+    """
+    Настроить корневой логгер процесса (повторные вызовы ничего не меняют)
+
+    Args:
+        level: Уровень логирования
+        fmt: json - строка JSON на запись, text - обычный текст с request_id
+        use_queue: Писать в stderr из отдельного потока через очередь
+    """
+    global _listener
+    root = logging.getLogger()
+    if any(getattr(handler, "_request_log", False) for handler in root.handlers):
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        output.setFormatter(JSONFormatter())
+    else:
+        output.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+        ))
+
+    if use_queue:
+        handler = DeferredQueueHandler(queue.SimpleQueue())
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+        atexit.register(_stop_listener)
+        # После fork (gunicorn с preload) поток слушателя в воркере не существует
+        os.register_at_fork(after_in_child=lambda: _restart_listener(handler, output))
+    else:
+        handler = output
+    handler._request_log = True
+    handler.addFilter(RequestIdFilter())
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+
+def _restart_listener(handler: QueueHandler, output: logging.Handler) -> None:
+    """Новая очередь и поток слушателя в дочернем процессе"""
+    global _listener
+    handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(handler.queue, output)
+    _listener.start()
+
+
+def _stop_listener() -> None:
+    """Дописать оставшиеся в очереди записи при завершении процесса"""
+    if _listener is not None:
+        _listener.stop()
@@ -0,0 +1,43 @@
+"""Политика повторных запросов с jittered backoff и бюджетом повторов"""
+
+import random
+import threading
+
+
+class RetryBudget:
+    """
+    Бюджет повторов (token bucket)
+
+    Каждый исходный запрос пополняет бюджет на ratio токенов, каждый повтор
+    тратит один токен. Так доля повторов не превышает ratio от потока запросов
+    и при деградации upstream повторы не превращаются в лавину.
+    """
+
+    def __init__(self, ratio: float = 0.1, max_tokens: float = 10.0):
+        """
+        Args:
+            ratio: Доля повторов относительно исходных запросов
+            max_tokens: Максимальный запас токенов (и начальное значение)
+        """
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """Учесть исходный запрос"""
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Попробовать потратить токен на повтор"""
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+
+def backoff_delay(attempt: int, base: float = 0.05, cap: float = 1.0) -> float:
+    """Задержка перед повтором по схеме full jitter: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
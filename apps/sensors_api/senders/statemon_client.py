@@ -1,16 +1,127 @@
 """Клиент для получения данных из state_monitoring_api"""
 
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional
 import requests
+from requests.adapters import HTTPAdapter
+from senders.retry import RetryBudget, backoff_delay
+from metrics import STAGES
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество датчиков в одном batch-запросе (совпадает с лимитом state_monitoring_api)
+MAX_BATCH_SIZE = 1000
+
+# Статусы, при которых запрос имеет смысл повторить
+RETRYABLE_STATUSES = frozenset({502, 503, 504})
+
+
+class BatchNotSupportedError(Exception):
+    """state_monitoring_api не поддерживает batch-запросы"""
+
 
 class StateMonitoringClient:
     """Клиент для получения данных из state_monitoring_api"""
 
-    def __init__(self, base_url: str):
+    def __init__(
+        self,
+        base_url: str,
+        batch_size: int = MAX_BATCH_SIZE,
+        pool_size: int = 16,
+        connect_timeout: float = 0.5,
+        read_timeout: float = 2.0,
+        max_retries: int = 2,
+        retry_budget: Optional[RetryBudget] = None,
+    ):
+        """
+        Args:
+            base_url: URL state_monitoring_api
+            batch_size: Количество датчиков в одном batch-запросе
+            pool_size: Максимальное количество keep-alive соединений в пуле
+            connect_timeout: Таймаут установки соединения в секундах
+            read_timeout: Таймаут чтения ответа в секундах
+            max_retries: Максимальное количество повторов одного запроса
+            retry_budget: Общий бюджет повторов клиента
+        """
         self.base_url = base_url
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget or RetryBudget()
+        self.batch_supported = True
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """HTTP запрос через пул соединений с повторами в рамках бюджета"""
+        self.retry_budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, f"{self.base_url}{path}", timeout=self.timeout, **kwargs)
+                if response.status_code not in RETRYABLE_STATUSES:
+                    return response
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response, error = None, e
 
+            if attempt >= self.max_retries or not self.retry_budget.try_withdraw():
+                if error is not None:
+                    raise error
+                return response
+
+            delay = backoff_delay(attempt)
+            logger.warning("Retrying %s %s in %.3fs (attempt %s)", method, path, delay, attempt + 1)
+            time.sleep(delay)
+            attempt += 1
+
+    @STAGES.timed("statemon_get_data")
     def get_data(self, sensor_id: int):
         """Получение данных из state_monitoring_api"""
-        response = requests.get(f"{self.base_url}/api/v1/sensor/data?sensor_id={sensor_id}")
+        response = self._request("GET", "/api/v1/sensor/data", params={"sensor_id": sensor_id})
         if response.status_code != 200:
             raise Exception(f"Failed to get data from state_monitoring_api: {response.status_code} {response.text}")
-        return response.json() 
\ No newline at end of file
+        return response.json()
+
+    @STAGES.timed("statemon_get_data_many")
+    def get_data_many(self, sensor_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Получение данных для нескольких датчиков, один запрос на пачку из batch_size датчиков
+
+        Args:
+            sensor_ids: ID датчиков
+
+        Returns:
+            Словарь sensor_id -> последние данные датчика (датчики без данных отсутствуют)
+
+        Raises:
+            BatchNotSupportedError: Если state_monitoring_api не поддерживает batch-запросы
+        """
+        if not self.batch_supported:
+            raise BatchNotSupportedError("Batch endpoint is not supported by state_monitoring_api")
+
+        ids = list(dict.fromkeys(sensor_ids))
+        result = {}
+        for start in range(0, len(ids), self.batch_size):
+            response = self._request(
+                "POST",
+                "/api/v1/sensor/data/batch",
+                json={"sensor_ids": ids[start:start + self.batch_size]},
+            )
+            if response.status_code in (404, 405):
+                # Старая версия state_monitoring_api без batch endpoint - больше не пробуем
+                self.batch_supported = False
+                raise BatchNotSupportedError("Batch endpoint is not supported by state_monitoring_api")
+            if response.status_code != 200:
+                raise Exception(f"Failed to get batch data from state_monitoring_api: {response.status_code} {response.text}")
+            for item in response.json():
+                result[item['sensor_id']] = item
+        return result
+
+    def close(self):
+        """Закрыть пул соединений"""
+        self.session.close()
@@ -0,0 +1,327 @@
+"""Асинхронный сервисный слой данных"""
+
+import asyncio
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple, Callable
+from repositories.async_repository import AsyncPostgresRepository
+from repositories.rows import SensorRow
+from services.helpers import (
+    DEFAULT_PAGE_SIZE,
+    validate_sensor_id,
+    validate_location,
+    prepare_create,
+    prepare_update,
+    page_columns,
+    needs_readings,
+    build_sensor_response,
+    build_sensor_responses,
+    build_page,
+    build_location_response,
+    parse_bulk_create,
+    parse_bulk_update,
+    parse_bulk_delete,
+    add_not_found_errors,
+)
+import logging
+from senders.async_statemon_client import AsyncStateMonitoringClient
+from senders.statemon_client import BatchNotSupportedError
+from services.reading_cache import ReadingCache
+from services.single_flight import AsyncSingleFlight
+from services.location_index import LocationIndex
+from services.conditional import Validators, ValidatorsMemo, sensor_validators, sensors_validators
+from request_log import log_sampled
+from exceptions import NotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSensorService:
+    """Асинхронный сервисный слой для работы с сенсорами (повторяет SensorService)"""
+
+    def __init__(
+        self,
+        repository: AsyncPostgresRepository,
+        statemon_client: AsyncStateMonitoringClient,
+        statemon_max_concurrency: int = 16,
+        statemon_deadline: float = 5.0,
+        cache_ttl: float = 5.0,
+        cache_stale_ttl: float = 30.0,
+        cache_max_entries: int = 10000,
+        stream_chunk_size: int = 500,
+        location_index_ttl: float = 30.0,
+        location_index_max_locations: int = 10000,
+        location_index_version_interval: float = 1.0,
+    ):
+        """
+        Args:
+            repository: Асинхронный репозиторий сенсоров
+            statemon_client: Асинхронный клиент state_monitoring_api
+            statemon_max_concurrency: Максимум одновременных запросов к state_monitoring_api на один список
+            statemon_deadline: Общий дедлайн на получение данных для списка сенсоров в секундах
+            cache_ttl: Время жизни показаний в кэше в секундах
+            cache_stale_ttl: Сколько секунд после cache_ttl отдавать устаревшие показания, обновляя их в фоне
+            cache_max_entries: Максимальное количество датчиков в кэше показаний
+            stream_chunk_size: Количество сенсоров в одной пачке при потоковой выдаче списка
+            location_index_ttl: Время жизни локации в индексе локаций в секундах
+            location_index_max_locations: Максимальное количество локаций в индексе
+            location_index_version_interval: Как часто индекс локаций сверяет версию таблицы sensors
+                (изменения из других воркеров видны не позже этого интервала), в секундах
+        """
+        self.repository = repository
+        self.statemon_client = statemon_client
+        self.statemon_max_concurrency = statemon_max_concurrency
+        self.statemon_deadline = statemon_deadline
+        self.reading_cache = ReadingCache(
+            ttl=cache_ttl,
+            stale_ttl=cache_stale_ttl,
+            max_entries=cache_max_entries,
+        )
+        self.single_flight = AsyncSingleFlight()
+        self.stream_chunk_size = stream_chunk_size
+        self.location_index = LocationIndex(
+            ttl=location_index_ttl,
+            max_locations=location_index_max_locations,
+            version_interval=location_index_version_interval,
+        )
+        self.list_validators = ValidatorsMemo(ttl=cache_ttl)
+
+    async def get_data_from_statemon(self, sensor_id: int) -> Dict[str, Any]:
+        """Получить данные датчика через кэш показаний"""
+        return await self.reading_cache.get_async(sensor_id, self._fetch_data_from_statemon)
+
+    async def _fetch_data_from_statemon(self, sensor_id: int) -> Dict[str, Any]:
+        """Получить данные из state_monitoring_api (одновременные запросы одного датчика объединяются)"""
+        return await self.single_flight.do(
+            ('reading', sensor_id), lambda: self._request_data_from_statemon(sensor_id)
+        )
+
+    async def _request_data_from_statemon(self, sensor_id: int) -> Dict[str, Any]:
+        """Получить данные из state_monitoring_api"""
+        try:
+            data = await self.statemon_client.get_data(sensor_id)
+            log_sampled(logger, "Data from state_monitoring_api for sensor %s: %s", sensor_id, data)
+            return data
+        except Exception as e:
+            logger.error("Error getting data from state_monitoring_api for sensor %s: %s", sensor_id, e)
+            return {}
+
+    async def get_data_many_from_statemon(self, sensor_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Получить данные для нескольких датчиков из state_monitoring_api пачками"""
+        try:
+            readings = await self.statemon_client.get_data_many(sensor_ids)
+            for sensor_id, data in readings.items():
+                self.reading_cache.put(sensor_id, data)
+            return readings
+        except BatchNotSupportedError:
+            return await self.get_data_concurrently_from_statemon(sensor_ids)
+        except Exception as e:
+            logger.error("Error getting batch data from state_monitoring_api for %s sensors: %s", len(sensor_ids), e)
+            return {}
+
+    async def get_data_concurrently_from_statemon(self, sensor_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Получить данные из state_monitoring_api параллельными запросами по одному датчику
+
+        Датчики, для которых ответ не пришел до общего дедлайна, в результат не попадают.
+        """
+        semaphore = asyncio.Semaphore(self.statemon_max_concurrency)
+
+        async def fetch(sensor_id: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.get_data_from_statemon(sensor_id)
+
+        tasks = {
+            asyncio.ensure_future(fetch(sensor_id)): sensor_id
+            for sensor_id in dict.fromkeys(sensor_ids)
+        }
+        if not tasks:
+            return {}
+        done, not_done = await asyncio.wait(tasks, timeout=self.statemon_deadline)
+        for task in not_done:
+            task.cancel()
+        if not_done:
+            logger.warning(
+                "state_monitoring_api deadline %ss exceeded: %s of %s sensors without data",
+                self.statemon_deadline, len(not_done), len(tasks),
+            )
+        # В порядке sensor_ids, а не в порядке завершения
+        return {sensor_id: task.result() for task, sensor_id in tasks.items() if task in done}
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Счетчики кэша показаний"""
+        return self.reading_cache.stats()
+
+    def get_location_index_stats(self) -> Dict[str, int]:
+        """Счетчики индекса локаций"""
+        return self.location_index.stats()
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Счетчики пулов подключений к БД"""
+        return self.repository.get_pool_stats()
+
+    async def get_sensors(self) -> List[Dict[str, Any]]:
+        """Получить все сенсоры"""
+        sensors = await self.repository.get_sensors()
+        if not sensors:
+            return []
+
+        return await self._enrich_sensors(sensors)
+
+    async def get_sensors_conditional(
+        self,
+        not_modified: Callable[[Validators], bool],
+    ) -> Tuple[Validators, Optional[List[Dict[str, Any]]]]:
+        """Получить все сенсоры для условного GET (как SensorService.get_sensors_conditional)"""
+        version = await self.repository.get_sensors_version()
+        validators = self.list_validators.get(version)
+        if validators is not None and not_modified(validators):
+            return validators, None
+
+        sensors = await self.repository.get_sensors()
+        readings = await self.get_data_many_from_statemon([sensor.id for sensor in sensors]) if sensors else {}
+        validators = sensors_validators(version, readings)
+        self.list_validators.put(version, validators)
+        if not_modified(validators):
+            return validators, None
+        return validators, build_sensor_responses(sensors, readings)
+
+    async def iter_sensor_chunks(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Получить все сенсоры пачками: каждая пачка читается из БД и дополняется данными отдельно"""
+        async for sensors in self.repository.iter_sensors(self.stream_chunk_size):
+            yield await self._enrich_sensors(sensors)
+
+    async def get_sensors_page(
+        self,
+        after_id: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Получить страницу сенсоров (keyset пагинация по id)"""
+        columns = page_columns(after_id, limit, fields)
+
+        # Запрашиваем на одну строку больше, чтобы понять, есть ли следующая страница
+        sensors = await self.repository.get_sensors_page(after_id, limit + 1, columns)
+        readings = {}
+        if needs_readings(fields):
+            readings = await self.get_data_many_from_statemon([sensor.id for sensor in sensors[:limit]])
+        return build_page(sensors, readings, limit, fields)
+
+    async def _enrich_sensors(self, sensors: List[SensorRow]) -> List[Dict[str, Any]]:
+        """Дополнить сенсоры данными из state_monitoring_api"""
+        readings = await self.get_data_many_from_statemon([sensor.id for sensor in sensors])
+        return build_sensor_responses(sensors, readings)
+
+    async def create_sensor(self, data: dict) -> Dict[str, Any]:
+        """Создать новый датчик"""
+        db_data = prepare_create(data)
+        created_sensor = await self.repository.create_sensor(db_data)
+        self.location_index.invalidate_location(created_sensor.location)
+
+        data = await self.get_data_from_statemon(created_sensor.id)
+        return build_sensor_response(created_sensor, data)
+
+    async def get_sensor_by_id(self, sensor_id: int) -> Dict[str, Any]:
+        """Получить датчик по ID"""
+        validate_sensor_id(sensor_id)
+
+        sensor, data = await self._get_sensor_state(sensor_id)
+        return build_sensor_response(sensor, data)
+
+    async def get_sensor_by_id_conditional(
+        self,
+        sensor_id: int,
+        not_modified: Callable[[Validators], bool],
+    ) -> Tuple[Validators, Optional[Dict[str, Any]]]:
+        """Получить датчик по ID для условного GET (None вместо датчика - достаточно 304)"""
+        validate_sensor_id(sensor_id)
+
+        sensor, data = await self._get_sensor_state(sensor_id)
+        validators = sensor_validators(sensor, data)
+        if not_modified(validators):
+            return validators, None
+        return validators, build_sensor_response(sensor, data)
+
+    async def _get_sensor_state(self, sensor_id: int) -> Tuple[SensorRow, Dict[str, Any]]:
+        """Строка датчика и его показания"""
+        # Одновременные запросы одного датчика разделяют один запрос в БД и один в state_monitoring_api
+        return await self.single_flight.do(('sensor', sensor_id), lambda: self._load_sensor_state(sensor_id))
+
+    async def _load_sensor_state(self, sensor_id: int) -> Tuple[SensorRow, Dict[str, Any]]:
+        """Загрузить строку датчика и его показания"""
+        sensor = await self.repository.get_sensor_by_id(sensor_id)
+        return sensor, await self.get_data_from_statemon(sensor_id)
+
+    async def update_sensor(self, sensor_id: int, data: dict) -> Dict[str, Any]:
+        """Обновить датчик"""
+        validate_sensor_id(sensor_id)
+        db_data = prepare_update(data)
+
+        updated_sensor = await self.repository.update_sensor(sensor_id, db_data)
+        self._invalidate_locations([updated_sensor])
+        data = await self.get_data_from_statemon(sensor_id)
+        return build_sensor_response(updated_sensor, data)
+
+    async def get_sensor_by_location(self, location: str) -> Optional[Dict[str, Any]]:
+        """Получить первый датчик локации с данными из state_monitoring_api"""
+        sensors = await self._get_location_sensors(location)
+        data = await self.get_data_from_statemon(sensors[0].id)
+        return build_location_response(sensors[0], data, location)
+
+    async def get_sensors_by_location(self, location: str) -> List[Dict[str, Any]]:
+        """Получить все датчики локации с данными из state_monitoring_api"""
+        sensors = await self._get_location_sensors(location)
+        readings = await self.get_data_many_from_statemon([sensor.id for sensor in sensors])
+        responses = (build_location_response(sensor, readings.get(sensor.id, {}), location) for sensor in sensors)
+        return [response for response in responses if response is not None]
+
+    async def _get_location_sensors(self, location: str) -> List[SensorRow]:
+        """Датчики локации через индекс локаций (без обращения к БД, если локация уже загружена)"""
+        validate_location(location)
+
+        sensors = await self.location_index.get_async(
+            location, self.repository.get_sensors_by_location, self.repository.get_sensors_version
+        )
+        if not sensors:
+            raise NotFoundError(f"Sensor with location {location} not found")
+        return sensors
+
+    def _invalidate_locations(self, sensors: List[SensorRow]) -> None:
+        """Инвалидировать в индексе прежние и новые локации измененных датчиков"""
+        for sensor in sensors:
+            self.location_index.invalidate_sensor(sensor.id)
+            self.location_index.invalidate_location(sensor.location)
+
+    async def delete_sensor(self, sensor_id: int) -> bool:
+        """Удалить датчик"""
+        validate_sensor_id(sensor_id)
+
+        deleted = await self.repository.delete_sensor(sensor_id)
+        self.reading_cache.invalidate(sensor_id)
+        self.location_index.invalidate_sensor(sensor_id)
+        return deleted
+
+    async def create_sensors(self, items: list) -> Dict[str, Any]:
+        """Создать несколько датчиков одной транзакцией"""
+        db_rows, errors = parse_bulk_create(items)
+        created = await self.repository.create_sensors(db_rows) if db_rows else []
+        for sensor in created:
+            self.location_index.invalidate_location(sensor.location)
+        return {"items": await self._enrich_sensors(created), "errors": errors}
+
+    async def update_sensors(self, items: list) -> Dict[str, Any]:
+        """Обновить несколько датчиков одной транзакцией"""
+        updates, indexes, errors = parse_bulk_update(items)
+        updated = await self.repository.update_sensors(updates) if updates else []
+        self._invalidate_locations(updated)
+        errors = add_not_found_errors(indexes, {sensor.id for sensor in updated}, errors)
+        return {"items": await self._enrich_sensors(updated), "errors": errors}
+
+    async def delete_sensors(self, sensor_ids: list) -> Dict[str, Any]:
+        """Удалить несколько датчиков одной транзакцией"""
+        indexes, errors = parse_bulk_delete(sensor_ids)
+        deleted = await self.repository.delete_sensors(list(indexes)) if indexes else []
+        for sensor_id in deleted:
+            self.reading_cache.invalidate(sensor_id)
+            self.location_index.invalidate_sensor(sensor_id)
+
+        errors = add_not_found_errors(indexes, set(deleted), errors)
+        return {"deleted": sorted(deleted), "errors": errors}
@@ -0,0 +1,116 @@
+"""Валидаторы (ETag, Last-Modified) для условных GET"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+from repositories.rows import SensorRow
+
+
+class Validators(NamedTuple):
+    """Валидаторы представления ресурса"""
+
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def _digest(value: Any) -> str:
+    """Короткий хеш, одинаковый во всех процессах (в отличие от hash())"""
+    return hashlib.blake2b(repr(value).encode(), digest_size=8).hexdigest()
+
+
+def _utc(value: Any) -> Optional[datetime]:
+    """datetime или строка ISO 8601 в UTC (время без зоны считается UTC, как в http_date)"""
+    if type(value) is str:
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _reading_version(data: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Версия показания: запись state_monitoring_api (id, время) и поля, попадающие в ответ"""
+    return data.get('id'), data.get('created_at'), data.get('value'), data.get('unit'), data.get('status')
+
+
+def sensor_validators(sensor: SensorRow, data: Dict[str, Any]) -> Validators:
+    """
+    Валидаторы ответа с датчиком
+
+    ETag зависит от строки датчика (в том числе last_updated) и версии показания,
+    Last-Modified - позднее из last_updated и времени показания.
+    """
+    times = (_utc(sensor.last_updated), _utc(data.get('created_at')))
+    return Validators(
+        _digest((tuple(sensor), _reading_version(data))),
+        max((value for value in times if value is not None), default=None),
+    )
+
+
+def sensors_validators(version: Tuple[Any, ...], readings: Dict[int, Dict[str, Any]]) -> Validators:
+    """
+    Валидаторы списка всех датчиков
+
+    Args:
+        version: Версия таблицы sensors (количество, max(id), max(last_updated))
+        readings: Показания датчиков списка
+    """
+    times = [_utc(version[-1])]
+    times.extend(_utc(data.get('created_at')) for data in readings.values())
+    # По ID, а не в порядке словаря: при параллельных запросах показания приходят в случайном порядке
+    return Validators(
+        _digest((version, [(sensor_id, _reading_version(data)) for sensor_id, data in sorted(readings.items())])),
+        max((value for value in times if value is not None), default=None),
+    )
+
+
+def is_not_modified(validators: Validators, if_none_match: Any, if_modified_since: Optional[datetime]) -> bool:
+    """
+    Можно ли ответить 304 Not Modified
+
+    If-None-Match (слабое сравнение) важнее If-Modified-Since, как в RFC 9110.
+
+    Args:
+        validators: Валидаторы текущего представления
+        if_none_match: ETags из заголовка If-None-Match (werkzeug.datastructures.ETags)
+        if_modified_since: Время из заголовка If-Modified-Since (UTC) или None
+    """
+    if if_none_match:
+        return if_none_match.contains_weak(validators.etag)
+    if if_modified_since is not None and validators.last_modified is not None:
+        return validators.last_modified.replace(microsecond=0) <= if_modified_since
+    return False
+
+
+class ValidatorsMemo:
+    """
+    Валидаторы последней полной выдачи ресурса
+
+    Пока версия данных в БД не изменилась и не прошло ttl секунд (показания
+    считаются свежими столько же, сколько в кэше показаний), клиенту с этими
+    валидаторами можно ответить 304, не собирая ответ.
+    """
+
+    def __init__(self, ttl: float = 5.0):
+        """
+        Args:
+            ttl: Сколько секунд валидаторы действительны без повторной сборки ответа
+        """
+        self.ttl = ttl
+        self._entry: Optional[Tuple[Hashable, Validators, float]] = None
+
+    def get(self, version: Hashable) -> Optional[Validators]:
+        """Валидаторы для версии данных, если они еще действительны"""
+        entry = self._entry
+        if entry is not None and entry[0] == version and time.monotonic() - entry[2] < self.ttl:
+            return entry[1]
+        return None
+
+    def put(self, version: Hashable, validators: Validators) -> None:
+        """Запомнить валидаторы полной выдачи"""
+        self._entry = (version, validators, time.monotonic())
@@ -0,0 +1,439 @@
+"""Общая логика сервисного слоя без ввода-вывода (используется синхронным и асинхронным сервисами)"""
+
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+from repositories.repository import SENSOR_COLUMNS
+from repositories.rows import SensorRow
+from models.schemas import (
+    SensorCreate,
+    SensorUpdate,
+    SensorResponse,
+    SensorByLocationResponse,
+    SensorType,
+    SensorStatus,
+)
+from pydantic import ValidationError as PydanticValidationError
+from exceptions import ValidationError
+from metrics import STAGES
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Пагинация списка сенсоров
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Максимальное количество элементов в одном bulk-запросе
+MAX_BULK_ITEMS = 1000
+
+# Поля сенсора: колонки таблицы sensors и показания из state_monitoring_api
+READING_FIELDS = ('value', 'unit', 'status')
+DATETIME_FIELDS = ('last_updated', 'created_at')
+SENSOR_FIELDS = SENSOR_COLUMNS + READING_FIELDS
+
+SENSOR_TYPES = frozenset(sensor_type.value for sensor_type in SensorType)
+SENSOR_STATUSES = frozenset(status.value for status in SensorStatus)
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+@lru_cache(maxsize=4096)
+def _http_day(day: date) -> str:
+    """Часть даты HTTP до времени (у соседних строк обычно совпадает)"""
+    return f"{_WEEKDAYS[day.weekday()]}, {day.day:02d} {_MONTHS[day.month - 1]} {day.year:04d} "
+
+
+def http_date(value: Any) -> Optional[str]:
+    """
+    Дата в формате HTTP (RFC 822), как ее выводит jsonify
+
+    Принимает datetime или строку ISO 8601; время без зоны считается UTC.
+    """
+    if value is None:
+        return None
+    if type(value) is str:
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None and value.tzinfo is not timezone.utc:
+        value = value.astimezone(timezone.utc)
+    return _http_day(value.date()) + '%02d:%02d:%02d GMT' % (value.hour, value.minute, value.second)
+
+
+def _reading_fields(data: Dict[str, Any]) -> Optional[Tuple[Optional[float], Optional[str], Optional[str]]]:
+    """
+    Показания (value, unit, status), если они заведомо проходят валидацию моделей ответа
+
+    None означает, что показания нужно проверить моделью pydantic.
+    """
+    value = data.get('value', None)
+    unit = data.get('unit', None)
+    status = data.get('status', None)
+    if type(value) is int:
+        value = float(value)
+    elif value is not None and type(value) is not float:
+        return None
+    if unit is not None and not (type(unit) is str and 1 <= len(unit) <= 20):
+        return None
+    if status is not None and not (type(status) is str and status in SENSOR_STATUSES):
+        return None
+    return value, unit, status
+
+
+def _is_plain_sensor(sensor: SensorRow) -> bool:
+    """Строка сенсора из БД заведомо проходит валидацию SensorResponse"""
+    name = sensor.name
+    location = sensor.location
+    return (
+        type(sensor.id) is int
+        and type(name) is str and 1 <= len(name) <= 100
+        and type(location) is str and 1 <= len(location) <= 200
+        and sensor.type in SENSOR_TYPES
+    )
+
+
+def validate_sensor_id(sensor_id: Any) -> None:
+    """Проверка ID сенсора"""
+    if not isinstance(sensor_id, int) or sensor_id <= 0:
+        raise ValidationError("Invalid sensor ID")
+
+
+def validate_location(location: Any) -> None:
+    """Проверка локации"""
+    if not location or not isinstance(location, str):
+        raise ValidationError("Invalid location")
+
+
+def prepare_create(data: dict, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Валидация данных нового датчика и подготовка строки для БД
+
+    Raises:
+        ValidationError: При невалидных данных
+    """
+    try:
+        sensor_data = SensorCreate(**data)
+    except PydanticValidationError as e:
+        raise ValidationError(f"Invalid input data: {str(e)}")
+
+    db_data = sensor_data.model_dump(mode='python')
+    now = now or datetime.now()
+    db_data['last_updated'] = now
+    db_data['created_at'] = now
+    db_data['type'] = str(db_data['type'].value)
+    return db_data
+
+
+def prepare_update(data: dict) -> Dict[str, Any]:
+    """
+    Валидация обновляемых полей датчика и подготовка данных для БД
+
+    Raises:
+        ValidationError: При невалидных данных или отсутствии полей
+    """
+    try:
+        sensor_data = SensorUpdate(**data)
+    except PydanticValidationError as e:
+        raise ValidationError(f"Invalid input data: {str(e)}")
+
+    db_data = {k: v for k, v in sensor_data.model_dump(mode='python').items() if v is not None}
+
+    if not db_data:
+        raise ValidationError("No fields to update")
+
+    if 'type' in db_data:
+        db_data['type'] = str(db_data['type'].value)
+    return db_data
+
+
+def page_columns(after_id: int, limit: int, fields: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    Проверка параметров страницы
+
+    Returns:
+        Колонки для выборки из БД (None - все колонки)
+    """
+    if after_id < 0:
+        raise ValidationError("Invalid after_id")
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if fields is None:
+        return None
+    if not fields:
+        raise ValidationError("fields must not be empty")
+    unknown = [field for field in fields if field not in SENSOR_FIELDS]
+    if unknown:
+        raise ValidationError(f"Unknown fields: {', '.join(unknown)}")
+    return ['id'] + [field for field in SENSOR_COLUMNS if field in fields and field != 'id']
+
+
+def needs_readings(fields: Optional[List[str]]) -> bool:
+    """Нужны ли для полей данные из state_monitoring_api"""
+    return fields is None or any(field in READING_FIELDS for field in fields)
+
+
+@STAGES.timed("build_response")
+def build_sensor_response(sensor: SensorRow, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Ответ с сенсором и его показаниями, готовый к кодированию в JSON"""
+    return _sensor_response(sensor, data)
+
+
+def _sensor_response(sensor: SensorRow, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ответ с сенсором и его показаниями
+
+    Обычные строки собираются в словарь напрямую, остальные проверяются SensorResponse
+    (с теми же ошибками валидации). Даты сразу форматируются так, как их выводит jsonify.
+    """
+    reading = _reading_fields(data)
+    if reading is not None and _is_plain_sensor(sensor):
+        try:
+            last_updated = http_date(sensor.last_updated)
+            created_at = http_date(sensor.created_at)
+        except (TypeError, ValueError, AttributeError):
+            pass
+        else:
+            if last_updated is not None and created_at is not None:
+                value, unit, status = reading
+                return {
+                    'id': sensor.id,
+                    'name': sensor.name,
+                    'type': sensor.type,
+                    'location': sensor.location,
+                    'unit': unit,
+                    'value': value,
+                    'status': status,
+                    'last_updated': last_updated,
+                    'created_at': created_at,
+                }
+
+    sensor_response = SensorResponse(
+        **sensor._asdict(),
+        value=data.get('value', None),
+        unit=data.get('unit', None),
+        status=data.get('status', None),
+    )
+    return {
+        'id': sensor_response.id,
+        'name': sensor_response.name,
+        'type': sensor_response.type.value,
+        'location': sensor_response.location,
+        'unit': sensor_response.unit,
+        'value': sensor_response.value,
+        'status': sensor_response.status.value if sensor_response.status else None,
+        'last_updated': http_date(sensor_response.last_updated),
+        'created_at': http_date(sensor_response.created_at),
+    }
+
+
+@STAGES.timed("build_responses")
+def build_sensor_responses(
+    sensors: List[SensorRow],
+    readings: Dict[int, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Ответы для списка сенсоров (сенсоры, для которых не удалось собрать ответ, пропускаются)"""
+    result = []
+    for sensor in sensors:
+        try:
+            result.append(_sensor_response(sensor, readings.get(sensor.id, {})))
+        except Exception as e:
+            logger.error("Error creating SensorResponse for sensor %s: %s", sensor.id, e)
+            continue
+    return result
+
+
+def project_sensors(
+    sensors: List[Any],
+    readings: Dict[int, Dict[str, Any]],
+    fields: List[str],
+) -> List[Dict[str, Any]]:
+    """Оставить у сенсоров (именованных кортежей с выбранными колонками) только запрошенные поля"""
+    result = []
+    for sensor in sensors:
+        data = readings.get(sensor.id, {})
+        item = {}
+        for field in fields:
+            if field in READING_FIELDS:
+                item[field] = data.get(field, None)
+            elif field in DATETIME_FIELDS:
+                item[field] = http_date(getattr(sensor, field))
+            else:
+                item[field] = getattr(sensor, field)
+        result.append(item)
+    return result
+
+
+def build_page(
+    sensors: List[Any],
+    readings: Dict[int, Dict[str, Any]],
+    limit: int,
+    fields: Optional[List[str]],
+) -> Dict[str, Any]:
+    """
+    Страница сенсоров
+
+    Args:
+        sensors: Сенсоры, запрошенные с limit + 1 (лишняя строка означает, что есть следующая страница)
+    """
+    next_cursor = sensors[limit - 1].id if len(sensors) > limit else None
+    sensors = sensors[:limit]
+    if fields is None:
+        items = build_sensor_responses(sensors, readings)
+    else:
+        items = project_sensors(sensors, readings, fields)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _location_description(value: Optional[float]) -> str:
+    """Описание показания для ответа по локации"""
+    if value is None:
+        return "description for value is None"
+    if value > 25:
+        return "description for value > 25"
+    if value < 20:
+        return "description for value < 20"
+    return "description for value between 20 and 25"
+
+
+def build_location_response(sensor: SensorRow, data: Dict[str, Any], location: str) -> Optional[Dict[str, Any]]:
+    """Ответ с данными датчика по локации (None, если ответ собрать не удалось)"""
+    try:
+        reading = _reading_fields(data)
+        if (
+            reading is not None
+            and type(location) is str and 1 <= len(location) <= 200
+            and sensor.type in SENSOR_TYPES
+        ):
+            try:
+                timestamp = http_date(sensor.created_at)
+            except (TypeError, ValueError, AttributeError):
+                pass
+            else:
+                value, unit, status = reading
+                return {
+                    'value': value,
+                    'unit': unit,
+                    'status': status,
+                    'timestamp': timestamp,
+                    'description': _location_description(value),
+                    'sensor_id': str(sensor.id),
+                    'sensor_type': sensor.type,
+                    'location': location,
+                }
+
+        value = data.get('value', None)
+        sensor_response = SensorByLocationResponse(
+            value=value,
+            unit=data.get('unit', None),
+            status=data.get('status', None),
+            timestamp=sensor.created_at,
+            description=_location_description(value),
+            sensor_id=str(sensor.id),
+            sensor_type=sensor.type,
+            location=location,
+        )
+        return {
+            'value': sensor_response.value,
+            'unit': sensor_response.unit,
+            'status': sensor_response.status.value if sensor_response.status else None,
+            'timestamp': http_date(sensor_response.timestamp),
+            'description': sensor_response.description,
+            'sensor_id': sensor_response.sensor_id,
+            'sensor_type': sensor_response.sensor_type.value,
+            'location': sensor_response.location,
+        }
+    except Exception as e:
+        logger.error("Error creating SensorByLocationResponse for sensor %s: %s", sensor.id, e)
+        return None
+
+
+def validate_bulk(items: Any) -> None:
+    """Проверка тела bulk-запроса"""
+    if not isinstance(items, list) or not items:
+        raise ValidationError("Request body must be a non-empty JSON array")
+    if len(items) > MAX_BULK_ITEMS:
+        raise ValidationError(f"Too many items: {len(items)} (max {MAX_BULK_ITEMS})")
+
+
+def _is_sensor_id(sensor_id: Any) -> bool:
+    return isinstance(sensor_id, int) and not isinstance(sensor_id, bool) and sensor_id > 0
+
+
+def parse_bulk_create(items: list) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Валидация элементов bulk-создания
+
+    Returns:
+        Строки для БД и ошибки по индексам
+    """
+    validate_bulk(items)
+
+    errors = []
+    db_rows = []
+    now = datetime.now()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "Item must be a JSON object"})
+            continue
+        try:
+            db_rows.append(prepare_create(item, now))
+        except ValidationError as e:
+            errors.append({"index": index, "error": e.message})
+    return db_rows, errors
+
+
+def parse_bulk_update(items: list) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, int], List[Dict[str, Any]]]:
+    """
+    Валидация элементов bulk-обновления
+
+    Returns:
+        Обновления по ID, индексы элементов по ID и ошибки по индексам
+    """
+    validate_bulk(items)
+
+    errors = []
+    updates = {}
+    indexes = {}
+    for index, item in enumerate(items):
+        sensor_id = item.get('id') if isinstance(item, dict) else None
+        if not _is_sensor_id(sensor_id):
+            errors.append({"index": index, "error": "Invalid sensor ID"})
+            continue
+        if sensor_id in updates:
+            errors.append({"index": index, "error": f"Duplicate sensor ID {sensor_id}"})
+            continue
+        try:
+            updates[sensor_id] = prepare_update({k: v for k, v in item.items() if k != 'id'})
+        except ValidationError as e:
+            errors.append({"index": index, "error": e.message})
+            continue
+        indexes[sensor_id] = index
+    return updates, indexes, errors
+
+
+def parse_bulk_delete(sensor_ids: list) -> Tuple[Dict[int, int], List[Dict[str, Any]]]:
+    """
+    Валидация ID для bulk-удаления
+
+    Returns:
+        Индексы элементов по ID и ошибки по индексам
+    """
+    validate_bulk(sensor_ids)
+
+    errors = []
+    indexes = {}
+    for index, sensor_id in enumerate(sensor_ids):
+        if not _is_sensor_id(sensor_id):
+            errors.append({"index": index, "error": "Invalid sensor ID"})
+            continue
+        indexes.setdefault(sensor_id, index)
+    return indexes, errors
+
+
+def add_not_found_errors(indexes: Dict[int, int], found_ids: set, errors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Добавить ошибки для ненайденных ID и отсортировать ошибки по индексу"""
+    for sensor_id, index in indexes.items():
+        if sensor_id not in found_ids:
+            errors.append({"index": index, "error": f"Sensor with id {sensor_id} not found"})
+    errors.sort(key=lambda error: error['index'])
+    return errors
@@ -0,0 +1,181 @@
+"""Индекс локация -> сенсоры в памяти процесса"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from repositories.rows import SensorRow
+import logging
+
+logger = logging.getLogger(__name__)
+
+Rows = List[SensorRow]
+# Версия таблицы sensors: (количество, max(id), max(last_updated))
+TableVersion = Tuple[Any, ...]
+
+
+class LocationIndex:
+    """
+    Сенсоры по локации с инвалидацией при записи
+
+    Для каждой загруженной локации хранятся строки всех ее сенсоров (по возрастанию id),
+    так что повторный запрос локации не обращается к БД. Сервис инвалидирует локацию
+    при создании, изменении и удалении сенсоров в своем процессе.
+
+    Записи, сделанные другими воркерами, видны по версии таблицы sensors (количество,
+    max(id), max(last_updated) - меняется при любом создании, изменении и удалении).
+    Перед выдачей из индекса версия перечитывается не чаще раза в version_interval
+    секунд; если она изменилась, индекс очищается целиком, включая запомненные
+    пустые локации. Поэтому изменения из других процессов видны не позже чем через
+    version_interval, а ttl только ограничивает время жизни записи. При превышении
+    max_locations вытесняется давно не использованная локация.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_locations: int = 10000, version_interval: float = 1.0):
+        """
+        Args:
+            ttl: Время жизни записи в секундах
+            max_locations: Максимальное количество локаций в индексе
+            version_interval: Как часто перечитывать версию таблицы в секундах
+        """
+        self.ttl = ttl
+        self.max_locations = max_locations
+        self.version_interval = version_interval
+        self._table_version: Optional[TableVersion] = None
+        # Время последней проверки версии таблицы (до первой проверки индекс пуст)
+        self._checked_at: Optional[float] = None
+        self._entries: "OrderedDict[str, Tuple[Rows, float]]" = OrderedDict()
+        self._locations_by_id: Dict[int, str] = {}
+        # Увеличивается при каждой инвалидации: загрузка, начатая до нее, не сохраняется
+        self._version = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, location: str) -> Tuple[bool, Rows, int]:
+        """
+        Поиск локации
+
+        Returns:
+            (найдено, сенсоры, версия индекса на момент поиска)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(location)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(location)
+                self.hits += 1
+                return True, entry[0], self._version
+            self.misses += 1
+            return False, [], self._version
+
+    def _version_check_due(self) -> bool:
+        """Пора ли перечитать версию таблицы (проверку выполняет один из одновременных запросов)"""
+        now = time.monotonic()
+        with self._lock:
+            if self._checked_at is not None and now - self._checked_at < self.version_interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def _apply_table_version(self, table_version: TableVersion) -> None:
+        """Очистить индекс, если таблица изменилась с прошлой проверки"""
+        with self._lock:
+            if table_version == self._table_version:
+                return
+            self._table_version = table_version
+            self._version += 1
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._locations_by_id.clear()
+
+    def get(
+        self,
+        location: str,
+        loader: Callable[[str], Rows],
+        version_loader: Callable[[], TableVersion],
+    ) -> Rows:
+        """
+        Сенсоры локации из индекса или загруженные через loader
+
+        Args:
+            location: Локация
+            loader: Загрузка сенсоров локации из БД
+            version_loader: Чтение версии таблицы sensors
+        """
+        # Версия читается до загрузки строк: строки не старше запомненной версии
+        if self._version_check_due():
+            self._apply_table_version(version_loader())
+        found, rows, version = self._lookup(location)
+        if found:
+            return rows
+
+        rows = loader(location)
+        self._put(location, rows, version)
+        return rows
+
+    async def get_async(
+        self,
+        location: str,
+        loader: Callable[[str], Awaitable[Rows]],
+        version_loader: Callable[[], Awaitable[TableVersion]],
+    ) -> Rows:
+        """Асинхронный вариант get"""
+        if self._version_check_due():
+            self._apply_table_version(await version_loader())
+        found, rows, version = self._lookup(location)
+        if found:
+            return rows
+
+        rows = await loader(location)
+        self._put(location, rows, version)
+        return rows
+
+    def _put(self, location: str, rows: Rows, version: int) -> None:
+        """Сохранить загруженную локацию, если с начала загрузки не было инвалидаций"""
+        with self._lock:
+            if version != self._version:
+                return
+            self._drop(location)
+            self._entries[location] = (rows, time.monotonic())
+            for row in rows:
+                self._locations_by_id[row.id] = location
+            while len(self._entries) > self.max_locations:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, location: str) -> None:
+        """Удалить локацию вместе с обратными ссылками (вызывается под блокировкой)"""
+        entry = self._entries.pop(location, None)
+        if entry is not None:
+            for row in entry[0]:
+                if self._locations_by_id.get(row.id) == location:
+                    del self._locations_by_id[row.id]
+
+    def invalidate_location(self, location: str) -> None:
+        """Инвалидировать локацию (сенсор создан в ней или перенесен в нее)"""
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            self._drop(location)
+
+    def invalidate_sensor(self, sensor_id: int) -> None:
+        """Инвалидировать локацию, в которой индекс видел сенсор (сенсор изменен или удален)"""
+        with self._lock:
+            self._version += 1
+            self.invalidations += 1
+            location = self._locations_by_id.get(sensor_id)
+            if location is not None:
+                self._drop(location)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики индекса"""
+        with self._lock:
+            return {
+                "locations": len(self._entries),
+                "sensors": len(self._locations_by_id),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
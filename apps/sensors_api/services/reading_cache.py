@@ -0,0 +1,157 @@
+"""Read-through кэш показаний датчиков (TTL + LRU + stale-while-revalidate)"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ReadingCache:
+    """
+    Кэш показаний с ограничением по времени жизни и количеству записей
+
+    Запись моложе ttl отдается из кэша. Запись старше ttl, но моложе ttl + stale_ttl
+    тоже отдается сразу, а в фоне запускается одно обновление на ключ.
+    Более старые записи и промахи загружаются синхронно. При превышении
+    max_entries вытесняется давно не использованная запись.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 5.0,
+        stale_ttl: float = 30.0,
+        max_entries: int = 10000,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        Args:
+            ttl: Время жизни свежей записи в секундах
+            stale_ttl: Сколько секунд после ttl запись еще можно отдавать, обновляя в фоне
+            max_entries: Максимальное количество записей
+            executor: Пул для фоновых обновлений (без него устаревшие записи обновляются синхронно)
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.executor = executor
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._refreshing = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refreshes = 0
+
+    def _lookup(self, key: Hashable, can_refresh: bool) -> Tuple[bool, Any, bool]:
+        """
+        Поиск записи с учетом счетчиков
+
+        Returns:
+            (найдено, значение, нужно запустить фоновое обновление)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, False
+                if age < self.ttl + self.stale_ttl and can_refresh:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    refresh = key not in self._refreshing
+                    if refresh:
+                        self._refreshing.add(key)
+                    return True, value, refresh
+            self.misses += 1
+            return False, None, False
+
+    def get(self, key: Hashable, loader: Callable[[Hashable], Dict[str, Any]]) -> Dict[str, Any]:
+        """Получить значение из кэша или загрузить его через loader"""
+        found, value, refresh = self._lookup(key, self.executor is not None)
+        if refresh:
+            self.executor.submit(self._refresh, key, loader)
+        if found:
+            return value
+
+        value = loader(key)
+        self.put(key, value)
+        return value
+
+    async def get_async(self, key: Hashable, loader: Callable[[Hashable], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Асинхронный вариант get: loader - корутина, фоновое обновление - задача event loop"""
+        found, value, refresh = self._lookup(key, True)
+        if refresh:
+            task = asyncio.get_running_loop().create_task(self._refresh_async(key, loader))
+            # Храним ссылку, чтобы задачу не собрал сборщик мусора до завершения
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if found:
+            return value
+
+        value = await loader(key)
+        self.put(key, value)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[Hashable], Dict[str, Any]]) -> None:
+        """Фоновое обновление устаревшей записи"""
+        try:
+            self.put(key, loader(key))
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            logger.error("Error refreshing cached reading for %s: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _refresh_async(self, key: Hashable, loader: Callable[[Hashable], Awaitable[Dict[str, Any]]]) -> None:
+        """Фоновое обновление устаревшей записи в event loop"""
+        try:
+            self.put(key, await loader(key))
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            logger.error("Error refreshing cached reading for %s: %s", key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def put(self, key: Hashable, value: Dict[str, Any]) -> None:
+        """Сохранить значение (пустые ответы не кэшируются, чтобы не закреплять ошибки upstream)"""
+        if not value:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """Удалить запись из кэша"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики кэша"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "refreshes": self.refreshes,
+            }
@@ -1,13 +1,35 @@
 """Сервисный слой данных"""
 
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
 from repositories.repository import PostgresRepository
-from models.schemas import SensorCreate, SensorUpdate, SensorResponse, SensorByLocationResponse
-from pydantic import ValidationError as PydanticValidationError
-from exceptions import ValidationError
+from repositories.rows import SensorRow
+from services.helpers import (
+    DEFAULT_PAGE_SIZE,
+    validate_sensor_id,
+    validate_location,
+    prepare_create,
+    prepare_update,
+    page_columns,
+    needs_readings,
+    build_sensor_response,
+    build_sensor_responses,
+    build_page,
+    build_location_response,
+    parse_bulk_create,
+    parse_bulk_update,
+    parse_bulk_delete,
+    add_not_found_errors,
+)
 import logging
-from senders.statemon_client import StateMonitoringClient
+from senders.statemon_client import StateMonitoringClient, BatchNotSupportedError
+from services.reading_cache import ReadingCache
+from services.single_flight import SingleFlight
+from services.location_index import LocationIndex
+from services.conditional import Validators, ValidatorsMemo, sensor_validators, sensors_validators
+from request_log import log_sampled
+from exceptions import NotFoundError
 
 logger = logging.getLogger(__name__)
 
@@ -15,42 +37,197 @@ logger = logging.getLogger(__name__)
 class SensorService:
     """Сервисный слой для работы с сенсорами"""
     
-    def __init__(self, repository: PostgresRepository, statemon_client: StateMonitoringClient):
+    def __init__(
+        self,
+        repository: PostgresRepository,
+        statemon_client: StateMonitoringClient,
+        statemon_max_workers: int = 16,
+        statemon_deadline: float = 5.0,
+        cache_ttl: float = 5.0,
+        cache_stale_ttl: float = 30.0,
+        cache_max_entries: int = 10000,
+        stream_chunk_size: int = 500,
+        location_index_ttl: float = 30.0,
+        location_index_max_locations: int = 10000,
+        location_index_version_interval: float = 1.0,
+    ):
+        """
+        Args:
+            repository: Репозиторий сенсоров
+            statemon_client: Клиент state_monitoring_api
+            statemon_max_workers: Размер пула потоков для параллельных запросов к state_monitoring_api
+            statemon_deadline: Общий дедлайн на получение данных для списка сенсоров в секундах
+            cache_ttl: Время жизни показаний в кэше в секундах
+            cache_stale_ttl: Сколько секунд после cache_ttl отдавать устаревшие показания, обновляя их в фоне
+            cache_max_entries: Максимальное количество датчиков в кэше показаний
+            stream_chunk_size: Количество сенсоров в одной пачке при потоковой выдаче списка
+            location_index_ttl: Время жизни локации в индексе локаций в секундах
+            location_index_max_locations: Максимальное количество локаций в индексе
+            location_index_version_interval: Как часто индекс локаций сверяет версию таблицы sensors
+                (изменения из других воркеров видны не позже этого интервала), в секундах
+        """
         self.repository = repository
         self.statemon_client = statemon_client
+        self.statemon_deadline = statemon_deadline
+        self.statemon_executor = ThreadPoolExecutor(
+            max_workers=statemon_max_workers, thread_name_prefix="statemon"
+        )
+        self.reading_cache = ReadingCache(
+            ttl=cache_ttl,
+            stale_ttl=cache_stale_ttl,
+            max_entries=cache_max_entries,
+            executor=self.statemon_executor,
+        )
+        self.single_flight = SingleFlight()
+        self.stream_chunk_size = stream_chunk_size
+        self.location_index = LocationIndex(
+            ttl=location_index_ttl,
+            max_locations=location_index_max_locations,
+            version_interval=location_index_version_interval,
+        )
+        # Показания списка считаются свежими столько же, сколько в кэше показаний
+        self.list_validators = ValidatorsMemo(ttl=cache_ttl)
     
     def get_data_from_statemon(self, sensor_id: int) -> Dict[str, Any]:
+        """Получить данные датчика через кэш показаний"""
+        return self.reading_cache.get(sensor_id, self._fetch_data_from_statemon)
+
+    def _fetch_data_from_statemon(self, sensor_id: int) -> Dict[str, Any]:
+        """Получить данные из state_monitoring_api (одновременные запросы одного датчика объединяются)"""
+        return self.single_flight.do(
+            ('reading', sensor_id), lambda: self._request_data_from_statemon(sensor_id)
+        )
+
+    def _request_data_from_statemon(self, sensor_id: int) -> Dict[str, Any]:
         """Получить данные из state_monitoring_api"""
         try:
             data = self.statemon_client.get_data(sensor_id)
-            logger.info(f"Data from state_monitoring_api: {data}")
+            log_sampled(logger, "Data from state_monitoring_api for sensor %s: %s", sensor_id, data)
             return data
         except Exception as e:
-            logger.error(f"Error getting data from state_monitoring_api for sensor {sensor_id}: {e}")
+            logger.error("Error getting data from state_monitoring_api for sensor %s: %s", sensor_id, e)
+            return {}
+
+    def get_data_many_from_statemon(self, sensor_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Получить данные для нескольких датчиков из state_monitoring_api пачками"""
+        try:
+            readings = self.statemon_client.get_data_many(sensor_ids)
+            for sensor_id, data in readings.items():
+                self.reading_cache.put(sensor_id, data)
+            return readings
+        except BatchNotSupportedError:
+            return self.get_data_concurrently_from_statemon(sensor_ids)
+        except Exception as e:
+            logger.error("Error getting batch data from state_monitoring_api for %s sensors: %s", len(sensor_ids), e)
             return {}
 
+    def get_data_concurrently_from_statemon(self, sensor_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Получить данные из state_monitoring_api параллельными запросами по одному датчику
+
+        Датчики, для которых ответ не пришел до общего дедлайна, в результат не попадают.
+        """
+        # Контекст запроса (request_id, длительности этапов) передается в потоки пула
+        futures = {
+            self.statemon_executor.submit(copy_context().run, self.get_data_from_statemon, sensor_id): sensor_id
+            for sensor_id in dict.fromkeys(sensor_ids)
+        }
+        done, not_done = wait(futures, timeout=self.statemon_deadline)
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            logger.warning(
+                "state_monitoring_api deadline %ss exceeded: %s of %s sensors without data",
+                self.statemon_deadline, len(not_done), len(futures),
+            )
+        # В порядке sensor_ids, а не в порядке завершения
+        return {sensor_id: future.result() for future, sensor_id in futures.items() if future in done}
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Счетчики кэша показаний"""
+        return self.reading_cache.stats()
+
+    def get_location_index_stats(self) -> Dict[str, int]:
+        """Счетчики индекса локаций"""
+        return self.location_index.stats()
+
+    def get_pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Счетчики пулов подключений к БД"""
+        return self.repository.get_pool_stats()
+
     def get_sensors(self) -> List[Dict[str, Any]]:
         """Получить все сенсоры"""
         sensors = self.repository.get_sensors()
         if not sensors:
             return []
         
-        result = []
-        for sensor in sensors:
-            data = self.get_data_from_statemon(sensor['id'])
+        return self._enrich_sensors(sensors)
+    
+    def get_sensors_conditional(
+        self,
+        not_modified: Callable[[Validators], bool],
+    ) -> Tuple[Validators, Optional[List[Dict[str, Any]]]]:
+        """
+        Получить все сенсоры для условного GET
+        
+        Сначала читается только версия таблицы (count, max(id), max(last_updated)). Если она
+        не менялась с последней полной выдачи и клиент уже имеет ее представление, список
+        не собирается и показания не запрашиваются.
+        
+        Args:
+            not_modified: Есть ли у клиента представление с данными валидаторами
             
-            try:
-                sensor_response = SensorResponse(
-                    **sensor,
-                    value=data.get('value', None),
-                    unit=data.get('unit', None),
-                    status=data.get('status', None),
-                )
-                result.append(sensor_response.model_dump())
-            except Exception as e:
-                logger.error(f"Error creating SensorResponse for sensor {sensor.get('id')}: {e}")
-                continue
-        return result
+        Returns:
+            Валидаторы и сенсоры (None, если клиенту достаточно 304 Not Modified)
+        """
+        version = self.repository.get_sensors_version()
+        validators = self.list_validators.get(version)
+        if validators is not None and not_modified(validators):
+            return validators, None
+        
+        sensors = self.repository.get_sensors()
+        readings = self.get_data_many_from_statemon([sensor.id for sensor in sensors]) if sensors else {}
+        validators = sensors_validators(version, readings)
+        self.list_validators.put(version, validators)
+        if not_modified(validators):
+            return validators, None
+        return validators, build_sensor_responses(sensors, readings)
+    
+    def iter_sensor_chunks(self) -> Iterator[List[Dict[str, Any]]]:
+        """Получить все сенсоры пачками: каждая пачка читается из БД и дополняется данными отдельно"""
+        for sensors in self.repository.iter_sensors(self.stream_chunk_size):
+            yield self._enrich_sensors(sensors)
+    
+    def get_sensors_page(
+        self,
+        after_id: int = 0,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Получить страницу сенсоров (keyset пагинация по id)
+        
+        Args:
+            after_id: Вернуть сенсоры с id больше указанного
+            limit: Размер страницы
+            fields: Возвращаемые поля (по умолчанию все)
+            
+        Returns:
+            Словарь с сенсорами страницы (items) и курсором следующей страницы (next_cursor)
+        """
+        columns = page_columns(after_id, limit, fields)
+        
+        # Запрашиваем на одну строку больше, чтобы понять, есть ли следующая страница
+        sensors = self.repository.get_sensors_page(after_id, limit + 1, columns)
+        readings = {}
+        if needs_readings(fields):
+            readings = self.get_data_many_from_statemon([sensor.id for sensor in sensors[:limit]])
+        return build_page(sensors, readings, limit, fields)
+    
+    def _enrich_sensors(self, sensors: List[SensorRow]) -> List[Dict[str, Any]]:
+        """Дополнить сенсоры данными из state_monitoring_api"""
+        readings = self.get_data_many_from_statemon([sensor.id for sensor in sensors])
+        return build_sensor_responses(sensors, readings)
     
     def create_sensor(self, data: dict) -> Dict[str, Any]:
         """
@@ -65,44 +242,48 @@ class SensorService:
         Raises:
             ValidationError: При невалидных данных
         """
-        try:
-            # Валидация входных данных
-            sensor_data = SensorCreate(**data)
-        except PydanticValidationError as e:
-            raise ValidationError(f"Invalid input data: {str(e)}")
-        
-        db_data = sensor_data.model_dump(mode='python')
-        now = datetime.now()
-        db_data['last_updated'] = now
-        db_data['created_at'] = now
-        db_data['type'] = str(db_data['type'].value)
-        
+        db_data = prepare_create(data)
         created_sensor = self.repository.create_sensor(db_data)
+        self.location_index.invalidate_location(created_sensor.location)
         
-        data = self.get_data_from_statemon(created_sensor['id'])
-        sensor = SensorResponse(
-            **created_sensor, 
-            value=data.get('value', None), 
-            unit=data.get('unit', None), 
-            status=data.get('status', None)
-        )
-        return sensor.model_dump()
+        data = self.get_data_from_statemon(created_sensor.id)
+        return build_sensor_response(created_sensor, data)
     
     def get_sensor_by_id(self, sensor_id: int) -> Dict[str, Any]:
         """Получить датчик по ID"""
-        if not isinstance(sensor_id, int) or sensor_id <= 0:
-            raise ValidationError("Invalid sensor ID")
+        validate_sensor_id(sensor_id)
+        
+        sensor, data = self._get_sensor_state(sensor_id)
+        return build_sensor_response(sensor, data)
+    
+    def get_sensor_by_id_conditional(
+        self,
+        sensor_id: int,
+        not_modified: Callable[[Validators], bool],
+    ) -> Tuple[Validators, Optional[Dict[str, Any]]]:
+        """
+        Получить датчик по ID для условного GET
+        
+        Returns:
+            Валидаторы и датчик (None, если клиенту достаточно 304 Not Modified)
+        """
+        validate_sensor_id(sensor_id)
         
+        sensor, data = self._get_sensor_state(sensor_id)
+        validators = sensor_validators(sensor, data)
+        if not_modified(validators):
+            return validators, None
+        return validators, build_sensor_response(sensor, data)
+    
+    def _get_sensor_state(self, sensor_id: int) -> Tuple[SensorRow, Dict[str, Any]]:
+        """Строка датчика и его показания"""
+        # Одновременные запросы одного датчика разделяют один запрос в БД и один в state_monitoring_api
+        return self.single_flight.do(('sensor', sensor_id), lambda: self._load_sensor_state(sensor_id))
+    
+    def _load_sensor_state(self, sensor_id: int) -> Tuple[SensorRow, Dict[str, Any]]:
+        """Загрузить строку датчика и его показания"""
         sensor = self.repository.get_sensor_by_id(sensor_id)
-        data = self.get_data_from_statemon(sensor_id)
-
-        sensor = SensorResponse(
-            **sensor, 
-            value=data.get('value', None), 
-            unit=data.get('unit', None), 
-            status=data.get('status', None)
-        )
-        return sensor.model_dump()
+        return sensor, self.get_data_from_statemon(sensor_id)
     
     def update_sensor(self, sensor_id: int, data: dict) -> Dict[str, Any]:
         """
@@ -115,86 +296,116 @@ class SensorService:
         Returns:
             Словарь с обновленным сенсором
         """
-        if not isinstance(sensor_id, int) or sensor_id <= 0:
-            raise ValidationError("Invalid sensor ID")
-        
-        try:
-            sensor_data = SensorUpdate(**data)
-        except PydanticValidationError as e:
-            raise ValidationError(f"Invalid input data: {str(e)}")
-        
-        db_data = {k: v for k, v in sensor_data.model_dump(mode='python').items() if v is not None}
-        
-        if not db_data:
-            raise ValidationError("No fields to update")
-        
-        if 'type' in db_data:
-            db_data['type'] = str(db_data['type'].value)
+        validate_sensor_id(sensor_id)
+        db_data = prepare_update(data)
         
         updated_sensor = self.repository.update_sensor(sensor_id, db_data)
+        self._invalidate_locations([updated_sensor])
         data = self.get_data_from_statemon(sensor_id)
-        sensor = SensorResponse(
-            **updated_sensor, 
-            value=data.get('value', None), 
-            unit=data.get('unit', None), 
-            status=data.get('status', None)
-        )
-        return sensor.model_dump()
+        return build_sensor_response(updated_sensor, data)
     
     def get_sensor_by_location(self, location: str) -> Optional[Dict[str, Any]]:
         """
-        Получить датчик по локации с данными из state_monitoring_api
+        Получить первый датчик локации с данными из state_monitoring_api
         
         Args:
             location: Локация датчика
             
         Returns:
-            Словарь с данными датчика или None если не найден
+            Словарь с данными датчика или None если ответ собрать не удалось
+            
+        Raises:
+            NotFoundError: Если в локации нет датчиков
+        """
+        sensors = self._get_location_sensors(location)
+        data = self.get_data_from_statemon(sensors[0].id)
+        return build_location_response(sensors[0], data, location)
+    
+    def get_sensors_by_location(self, location: str) -> List[Dict[str, Any]]:
+        """
+        Получить все датчики локации с данными из state_monitoring_api
+        
+        Raises:
+            NotFoundError: Если в локации нет датчиков
         """
-        if not location or not isinstance(location, str):
-            raise ValidationError("Invalid location")
+        sensors = self._get_location_sensors(location)
+        readings = self.get_data_many_from_statemon([sensor.id for sensor in sensors])
+        responses = (build_location_response(sensor, readings.get(sensor.id, {}), location) for sensor in sensors)
+        return [response for response in responses if response is not None]
+    
+    def _get_location_sensors(self, location: str) -> List[SensorRow]:
+        """Датчики локации через индекс локаций (без обращения к БД, если локация уже загружена)"""
+        validate_location(location)
         
-        sensor = self.repository.get_sensor_by_location(location)
-        if not sensor:
-            return None
+        sensors = self.location_index.get(
+            location, self.repository.get_sensors_by_location, self.repository.get_sensors_version
+        )
+        if not sensors:
+            raise NotFoundError(f"Sensor with location {location} not found")
+        return sensors
+    
+    def _invalidate_locations(self, sensors: List[SensorRow]) -> None:
+        """Инвалидировать в индексе прежние и новые локации измененных датчиков"""
+        for sensor in sensors:
+            self.location_index.invalidate_sensor(sensor.id)
+            self.location_index.invalidate_location(sensor.location)
+    
+    def delete_sensor(self, sensor_id: int) -> bool:
+        """Удалить датчик"""
+        validate_sensor_id(sensor_id)
         
-        data = self.get_data_from_statemon(sensor['id'])
+        deleted = self.repository.delete_sensor(sensor_id)
+        self.reading_cache.invalidate(sensor_id)
+        self.location_index.invalidate_sensor(sensor_id)
+        return deleted
+    
+    def create_sensors(self, items: list) -> Dict[str, Any]:
+        """
+        Создать несколько датчиков одной транзакцией
         
-        try:
-            description = f"default description"
-            value = data.get('value', None)
-            if value is None:
-                description = f"description for value is None"
-            elif value > 25:
-                description = f"description for value > 25"
-            elif value < 20:
-                description = f"description for value < 20"
-            else:
-                description = f"description for value between 20 and 25"
+        Args:
+            items: Сырые данные датчиков от клиента
             
-            sensor = self.repository.get_sensor_by_location(location)
-
-            logger.error(f"Sensor: {sensor}")
-            logger.error(f"Sensor created_at: {sensor.get('created_at', None)}")
+        Returns:
+            Словарь с созданными датчиками (items) и ошибками валидации по индексам (errors)
+        """
+        db_rows, errors = parse_bulk_create(items)
+        created = self.repository.create_sensors(db_rows) if db_rows else []
+        for sensor in created:
+            self.location_index.invalidate_location(sensor.location)
+        return {"items": self._enrich_sensors(created), "errors": errors}
+    
+    def update_sensors(self, items: list) -> Dict[str, Any]:
+        """
+        Обновить несколько датчиков одной транзакцией
+        
+        Args:
+            items: Сырые данные от клиента, каждый элемент содержит id и обновляемые поля
             
-            sensor_response = SensorByLocationResponse(
-                value=value,
-                unit=data.get('unit', None),
-                status=data.get('status', None),
-                timestamp=sensor.get('created_at', None),
-                description=description,
-                sensor_id=str(sensor.get('id', None)),
-                sensor_type=sensor.get('type', None),
-                location=location,
-            )
-            return sensor_response.model_dump()
-        except Exception as e:
-            logger.error(f"Error creating SensorByLocationResponse for sensor {sensor.get('id')}: {e}")
-            return None
+        Returns:
+            Словарь с обновленными датчиками (items) и ошибками по индексам (errors)
+        """
+        updates, indexes, errors = parse_bulk_update(items)
+        updated = self.repository.update_sensors(updates) if updates else []
+        self._invalidate_locations(updated)
+        errors = add_not_found_errors(indexes, {sensor.id for sensor in updated}, errors)
+        return {"items": self._enrich_sensors(updated), "errors": errors}
     
-    def delete_sensor(self, sensor_id: int) -> bool:
-        """Удалить датчик"""
-        if not isinstance(sensor_id, int) or sensor_id <= 0:
-            raise ValidationError("Invalid sensor ID")
+    def delete_sensors(self, sensor_ids: list) -> Dict[str, Any]:
+        """
+        Удалить несколько датчиков одной транзакцией
+        
+        Args:
+            sensor_ids: ID датчиков
+            
+        Returns:
+            Словарь с удаленными ID (deleted) и ошибками по индексам (errors)
+        """
+        indexes, errors = parse_bulk_delete(sensor_ids)
+        deleted = self.repository.delete_sensors(list(indexes)) if indexes else []
+        for sensor_id in deleted:
+            self.reading_cache.invalidate(sensor_id)
+            self.location_index.invalidate_sensor(sensor_id)
         
-        return self.repository.delete_sensor(sensor_id)
\ No newline at end of file
+        errors = add_not_found_errors(indexes, set(deleted), errors)
+        return {"deleted": sorted(deleted), "errors": errors}
@@ -0,0 +1,82 @@
+"""Объединение одновременных одинаковых запросов (single-flight)"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """Выполняющийся вызов, результат которого ждут остальные"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Пока вызов по ключу выполняется, повторные вызовы с тем же ключом не
+    запускают fn, а ждут и получают тот же результат или то же исключение.
+    Результат не сохраняется: следующий вызов после завершения выполнится заново.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Выполнить fn или присоединиться к уже выполняющемуся вызову с тем же ключом"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    Вариант SingleFlight для корутин одного event loop
+
+    fn выполняется в отдельной задаче, которую все вызывающие, включая первого, ждут
+    через shield: отмена одного из них (отключение клиента, дедлайн) не отменяет вызов
+    и не передается остальным - они получают тот же результат или то же исключение.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Выполнить fn или дождаться уже выполняющегося вызова с тем же ключом"""
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        """Убрать завершенный вызов; следующий вызов с ключом выполнится заново"""
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Если ожидающих не осталось, не выводим предупреждение о непрочитанном исключении
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,36 @@
+"""Память строк get_sensors: SensorRow не должен проигрывать словарям"""
+
+from benchmarks.bench_rows import StubCursor, compare, legacy_row_to_dict, measure_memory, regressions, stub_variants
+from psycopg.rows import tuple_row
+from repositories.queries import SENSOR_COLUMNS
+from repositories.rows import SensorRow, sensor_row
+
+ROWS = 5000
+
+
+def dict_row(cursor):
+    """Словарь колонок без преобразования дат (dict_row psycopg требует настоящий курсор)"""
+    return lambda values: dict(zip(SENSOR_COLUMNS, values))
+
+
+def test_stub_rows_match_legacy_dicts():
+    legacy = [legacy_row_to_dict(row) for row in StubCursor(50, tuple_row).fetchall()]
+    current = StubCursor(50, sensor_row).fetchall()
+    assert all(isinstance(row, SensorRow) for row in current)
+    assert [
+        {**row._asdict(), 'last_updated': row.last_updated.isoformat(), 'created_at': row.created_at.isoformat()}
+        for row in current
+    ] == legacy
+
+
+def test_sensor_row_uses_less_memory_than_legacy_dicts():
+    results = compare(stub_variants(ROWS))
+    assert results["SensorRow"]["rows"] == results["dict rows"]["rows"] == ROWS
+    assert regressions(results) == [], results
+
+
+def test_sensor_row_uses_less_memory_than_plain_dicts():
+    current = measure_memory(lambda: StubCursor(ROWS, sensor_row).fetchall())
+    plain = measure_memory(lambda: StubCursor(ROWS, dict_row).fetchall())
+    assert current["bytes"] < plain["bytes"], (current, plain)
+    assert current["blocks"] < plain["blocks"], (current, plain)
@@ -1,10 +1,13 @@
 use actix_web::{web, Result, HttpResponse};
-use crate::api::dto::sensor_data::{SensorDataDTO, AddSensorDataDTO};
+use crate::api::dto::sensor_data::{SensorDataDTO, AddSensorDataDTO, SensorDataBatchRequestDTO, SensorDataBatchItemDTO};
 use crate::domain::error::{ApiError};
 use crate::domain::services::sensor_data::SensorDataService;
 use crate::domain::repositories::sensor_data::SensorDataQueryParams;
 use log::{info, error};
 
+// Максимальное количество датчиков в одном batch-запросе
+const MAX_BATCH_SIZE: usize = 1000;
+
 
 pub async fn get_sensor_data_handler(
     sensor_data_service: web::Data<dyn SensorDataService>, params: web::Query<SensorDataQueryParams>,
@@ -23,6 +26,31 @@ pub async fn get_sensor_data_handler(
     }
 }
 
+pub async fn get_sensor_data_batch_handler(
+    sensor_data_service: web::Data<dyn SensorDataService>,
+    request: web::Json<SensorDataBatchRequestDTO>,
+) -> Result<web::Json<Vec<SensorDataBatchItemDTO>>, ApiError> {
+    let sensor_ids = request.into_inner().sensor_ids;
+    info!("POST /api/v1/sensor/data/batch - {} sensor_ids", sensor_ids.len());
+    
+    if sensor_ids.len() > MAX_BATCH_SIZE {
+        return Err(ApiError::bad_request(format!(
+            "Too many sensor_ids: {} (max {})", sensor_ids.len(), MAX_BATCH_SIZE
+        )));
+    }
+    
+    match sensor_data_service.get_many(sensor_ids).await {
+        Ok(items) => {
+            info!("Successfully retrieved sensor data for {} sensors", items.len());
+            Ok(web::Json(items.into_iter().map(SensorDataBatchItemDTO::from).collect()))
+        },
+        Err(e) => {
+            error!("Failed to retrieve batch sensor data - error: {:?}", e);
+            Err(ApiError::from(e))
+        }
+    }
+}
+
 pub async fn add_sensor_data_handler(
     sensor_data_service: web::Data<dyn SensorDataService>, 
     params: web::Query<SensorDataQueryParams>,
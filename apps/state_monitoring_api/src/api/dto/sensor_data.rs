@@ -19,6 +19,34 @@ pub struct AddSensorDataDTO {
     pub created_at: String,
 }
 
+#[derive(Debug, Deserialize)]
+pub struct SensorDataBatchRequestDTO {
+    pub sensor_ids: Vec<i32>,
+}
+
+#[derive(Debug, Serialize)]
+pub struct SensorDataBatchItemDTO {
+    pub sensor_id: i32,
+    pub id: i32,
+    pub value: f64,
+    pub unit: String,
+    pub status: String,
+    pub created_at: String,
+}
+
+impl From<(i32, SensorData)> for SensorDataBatchItemDTO {
+    fn from((sensor_id, sensor_data): (i32, SensorData)) -> Self {
+        SensorDataBatchItemDTO {
+            sensor_id,
+            id: sensor_data.id,
+            value: sensor_data.value,
+            unit: sensor_data.unit,
+            status: sensor_data.status,
+            created_at: sensor_data.created_at,
+        }
+    }
+}
+
 impl Into<SensorData> for AddSensorDataDTO {
     fn into(self) -> SensorData {
         SensorData {
@@ -5,7 +5,7 @@ use actix_web::body::MessageBody;
 use actix_web::dev::{ServiceFactory, ServiceRequest, ServiceResponse};
 use actix_web::middleware::Logger;
 use actix_web::error::{JsonPayloadError, QueryPayloadError};
-use crate::api::controllers::sensor_data_handler::{get_sensor_data_handler, add_sensor_data_handler};
+use crate::api::controllers::sensor_data_handler::{get_sensor_data_handler, add_sensor_data_handler, get_sensor_data_batch_handler};
 use crate::container::Container;
 use crate::domain::error::ApiError;
 
@@ -45,5 +45,6 @@ pub fn create_app(container: Arc<Container>) -> App<
             web::scope("/api/v1/sensor")
                 .route("/data", web::get().to(get_sensor_data_handler))
                 .route("/data", web::post().to(add_sensor_data_handler))
+                .route("/data/batch", web::post().to(get_sensor_data_batch_handler))
         )
 }
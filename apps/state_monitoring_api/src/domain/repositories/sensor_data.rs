@@ -11,5 +11,6 @@ pub struct SensorDataQueryParams {
 #[async_trait]
 pub trait SensorDataRepository: Send + Sync {
     async fn get(&self, sensor_id: i32) -> RepositoryResult<SensorData>;
+    async fn get_many(&self, sensor_ids: Vec<i32>) -> RepositoryResult<Vec<(i32, SensorData)>>;
     async fn add(&self, sensor_id: i32, sensor_data: SensorData) -> RepositoryResult<()>;
 }
@@ -6,5 +6,6 @@ use crate::domain::models::sensor_data::{SensorData};
 #[async_trait]
 pub trait SensorDataService: 'static + Sync + Send {
     async fn get(&self, sensor_id: i32) -> Result<SensorData, CommonError>;
+    async fn get_many(&self, sensor_ids: Vec<i32>) -> Result<Vec<(i32, SensorData)>, CommonError>;
     async fn add(&self, sensor_id: i32, sensor_data: SensorData) -> Result<(), CommonError>;
 }
\ No newline at end of file
@@ -97,4 +97,40 @@ impl SensorDataRepository for SensorDataRepositoryImpl {
         
         result
     }
-}
\ No newline at end of file
+
+    async fn get_many(&self, sensor_ids: Vec<i32>) -> RepositoryResult<Vec<(i32, SensorData)>> {
+        debug!("SensorDataRepositoryImpl::get_many - retrieving data for {} sensor_ids", sensor_ids.len());
+        
+        if sensor_ids.is_empty() {
+            return Ok(Vec::new());
+        }
+        
+        use crate::infrastructure::schema::sensor_data::dsl::{sensor_data, sensor_id as sensor_id_col, created_at};
+        
+        let mut conn = match self.pool.get() {
+            Ok(conn) => conn,
+            Err(_) => {
+                error!("SensorDataRepositoryImpl::get_many - failed to get database connection");
+                return Err(DieselRepositoryError::from(diesel::result::Error::BrokenTransactionManager).into_inner());
+            }
+        };
+        
+        // Последнее показание по каждому датчику одним запросом (DISTINCT ON)
+        let rows = run(move || {
+            use crate::infrastructure::schema::sensor_data::dsl::id;
+            sensor_data
+                .filter(sensor_id_col.eq_any(sensor_ids))
+                .distinct_on(sensor_id_col)
+                .order((sensor_id_col, created_at.desc(), id.desc()))
+                .load::<SensorDataDiesel>(&mut conn)
+        })
+            .await
+            .map_err(|v| {
+                error!("SensorDataRepositoryImpl::get_many - database error - error: {:?}", v);
+                DieselRepositoryError::from(v).into_inner()
+            })?;
+        
+        info!("SensorDataRepositoryImpl::get_many - successfully retrieved data for {} sensors", rows.len());
+        Ok(rows.into_iter().map(|v| (v.sensor_id, v.into())).collect())
+    }
+}
@@ -41,6 +41,24 @@ impl SensorDataService for SensorDataServiceImpl {
         }
     }
 
+    async fn get_many(&self, sensor_ids: Vec<i32>) -> Result<Vec<(i32, SensorData)>, CommonError> {
+        debug!("SensorDataService::get_many called for {} sensor_ids", sensor_ids.len());
+        
+        match self.repository.get_many(sensor_ids).await {
+            Ok(data) => {
+                info!("SensorDataService::get_many - successfully retrieved data for {} sensors", data.len());
+                Ok(data)
+            },
+            Err(e) => {
+                error!("SensorDataService::get_many - failed to retrieve data - error: {:?}", e);
+                Err(CommonError {
+                    message: format!("Failed to retrieve sensor data: {}", e.message),
+                    code: 500,
+                })
+            }
+        }
+    }
+
     async fn add(&self, sensor_id: i32, sensor_data: SensorData) -> Result<(), CommonError> {
         debug!("SensorDataService::add called for sensor_id: {}, data: {:?}", sensor_id, sensor_data);
         
@@ -1,8 +1,48 @@
-from flask import Flask
-from controllers.temperature_controller import TemperatureController
+from flask import Flask, request, g
+from controllers.temperature_controller import TemperatureController, DEFAULT_MAX_BATCH_SIZE
 from services.temperature_service import TemperatureService
-from repositories.temperature_repository import RandomTemperatureRepository
+from services.sensor_registry import SensorRegistry
+from repositories.temperature_repository import TemperatureRepository, RandomTemperatureRepository
+from repositories.simulated_repository import SimulatedTemperatureRepository
+from repositories.trace_repository import TraceTemperatureRepository
+from compression import ResponseCompressor
+from metrics import STAGES, REQUESTS
 import os
+import time
+
+
+def create_repository() -> TemperatureRepository:
+    """
+    Источник показаний по TEMPERATURE_SOURCE
+    
+    random - независимое случайное значение на каждый запрос,
+    simulated - модель парка датчиков с состоянием (SIM_* переменные),
+    trace - воспроизведение записанной трассы (TRACE_PATH, REPLAY_SPEED, REPLAY_LOOP, REPLAY_START)
+    """
+    min_temp = float(os.getenv("MIN_TEMP", -20))
+    max_temp = float(os.getenv("MAX_TEMP", 40))
+    source = os.getenv("TEMPERATURE_SOURCE", "random")
+    if source == "simulated":
+        # Общий seed по умолчанию: все воркеры показывают один и тот же парк (пусто - случайный парк у каждого)
+        seed = os.getenv("SIM_SEED", "0")
+        return SimulatedTemperatureRepository(
+            sensors=int(os.getenv("SIM_SENSORS", 1000)),
+            min_temp=min_temp,
+            max_temp=max_temp,
+            seed=int(seed) if seed else None,
+            tick_seconds=float(os.getenv("SIM_TICK_SECONDS", 1.0)),
+            time_scale=float(os.getenv("SIM_TIME_SCALE", 1.0)),
+        )
+    if source == "trace":
+        return TraceTemperatureRepository(
+            os.environ["TRACE_PATH"],
+            speed=float(os.getenv("REPLAY_SPEED", 1.0)),
+            loop=os.getenv("REPLAY_LOOP", "1") in ("1", "true"),
+            start=float(os.environ["REPLAY_START"]) if os.getenv("REPLAY_START") else None,
+        )
+    if source != "random":
+        raise ValueError(f"Unknown TEMPERATURE_SOURCE: {source}")
+    return RandomTemperatureRepository(min_temp=min_temp, max_temp=max_temp)
 
 
 def create_app():
@@ -10,21 +50,60 @@ def create_app():
     app = Flask(__name__)
     
     # Создание экземпляров слоев
-    repository = RandomTemperatureRepository(
-        min_temp=float(os.getenv("MIN_TEMP", -20)), 
-        max_temp=float(os.getenv("MAX_TEMP", 40)),
+    repository = create_repository()
+    # Реестр датчиков: файл или адрес sensors_api (без источника - тестовые датчики)
+    registry = SensorRegistry(
+        source=os.getenv("REGISTRY_SOURCE") or None,
+        reload_seconds=float(os.getenv("REGISTRY_RELOAD_SECONDS", 30)),
+    )
+    service = TemperatureService(repository, registry)
+    controller = TemperatureController(
+        service,
+        max_batch_size=int(os.getenv("BATCH_MAX_SIZE", DEFAULT_MAX_BATCH_SIZE)),
+    )
+    compressor = ResponseCompressor(
+        encodings=[name.strip() for name in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if name.strip()],
+        min_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+        levels={
+            "gzip": int(os.getenv("COMPRESSION_GZIP_LEVEL", 6)),
+            "br": int(os.getenv("COMPRESSION_BR_LEVEL", 4)),
+            "zstd": int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3)),
+        },
     )
-    service = TemperatureService(repository)
-    controller = TemperatureController(service)
+    
+    # Границы корзин гистограмм (секунды через запятую)
+    buckets = [float(bound) for bound in os.getenv("METRICS_BUCKETS", "").split(",") if bound.strip()]
+    if buckets:
+        for family in (STAGES, REQUESTS):
+            family.configure(buckets)
+    
+    # Длительность обработки запросов по маршрутам
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+    
+    # after_request выполняются в обратном порядке регистрации: длительность учитывает сжатие
+    @app.after_request
+    def observe_request(response):
+        REQUESTS.observe(request.endpoint or "unknown", time.perf_counter() - g.request_start)
+        return response
+    
+    # Сжатие ответов по Accept-Encoding
+    @app.after_request
+    def compress_response(response):
+        return compressor.compress_response(response, request.accept_encodings)
     
     # Регистрация маршрутов
     app.add_url_rule('/temperature', 'get_temperature', controller.get_temperature, methods=['GET'])
+    app.add_url_rule('/temperature/batch', 'get_temperature_batch', controller.get_temperature_batch, methods=['GET', 'POST'])
     app.add_url_rule('/temperature/<sensor_id>', 'get_temperature_by_id', controller.get_temperature, methods=['GET'])
     app.add_url_rule('/health', 'health_check', controller.health_check, methods=['GET'])
+    app.add_url_rule('/metrics', 'metrics', controller.metrics, methods=['GET'])
     
     return app
 
 
 if __name__ == '__main__':
+    # Dev-сервер; в контейнере приложение запускается через gunicorn (gunicorn.conf.py)
     app = create_app()
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000, debug=os.getenv("FLASK_DEBUG", "0") == "1")
@@ -0,0 +1,60 @@
+"""
+Пропускная способность /temperature/batch
+
+Сравнивает число показаний в секунду при вызове GET /temperature/<sensor_id> в цикле
+(один запрос - одно показание) и одним запросом GET /temperature/batch на N датчиков.
+Запросы идут через тестовый клиент Flask, то есть с полной обработкой приложением
+(маршрутизация, хуки, кодирование JSON), но без сети. Завершается с ошибкой, если
+пакетный запрос дает меньше показаний в секунду, чем требуется (по умолчанию в 100 раз больше).
+
+Запуск из apps/temperature_api:
+    python -m benchmarks.bench_batch [датчиков] [минимальное ускорение]
+"""
+
+import statistics
+import sys
+import time
+from app import create_app
+
+
+def measure(fn, repeat: int = 5) -> float:
+    """Медиана времени вызова в секундах"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    min_speedup = float(sys.argv[2]) if len(sys.argv) > 2 else 100.0
+    client = create_app().test_client()
+    sensor_ids = [str(sensor_id) for sensor_id in range(1, count + 1)]
+    query = "/temperature/batch?sensor_ids=" + ",".join(sensor_ids)
+
+    def single():
+        # Цикл по датчикам ограничен, чтобы замер не занимал минуты; результат - в показаниях в секунду
+        for sensor_id in sensor_ids[:1000]:
+            response = client.get(f"/temperature/{sensor_id}")
+            assert response.status_code == 200, response.status_code
+
+    def batch():
+        response = client.get(query)
+        assert response.status_code == 200, response.status_code
+
+    assert len(client.get(query).get_json()) == count
+
+    single_rate = min(count, 1000) / measure(single)
+    batch_rate = count / measure(batch)
+    speedup = batch_rate / single_rate
+    print(f"{'single':<10}{single_rate:>14,.0f} readings/s")
+    print(f"{'batch':<10}{batch_rate:>14,.0f} readings/s ({count} sensors per request)")
+    print(f"{'speedup':<10}{speedup:>14.1f}x (required {min_speedup}x)")
+    if speedup < min_speedup:
+        sys.exit("batch endpoint is below the required speedup")
+
+
+if __name__ == '__main__':
+    main()
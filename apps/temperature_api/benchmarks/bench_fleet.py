@@ -0,0 +1,60 @@
+"""
+Масштабирование SimulatedTemperatureRepository
+
+Для модели на N датчиков (по умолчанию 1 млн) измеряет память состояния (tracemalloc
+учитывает массивы NumPy), длительность тика, чтение одного датчика и чтение пакета
+из 10 000 датчиков. Завершается с ошибкой, если память после тиков выросла больше чем на 1 МиБ или тик
+не укладывается в интервал тиков по умолчанию (1 с).
+
+Запуск из apps/temperature_api:
+    python -m benchmarks.bench_fleet [датчиков]
+"""
+
+import statistics
+import sys
+import time
+import tracemalloc
+from repositories.simulated_repository import SimulatedTemperatureRepository
+
+
+def measure(fn, number: int = 1, repeat: int = 5) -> float:
+    """Медиана времени одного вызова в секундах"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings)
+
+
+def main():
+    sensors = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    tracemalloc.start()
+    repository = SimulatedTemperatureRepository(sensors=sensors, seed=1, tick_seconds=0)
+    state = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+
+    tick = measure(repository.tick)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sensor_ids = [str(sensor_id) for sensor_id in range(1, min(sensors, 10000) + 1)]
+    single = measure(lambda: repository.get_temperature("42"), number=100000)
+    batch = measure(lambda: repository.get_temperatures(sensor_ids), number=10)
+
+    print(f"{'sensors':<16}{sensors:>12,}")
+    print(f"{'state':<16}{state / 2**20:>12.1f} MiB")
+    print(f"{'tick peak':<16}{(peak - state) / 2**20:>12.1f} MiB over state")
+    print(f"{'tick':<16}{tick * 1000:>12.1f} ms")
+    print(f"{'read one':<16}{single * 1e9:>12.0f} ns")
+    print(f"{'read batch':<16}{batch * 1000:>12.2f} ms ({len(sensor_ids)} sensors)")
+    # Допуск на служебные объекты (гистограмма тиков и т.п.)
+    if after > state + 2**20:
+        sys.exit("simulation state grows between ticks")
+    if tick > 1.0:
+        sys.exit("tick is longer than the default tick interval")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Открытие и чтение трассы TraceTemperatureRepository
+
+Создает синтетическую трассу заданного размера (или берет существующий файл трассы)
+и измеряет время открытия, чтение одного датчика и чтение пакета из 10 000 датчиков
+(первое чтение - с диска, затем из кэша страниц). Завершается с ошибкой, если открытие
+дольше 10 мс: при открытии трасса не должна читаться.
+
+Запуск из apps/temperature_api:
+    python -m benchmarks.bench_trace [размер синтетической трассы в МиБ | путь к трассе]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+from repositories.trace_repository import RECORD_DTYPE, TraceTemperatureRepository, write_trace
+
+
+def make_trace(path: str, size_mib: int) -> None:
+    """Синтетическая трасса: 10 000 датчиков, показание раз в секунду"""
+    sensors = 10000
+    per_sensor = max(1, size_mib * 2**20 // RECORD_DTYPE.itemsize // sensors)
+    sensor_ids = np.repeat(np.arange(1, sensors + 1, dtype=np.uint32), per_sensor)
+    timestamps = 1_700_000_000_000 + np.tile(np.arange(per_sensor, dtype=np.int64) * 1000, sensors)
+    values = (sensor_ids % 50 + timestamps // 1000 % 10 / 10).astype(np.float32)
+    write_trace(path, sensor_ids, timestamps, values, 1)
+
+
+def measure(fn, number: int, repeat: int = 5) -> float:
+    """Медиана времени одного вызова в секундах"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings)
+
+
+def main():
+    argument = sys.argv[1] if len(sys.argv) > 1 else "256"
+    if os.path.exists(argument):
+        path, cleanup = argument, False
+    else:
+        fd, path = tempfile.mkstemp(suffix=".trace")
+        os.close(fd)
+        cleanup = True
+        make_trace(path, int(argument))
+    try:
+        start = time.perf_counter()
+        repository = TraceTemperatureRepository(path, speed=0.0)
+        opened = time.perf_counter() - start
+
+        sensor_ids = [str(sensor_id) for sensor_id in range(1, 10001)]
+        start = time.perf_counter()
+        repository.get_temperatures(sensor_ids)
+        first = time.perf_counter() - start
+        batch = measure(lambda: repository.get_temperatures(sensor_ids), number=5)
+        single = measure(lambda: repository.get_temperature("42"), number=100000)
+
+        print(f"{'trace':<16}{os.path.getsize(path) / 2**20:>12,.0f} MiB")
+        print(f"{'open':<16}{opened * 1000:>12.2f} ms")
+        print(f"{'first batch':<16}{first * 1000:>12.1f} ms (10000 sensors)")
+        print(f"{'batch':<16}{batch * 1000:>12.1f} ms (10000 sensors)")
+        print(f"{'read one':<16}{single * 1e6:>12.2f} us")
+        if opened > 0.01:
+            sys.exit("opening the trace takes longer than 10 ms")
+    finally:
+        if cleanup:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,138 @@
+from flask import current_app
 from flask import jsonify
 from flask import request
+from flask import Response
 from services.temperature_service import TemperatureService
+from metrics import STAGES, REQUESTS, CONTENT_TYPE, render_metrics
+from json.encoder import encode_basestring_ascii
+from math import isfinite
+from typing import List, Optional, Tuple
+import time
+
+
+# Максимальное число показаний в одном запросе /temperature/batch
+DEFAULT_MAX_BATCH_SIZE = 10000
+
+# Показание пакета в JSON так, как его кодирует jsonify: ключи по алфавиту, компактные разделители
+_READING_TEMPLATE = (
+    '{"description":%s,"location":%s,"sensor_id":%s,"sensor_type":%s,'
+    '"status":%s,"timestamp":%s,"unit":%s,"value":%r}'
+)
 
 
 class TemperatureController:
     """Контроллер для обработки HTTP запросов температуры"""
     
-    def __init__(self, temperature_service: TemperatureService):
+    def __init__(self, temperature_service: TemperatureService, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE):
         self.temperature_service = temperature_service
+        self.max_batch_size = max_batch_size
     
-    def get_temperature(self):
+    def get_temperature(self, sensor_id: Optional[str] = None):
         try:
             location = request.args.get("location", None)
-            sensor_id = request.args.get("sensor_id", None)
+            if sensor_id is None:
+                sensor_id = request.args.get("sensor_id", None)
             result = self.temperature_service.get_temperature(location, sensor_id)
-            return jsonify(result), 200
+            start = time.perf_counter()
+            response = jsonify(result)
+            STAGES.observe("json_encode", time.perf_counter() - start)
+            return response, 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     
+    def get_temperature_batch(self):
+        """
+        GET/POST /temperature/batch - показания для списка датчиков и/или локаций
+        
+        GET: ?sensor_ids=1,2,3&locations=Kitchen,Bedroom (параметры можно повторять).
+        POST: {"sensor_ids": [...], "locations": [...]}.
+        Ответ - список показаний: сначала по sensor_ids, затем по locations.
+        """
+        try:
+            sensor_ids, locations = self._batch_targets()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        try:
+            result = self.temperature_service.get_temperatures(sensor_ids, locations)
+            start = time.perf_counter()
+            body = None if current_app.debug else _encode_readings(result)
+            if body is None:
+                response = jsonify(result)
+            else:
+                response = Response(body, mimetype=current_app.json.mimetype)
+            STAGES.observe("json_encode", time.perf_counter() - start)
+            return response, 200
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    
+    def _batch_targets(self) -> Tuple[List[str], List[str]]:
+        """Списки sensor_ids и locations из строки запроса (GET) или JSON тела (POST)"""
+        if request.method == "POST":
+            body = request.get_json(silent=True)
+            if not isinstance(body, dict):
+                raise ValueError("Request body must be a JSON object")
+            sensor_ids = _json_list(body, "sensor_ids")
+            locations = _json_list(body, "locations")
+        else:
+            sensor_ids = _query_list("sensor_ids")
+            locations = _query_list("locations")
+        
+        if not sensor_ids and not locations:
+            raise ValueError("sensor_ids or locations is required")
+        if len(sensor_ids) + len(locations) > self.max_batch_size:
+            raise ValueError(f"Batch size exceeds limit {self.max_batch_size}")
+        return sensor_ids, locations
+    
     def health_check(self):
         """GET /health - проверка состояния приложения"""
         return jsonify({"status": "healthy"}), 200
+    
+    def metrics(self):
+        """GET /metrics - гистограммы длительности в формате Prometheus"""
+        return Response(render_metrics((STAGES, REQUESTS)), content_type=CONTENT_TYPE), 200
+
+
+def _query_list(name: str) -> List[str]:
+    """Значения параметра строки запроса: через запятую и/или повтором параметра"""
+    return [item for value in request.args.getlist(name) for item in value.split(",") if item]
+
+
+def _json_list(body: dict, name: str) -> List[str]:
+    """Список строк из поля JSON тела (числовые ID приводятся к строке)"""
+    items = body.get(name) or []
+    # bool - подкласс int, но true/false не ID датчика
+    if not isinstance(items, list) or not all(
+        isinstance(item, (str, int)) and not isinstance(item, bool) for item in items
+    ):
+        raise ValueError(f"{name} must be a list of strings")
+    return [str(item) for item in items]
+
+
+def _encode_readings(readings: List[dict]) -> Optional[str]:
+    """
+    JSON списка показаний пакета по шаблону строки
+    
+    Стандартный кодировщик обходит каждый словарь и сортирует ключи; здесь поля
+    подставляются в готовую строку, а результат совпадает с jsonify побайтно.
+    None, если показание не подходит под шаблон (другие поля, значение не конечное
+    число) - тогда ответ кодирует jsonify.
+    """
+    parts = []
+    try:
+        for reading in readings:
+            value = reading["value"]
+            if len(reading) != 8 or type(value) is not float or not isfinite(value):
+                return None
+            parts.append(_READING_TEMPLATE % (
+                encode_basestring_ascii(reading["description"]),
+                encode_basestring_ascii(reading["location"]),
+                encode_basestring_ascii(reading["sensor_id"]),
+                encode_basestring_ascii(reading["sensor_type"]),
+                encode_basestring_ascii(reading["status"]),
+                encode_basestring_ascii(reading["timestamp"]),
+                encode_basestring_ascii(reading["unit"]),
+                value,
+            ))
+    except (KeyError, TypeError):
+        return None
+    return "[" + ",".join(parts) + "]\n"
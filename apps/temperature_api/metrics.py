@@ -0,0 +1,150 @@
+"""Гистограммы длительности этапов обработки запросов и вывод метрик в формате Prometheus"""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Границы корзин в секундах
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (счетчики по корзинам, сумма и количество)"""
+
+    __slots__ = ("buckets", "counts", "total", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # Последняя ячейка - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Добавить наблюдение"""
+        index = bisect_left(self.buckets, value)
+        # acquire/release вдвое дешевле with; между ними нет кода, который может бросить исключение
+        lock = self._lock
+        lock.acquire()
+        self.counts[index] += 1
+        self.total += value
+        lock.release()
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """Накопительные счетчики по корзинам (как le в Prometheus) и сумма"""
+        with self._lock:
+            counts, total = list(self.counts), self.total
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class HistogramFamily:
+    """
+    Гистограммы одной метрики с одной меткой (например, stage)
+
+    Гистограмма для значения метки создается при первом наблюдении.
+    """
+
+    def __init__(self, name: str, help: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, buckets: Sequence[float]) -> None:
+        """Задать границы корзин (накопленные наблюдения сбрасываются)"""
+        with self._lock:
+            self.buckets = tuple(sorted(buckets))
+            self._histograms = {}
+
+    def _histogram(self, value: str) -> Histogram:
+        """Гистограмма для значения метки"""
+        histogram = self._histograms.get(value)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(value, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, value: str, seconds: float) -> None:
+        """Добавить наблюдение для значения метки (то же, что Histogram.observe, без лишнего вызова)"""
+        histogram = self._histograms.get(value) or self._histogram(value)
+        index = bisect_left(histogram.buckets, seconds)
+        lock = histogram._lock
+        lock.acquire()
+        histogram.counts[index] += 1
+        histogram.total += seconds
+        lock.release()
+
+    def timed(self, value: str) -> Callable:
+        """Декоратор, измеряющий длительность вызова функции (в том числе async)"""
+        def decorator(f: Callable) -> Callable:
+            if iscoroutinefunction(f):
+                @wraps(f)
+                async def async_wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await f(*args, **kwargs)
+                    finally:
+                        self.observe(value, time.perf_counter() - start)
+                return async_wrapper
+
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.observe(value, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def render(self) -> Iterable[str]:
+        """Строки в текстовом формате Prometheus"""
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for value, histogram in sorted(self._histograms.items()):
+            cumulative, total = histogram.snapshot()
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(histogram.buckets, cumulative):
+                yield f'{self.name}_bucket{{{label},le="{bound}"}} {count}'
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {cumulative[-1]}'
+            yield f"{self.name}_sum{{{label}}} {total}"
+            yield f"{self.name}_count{{{label}}} {cumulative[-1]}"
+
+
+def _escape(value: str) -> str:
+    """Экранирование значения метки"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_metrics(families: Iterable[HistogramFamily]) -> str:
+    """Тело ответа /metrics"""
+    lines = []
+    for family in families:
+        lines.extend(family.render())
+    return "\n".join(lines) + "\n"
+
+
+# Этапы обработки запроса (у каждого воркера gunicorn - свои гистограммы)
+STAGES = HistogramFamily(
+    "temperature_api_stage_duration_seconds",
+    "Duration of request processing stages",
+    "stage",
+)
+
+# Полная длительность обработки запроса по маршрутам
+REQUESTS = HistogramFamily(
+    "temperature_api_request_duration_seconds",
+    "Duration of request handling by endpoint",
+    "endpoint",
+)
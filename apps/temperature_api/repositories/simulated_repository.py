@@ -0,0 +1,211 @@
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from typing import List, Optional, Sequence
+import numpy as np
+from metrics import STAGES
+from repositories.temperature_repository import TemperatureRepository
+
+
+SECONDS_PER_DAY = 86400.0
+
+
+class SimulatedTemperatureRepository(TemperatureRepository):
+    """
+    Репозиторий с моделью парка датчиков
+    
+    Показания N датчиков хранятся в массивах NumPy и пересчитываются векторными тиками
+    в фоновом потоке. Показание датчика складывается из:
+      - базовой температуры датчика;
+      - суточного цикла (амплитуда и фаза у каждого датчика свои);
+      - медленного дрейфа с возвратом к нулю: случайные опорные значения раз в
+        walk_reversion_seconds модельного времени и плавная интерполяция между ними;
+      - шума измерения, который заново выбирается на каждом тике.
+    Показания меняются плавно от тика к тику и не меняются между тиками.
+    
+    Показания тика зависят только от seed и номера тика, а номер тика - от времени
+    (time.time() / tick_seconds). Поэтому все воркеры gunicorn и перезапущенные воркеры
+    с одним seed показывают для датчика одно и то же значение, а пропущенные тики
+    не нужно досчитывать. Модельное время - tick_seconds * time_scale за тик от начала
+    эпохи Unix (при time_scale=1 суточный цикл идет по UTC).
+    
+    Чтение - поиск по индексу в массиве текущих показаний. Тик считает новые показания
+    в запасной массив и подменяет ссылку, поэтому чтение без блокировок видит показания
+    одного тика. Память постоянна: несколько массивов float32 по N элементов
+    (около 32 МБ на 1 млн датчиков).
+    
+    Датчик "k" (1 <= k <= N) - элемент k-1; остальные ID отображаются на датчики по CRC32.
+    """
+    
+    def __init__(
+        self,
+        sensors: int = 1000,
+        min_temp: float = -20.0,
+        max_temp: float = 40.0,
+        seed: Optional[int] = 0,
+        tick_seconds: float = 1.0,
+        time_scale: float = 1.0,
+        daily_amplitude: float = 3.0,
+        walk_std: float = 2.0,
+        walk_reversion_seconds: float = 3600.0,
+        noise_std: float = 0.2,
+    ):
+        """
+        Args:
+            sensors: Число датчиков
+            min_temp: Нижняя граница показаний
+            max_temp: Верхняя граница показаний
+            seed: Зерно модели (None - случайное, тогда у каждого процесса свой парк)
+            tick_seconds: Интервал тиков в секундах (0 - без фонового потока, тики от нуля через tick())
+            time_scale: Модельных секунд в секунде тика (ускорение суточного цикла)
+            daily_amplitude: Средняя амплитуда суточного цикла
+            walk_std: Стандартное отклонение дрейфа
+            walk_reversion_seconds: Интервал опорных значений дрейфа (модельные секунды)
+            noise_std: Отклонение шума измерения
+        """
+        if sensors < 1:
+            raise ValueError("sensors must be positive")
+        self.sensors = sensors
+        self.min_temp = min_temp
+        self.max_temp = max_temp
+        self.tick_seconds = tick_seconds
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+        self._sim_step = (tick_seconds or 1.0) * time_scale
+        self._noise_std = noise_std
+        self._walk_std = walk_std
+        self._walk_period = walk_reversion_seconds
+        
+        rng = np.random.default_rng([self.seed, 0])
+        span = max_temp - min_temp
+        center = (max_temp + min_temp) / 2
+        # Постоянные параметры датчиков
+        self._base = rng.uniform(center - span / 6, center + span / 6, sensors).astype(np.float32)
+        self._amplitude = (daily_amplitude * rng.uniform(0.5, 1.5, sensors)).astype(np.float32)
+        self._phase = rng.uniform(0.0, 2 * math.pi, sensors).astype(np.float32)
+        # Опорные значения дрейфа по краям текущего интервала и буферы тика
+        self._knot_index: Optional[int] = None
+        self._knot_left = np.empty(sensors, dtype=np.float32)
+        self._knot_right = np.empty(sensors, dtype=np.float32)
+        self._scratch = np.empty(sensors, dtype=np.float32)
+        self._spare = np.empty(sensors, dtype=np.float32)
+        self._current = np.empty(sensors, dtype=np.float32)
+        self._tick_lock = threading.Lock()
+        self.tick_count = self._clock_tick() if tick_seconds > 0 else 0
+        self.sim_time = self.tick_count * self._sim_step
+        self._compute(self._current)
+        
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if tick_seconds > 0:
+            self.start()
+            # После fork (gunicorn с preload) фонового потока в воркере нет
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+    
+    def _clock_tick(self) -> int:
+        """Номер тика по времени (общий для всех процессов)"""
+        return math.floor(time.time() / self.tick_seconds)
+    
+    def _knots(self, index: int, out: np.ndarray) -> None:
+        """Опорные значения дрейфа с номером index в out"""
+        np.random.default_rng([self.seed, 1, index]).standard_normal(dtype=np.float32, out=out)
+        out *= np.float32(self._walk_std)
+    
+    def _compute(self, out: np.ndarray) -> None:
+        """Показания тика tick_count в out: база + суточный цикл + дрейф + шум"""
+        angle = 2 * math.pi * (self.sim_time % SECONDS_PER_DAY) / SECONDS_PER_DAY
+        np.add(self._phase, np.float32(angle), out=out)
+        np.sin(out, out=out)
+        out *= self._amplitude
+        out += self._base
+        
+        # Дрейф: сглаженная интерполяция между опорными значениями соседних интервалов;
+        # деление на норму весов сохраняет отклонение walk_std и в середине интервала
+        position = self.sim_time / self._walk_period
+        index = math.floor(position)
+        if index != self._knot_index:
+            if self._knot_index is not None and index == self._knot_index + 1:
+                self._knot_left, self._knot_right = self._knot_right, self._knot_left
+            else:
+                self._knots(index, self._knot_left)
+            self._knots(index + 1, self._knot_right)
+            self._knot_index = index
+        weight = (1 - math.cos(math.pi * (position - index))) / 2
+        norm = math.sqrt((1 - weight) ** 2 + weight ** 2)
+        np.multiply(self._knot_left, np.float32((1 - weight) / norm), out=self._scratch)
+        out += self._scratch
+        np.multiply(self._knot_right, np.float32(weight / norm), out=self._scratch)
+        out += self._scratch
+        
+        np.random.default_rng([self.seed, 2, self.tick_count]).standard_normal(dtype=np.float32, out=self._scratch)
+        self._scratch *= np.float32(self._noise_std)
+        out += self._scratch
+        np.clip(out, self.min_temp, self.max_temp, out=out)
+    
+    def _advance(self, tick: int) -> None:
+        """Посчитать показания тика tick и подменить текущие"""
+        with self._tick_lock:
+            start = time.perf_counter()
+            self.tick_count = tick
+            self.sim_time = tick * self._sim_step
+            spare = self._spare
+            self._compute(spare)
+            # Подмена ссылки атомарна: читатели видят либо прошлый, либо новый тик
+            self._spare, self._current = self._current, spare
+            STAGES.observe("simulation_tick", time.perf_counter() - start)
+    
+    def tick(self, steps: int = 1) -> None:
+        """Продвинуть модель на steps тиков (промежуточные тики не считаются)"""
+        self._advance(self.tick_count + steps)
+    
+    def start(self) -> None:
+        """Запустить фоновый поток тиков"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="temperature-simulation", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить фоновый поток тиков"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self) -> None:
+        """Тики на границах интервалов по времени; отставший поток сразу переходит к текущему тику"""
+        while not self._stop.wait(max(0.0, (self.tick_count + 1) * self.tick_seconds - time.time())):
+            tick = self._clock_tick()
+            if tick != self.tick_count:
+                self._advance(tick)
+    
+    def _restart_after_fork(self) -> None:
+        """Новые блокировка и фоновый поток в дочернем процессе"""
+        self._tick_lock = threading.Lock()
+        self._stop = threading.Event()
+        if self._thread is not None:
+            self.start()
+    
+    def _index(self, sensor_id: Optional[str]) -> int:
+        """Индекс датчика в массивах"""
+        if sensor_id and sensor_id.isdecimal():
+            number = int(sensor_id)
+            if 1 <= number <= self.sensors:
+                return number - 1
+        return zlib.crc32((sensor_id or "").encode()) % self.sensors
+    
+    def get_random_temperature(self) -> float:
+        """Текущее показание случайного датчика"""
+        return round(float(self._current[random.randrange(self.sensors)]), 1)
+    
+    def get_temperature(self, sensor_id: Optional[str]) -> float:
+        """Текущее показание датчика"""
+        return round(float(self._current[self._index(sensor_id)]), 1)
+    
+    def get_temperatures(self, sensor_ids: Sequence[Optional[str]]) -> List[float]:
+        """Текущие показания датчиков одной выборкой из массива (одного тика для всех)"""
+        current = self._current
+        indexes = np.fromiter(map(self._index, sensor_ids), dtype=np.intp, count=len(sensor_ids))
+        # Округление в float64: у float32 0.1 не представимо и tolist() вернул бы 21.299999237...
+        return np.round(current[indexes].astype(np.float64), 1).tolist()
@@ -1,5 +1,8 @@
 import random
+import threading
 from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+import numpy as np
 
 
 class TemperatureRepository(ABC):
@@ -8,6 +11,18 @@ class TemperatureRepository(ABC):
     @abstractmethod
     def get_random_temperature(self) -> float:
         pass
+    
+    def get_random_temperatures(self, count: int) -> List[float]:
+        """Несколько значений температуры за один вызов (по умолчанию - по одному)"""
+        return [self.get_random_temperature() for _ in range(count)]
+    
+    def get_temperature(self, sensor_id: Optional[str]) -> float:
+        """Показание датчика (по умолчанию - случайное значение, датчики не различаются)"""
+        return self.get_random_temperature()
+    
+    def get_temperatures(self, sensor_ids: Sequence[Optional[str]]) -> List[float]:
+        """Показания датчиков за один вызов (по умолчанию - get_random_temperatures)"""
+        return self.get_random_temperatures(len(sensor_ids))
 
 
 class RandomTemperatureRepository(TemperatureRepository):
@@ -16,7 +31,16 @@ class RandomTemperatureRepository(TemperatureRepository):
     def __init__(self, min_temp: float = -20.0, max_temp: float = 40.0):
         self.min_temp = min_temp
         self.max_temp = max_temp
+        self._rng = np.random.default_rng()
+        # Generator NumPy не потокобезопасен, а воркер gunicorn обслуживает запросы в нескольких потоках
+        self._rng_lock = threading.Lock()
     
     def get_random_temperature(self) -> float:
         """Возвращает случайное значение температуры в заданном диапазоне"""
         return round(random.uniform(self.min_temp, self.max_temp), 1)
+    
+    def get_random_temperatures(self, count: int) -> List[float]:
+        """Возвращает count случайных значений температуры одной векторной выборкой"""
+        with self._rng_lock:
+            values = self._rng.uniform(self.min_temp, self.max_temp, count)
+        return np.round(values, 1).tolist()
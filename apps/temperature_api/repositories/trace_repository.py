@@ -0,0 +1,181 @@
+import mmap
+import os
+import random
+import struct
+import time
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Sequence
+import numpy as np
+from repositories.temperature_repository import TemperatureRepository
+
+
+# Формат файла трассы (little-endian):
+#   заголовок HEADER_SIZE байт - TRACE_HEADER;
+#   индекс: ID датчиков по возрастанию (uint32[sensor_count], дополнено до 8 байт)
+#           и номера первых записей датчиков (uint64[sensor_count + 1], последний - record_count);
+#   записи RECORD_DTYPE, упорядоченные по (sensor_id, timestamp).
+TRACE_MAGIC = b"TEMPTRC\x00"
+TRACE_VERSION = 1
+# magic, version, value_decimals, sensor_count, record_count, min_timestamp, max_timestamp
+TRACE_HEADER = struct.Struct("<8sIIQQqq")
+HEADER_SIZE = 64
+
+# Запись показания: ID датчика, значение, время в миллисекундах Unix
+RECORD_DTYPE = np.dtype([("sensor_id", "<u4"), ("value", "<f4"), ("timestamp", "<i8")])
+
+
+def _index_layout(sensor_count: int):
+    """Смещения массива ID датчиков, массива номеров записей и записей"""
+    ids_offset = HEADER_SIZE
+    starts_offset = ids_offset + (sensor_count * 4 + 7) // 8 * 8
+    records_offset = starts_offset + (sensor_count + 1) * 8
+    return ids_offset, starts_offset, records_offset
+
+
+def write_trace(path: str, sensor_ids: np.ndarray, timestamps: np.ndarray, values: np.ndarray, value_decimals: int) -> int:
+    """
+    Записать трассу в файл
+    
+    Args:
+        path: Путь к файлу трассы
+        sensor_ids: ID датчиков
+        timestamps: Время показаний в миллисекундах Unix
+        values: Значения
+        value_decimals: Знаков после запятой в исходных значениях (значения хранятся в float32
+            и при чтении округляются до этой точности)
+    
+    Returns:
+        Число записей
+    """
+    records = np.empty(len(sensor_ids), dtype=RECORD_DTYPE)
+    records["sensor_id"] = sensor_ids
+    records["value"] = values
+    records["timestamp"] = timestamps
+    records = records[np.lexsort((records["timestamp"], records["sensor_id"]))]
+    
+    ids, first = np.unique(records["sensor_id"], return_index=True)
+    starts = np.append(first, len(records)).astype("<u8")
+    ids_offset, starts_offset, records_offset = _index_layout(len(ids))
+    timestamps = records["timestamp"]
+    header = TRACE_HEADER.pack(
+        TRACE_MAGIC, TRACE_VERSION, value_decimals, len(ids), len(records),
+        int(timestamps.min()) if len(records) else 0,
+        int(timestamps.max()) if len(records) else 0,
+    )
+    with open(path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\x00"))
+        f.write(ids.astype("<u4").tobytes().ljust(starts_offset - ids_offset, b"\x00"))
+        f.write(starts.tobytes())
+        f.write(records.tobytes())
+    return len(records)
+
+
+class TraceTemperatureRepository(TemperatureRepository):
+    """
+    Репозиторий, воспроизводящий записанные показания из файла трассы
+    
+    Файл отображается в память (mmap) целиком, но ничего не читается заранее:
+    индекс датчиков и записи - представления NumPy над отображением, страницы
+    подгружаются ОС при обращении. Открытие трассы любого размера - проверка заголовка.
+    
+    Показание датчика - последняя запись датчика не позже текущего времени воспроизведения
+    (двоичный поиск по ID в индексе и по времени внутри записей датчика, без копирования).
+    Время воспроизведения идет от начала трассы со скоростью speed, начиная с момента start
+    по часам (time.time(), по умолчанию - время изменения файла трассы). Отсчет от общего
+    момента, а не от запуска процесса, поэтому все воркеры gunicorn, в том числе перезапущенные,
+    воспроизводят одно и то же время трассы. По окончании трассы воспроизведение начинается
+    сначала (loop) или останавливается на последних показаниях.
+    Для датчиков, которых нет в трассе или у которых еще нет показаний, возвращается None.
+    """
+    
+    def __init__(self, path: str, speed: float = 1.0, loop: bool = True, start: Optional[float] = None):
+        """
+        Args:
+            path: Путь к файлу трассы (tools/csv_to_trace.py)
+            speed: Скорость воспроизведения (миллисекунд трассы в миллисекунду)
+            loop: Начинать трассу сначала по ее окончании
+            start: Момент начала воспроизведения в секундах Unix (None - время изменения файла)
+        """
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE or not header.startswith(TRACE_MAGIC):
+                raise ValueError(f"Not a temperature trace file: {path}")
+            (_, version, self.value_decimals, sensor_count, record_count,
+             self.min_timestamp, self.max_timestamp) = TRACE_HEADER.unpack_from(header)
+            if version != TRACE_VERSION:
+                raise ValueError(f"Unsupported trace version {version}: {path}")
+            ids_offset, starts_offset, records_offset = _index_layout(sensor_count)
+            size = records_offset + record_count * RECORD_DTYPE.itemsize
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if start is None:
+                start = os.fstat(f.fileno()).st_mtime
+        if len(self._mmap) != size:
+            raise ValueError(f"Trace file size {len(self._mmap)} does not match header ({size}): {path}")
+        if hasattr(mmap, "MADV_RANDOM"):
+            # Чтение - точечные двоичные поиски; упреждающее чтение подняло бы с диска почти всю трассу
+            self._mmap.madvise(mmap.MADV_RANDOM)
+        
+        # Представления над отображением; memoryview вместо массивов NumPy, потому что
+        # элемент memoryview - сразу int/float, а скаляр NumPy в bisect на порядок медленнее
+        records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=record_count, offset=records_offset)
+        self._sensor_ids = memoryview(np.frombuffer(self._mmap, dtype="<u4", count=sensor_count, offset=ids_offset))
+        self._starts = memoryview(np.frombuffer(self._mmap, dtype="<u8", count=sensor_count + 1, offset=starts_offset))
+        self._timestamps = memoryview(records["timestamp"])
+        self._values = memoryview(records["value"])
+        self.loop = loop
+        # (момент по time.time, время трассы в этот момент, скорость) - меняется целиком
+        self._clock = (start, float(self.min_timestamp), speed)
+    
+    @property
+    def speed(self) -> float:
+        """Скорость воспроизведения"""
+        return self._clock[2]
+    
+    def set_speed(self, speed: float) -> None:
+        """Изменить скорость воспроизведения, продолжая с текущего времени трассы (только в этом процессе)"""
+        now = time.time()
+        self._clock = (now, self._position(now), speed)
+    
+    def replay_time(self) -> float:
+        """Текущее время воспроизведения в миллисекундах Unix"""
+        return self._position(time.time())
+    
+    def _position(self, now: float) -> float:
+        """Время воспроизведения в момент now"""
+        started, origin, speed = self._clock
+        # До момента начала воспроизведения - начало трассы
+        position = origin + max(0.0, now - started) * 1000.0 * speed
+        if position <= self.max_timestamp:
+            return position
+        if not self.loop:
+            return float(self.max_timestamp)
+        return self.min_timestamp + (position - self.min_timestamp) % (self.max_timestamp - self.min_timestamp + 1)
+    
+    def _read(self, sensor_id: Optional[str], at: float) -> Optional[float]:
+        """Показание датчика на момент at"""
+        if not sensor_id or not sensor_id.isdecimal():
+            return None
+        number = int(sensor_id)
+        index = bisect_left(self._sensor_ids, number)
+        if index == len(self._sensor_ids) or self._sensor_ids[index] != number:
+            return None
+        first = self._starts[index]
+        position = bisect_right(self._timestamps, at, first, self._starts[index + 1]) - 1
+        if position < first:
+            return None
+        return round(self._values[position], self.value_decimals)
+    
+    def get_random_temperature(self) -> Optional[float]:
+        """Показание случайного датчика трассы на текущий момент воспроизведения"""
+        if not len(self._sensor_ids):
+            return None
+        return self._read(str(self._sensor_ids[random.randrange(len(self._sensor_ids))]), self.replay_time())
+    
+    def get_temperature(self, sensor_id: Optional[str]) -> Optional[float]:
+        """Показание датчика на текущий момент воспроизведения"""
+        return self._read(sensor_id, self.replay_time())
+    
+    def get_temperatures(self, sensor_ids: Sequence[Optional[str]]) -> List[Optional[float]]:
+        """Показания датчиков на один и тот же момент воспроизведения"""
+        at = self.replay_time()
+        return [self._read(sensor_id, at) for sensor_id in sensor_ids]
@@ -0,0 +1,224 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import urllib.parse
+import urllib.request
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Тестовые датчики и их локации (реестр без источника)
+DEFAULT_LOCATIONS = {"1": "Living Room", "2": "Bedroom", "3": "Kitchen"}
+UNKNOWN_LOCATION = "Unknown"
+UNKNOWN_SENSOR_ID = "0"
+
+# Размер страницы при загрузке из sensors_api (MAX_PAGE_SIZE sensors_api)
+PAGE_SIZE = 1000
+
+# Первая пауза перед повтором неудачной начальной загрузки (дальше удваивается до reload_seconds)
+INITIAL_RETRY_SECONDS = 1.0
+
+
+def _id_order(sensor_id: str) -> Tuple[int, int, str]:
+    """Порядок ID: числовые по возрастанию (как ORDER BY id в sensors_api), затем остальные"""
+    if sensor_id.isdecimal():
+        return 0, int(sensor_id), ""
+    return 1, 0, sensor_id
+
+
+class RegistrySnapshot:
+    """
+    Неизменяемый снимок реестра: ID -> локация и локация -> ID датчиков
+    
+    ID датчиков локации упорядочены как в sensors_api, первый - тот, который sensors_api
+    возвращает для локации.
+    """
+    
+    __slots__ = ("locations", "sensors")
+    
+    def __init__(self, locations: Dict[str, str]):
+        self.locations = locations
+        sensors: Dict[str, list] = {}
+        for sensor_id in sorted(locations, key=_id_order):
+            sensors.setdefault(locations[sensor_id], []).append(sensor_id)
+        self.sensors: Dict[str, Tuple[str, ...]] = {location: tuple(ids) for location, ids in sensors.items()}
+    
+    def location(self, sensor_id: Optional[str]) -> str:
+        """Локация датчика"""
+        return self.locations.get(sensor_id, UNKNOWN_LOCATION)
+    
+    def sensor_id(self, location: Optional[str]) -> str:
+        """Первый датчик локации"""
+        ids = self.sensors.get(location)
+        return ids[0] if ids else UNKNOWN_SENSOR_ID
+
+
+def parse_csv(text: str) -> Iterator[Tuple[str, str]]:
+    """Строки sensor_id,location (строка заголовка пропускается)"""
+    for line, row in enumerate(csv.reader(io.StringIO(text)), 1):
+        if not row:
+            continue
+        if len(row) != 2:
+            raise ValueError(f"line {line}: expected sensor_id,location")
+        if line == 1 and row[0].strip() in ("sensor_id", "id"):
+            continue
+        yield row[0].strip(), row[1]
+
+
+def _sensor_pairs(sensors: Iterable[dict]) -> Iterator[Tuple[str, str]]:
+    """Пары (ID, локация) из объектов датчиков sensors_api (датчики без локации пропускаются)"""
+    for sensor in sensors:
+        if sensor.get("location") is not None:
+            yield str(sensor["id"]), sensor["location"]
+
+
+def parse_json(text: str) -> Iterator[Tuple[str, str]]:
+    """Список датчиков sensors_api (GET /api/v1/sensors) или страница {"items": [...]}"""
+    data = json.loads(text)
+    return _sensor_pairs(data["items"] if isinstance(data, dict) else data)
+
+
+def parse_ndjson(text: str) -> Iterator[Tuple[str, str]]:
+    """Датчики sensors_api по одному на строку (GET /api/v1/sensors?stream=1)"""
+    return _sensor_pairs(json.loads(line) for line in text.splitlines() if line.strip())
+
+
+PARSERS = {".csv": parse_csv, ".json": parse_json, ".ndjson": parse_ndjson, ".jsonl": parse_ndjson}
+
+
+def fetch_sensors_api(base_url: str, timeout: float = 10.0) -> Iterator[Tuple[str, str]]:
+    """Пары (ID, локация) всех датчиков sensors_api постранично, только поля id и location"""
+    after_id = 0
+    while True:
+        query = urllib.parse.urlencode({"fields": "id,location", "limit": PAGE_SIZE, "after_id": after_id})
+        with urllib.request.urlopen(f"{base_url.rstrip('/')}/api/v1/sensors?{query}", timeout=timeout) as response:
+            page = json.load(response)
+        yield from _sensor_pairs(page["items"])
+        if page.get("next_cursor") is None:
+            return
+        after_id = page["next_cursor"]
+
+
+class SensorRegistry:
+    """
+    Реестр датчиков: ID -> локация и локация -> ID
+    
+    Источник - файл (.csv с sensor_id,location, выгрузка sensors_api в .json или .ndjson)
+    или адрес sensors_api (http://...), из которого постранично читаются id и location.
+    Без источника используются тестовые датчики DEFAULT_LOCATIONS.
+    
+    Фоновый поток раз в reload_seconds проверяет источник (у файла - время изменения,
+    размер и inode) и строит новый снимок. Снимок подменяется одной ссылкой, поэтому запросы
+    не ждут перезагрузки и видят либо старый, либо новый реестр целиком. Ошибка
+    загрузки оставляет прежний снимок. Пока источник ни разу не загрузился (например,
+    sensors_api еще стартует), загрузка повторяется чаще - с паузой от INITIAL_RETRY_SECONDS,
+    удваивающейся до reload_seconds.
+    """
+    
+    def __init__(self, source: Optional[str] = None, reload_seconds: float = 30.0, timeout: float = 10.0):
+        """
+        Args:
+            source: Путь к файлу или адрес sensors_api (None - тестовые датчики)
+            reload_seconds: Интервал проверки источника (0 - без перезагрузки)
+            timeout: Таймаут запроса к sensors_api в секундах
+        """
+        self.source = source
+        self.reload_seconds = reload_seconds
+        self.timeout = timeout
+        self._signature = None
+        self._loaded = False
+        self._snapshot = RegistrySnapshot(dict(DEFAULT_LOCATIONS) if source is None else {})
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if source is None:
+            return
+        self.reload()
+        if reload_seconds > 0:
+            self.start()
+            # После fork (gunicorn с preload) фонового потока в воркере нет
+            os.register_at_fork(after_in_child=self._restart_after_fork)
+    
+    def snapshot(self) -> RegistrySnapshot:
+        """Текущий снимок (для согласованного разрешения нескольких датчиков)"""
+        return self._snapshot
+    
+    def location(self, sensor_id: Optional[str]) -> str:
+        """Локация датчика ("Unknown", если датчика нет в реестре)"""
+        return self._snapshot.location(sensor_id)
+    
+    def sensor_id(self, location: Optional[str]) -> str:
+        """Первый датчик локации ("0", если в локации нет датчиков)"""
+        return self._snapshot.sensor_id(location)
+    
+    def _is_url(self) -> bool:
+        """Источник - адрес sensors_api"""
+        return self.source.startswith(("http://", "https://"))
+    
+    def _load(self) -> Optional[Dict[str, str]]:
+        """Содержимое источника или None, если файл не изменился с прошлой загрузки"""
+        if self._is_url():
+            return dict(fetch_sensors_api(self.source, self.timeout))
+        stat = os.stat(self.source)
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if signature == self._signature:
+            return None
+        # Запоминается до разбора: испорченный файл не перечитывается, пока его не заменят
+        self._signature = signature
+        parser = PARSERS.get(os.path.splitext(self.source)[1].lower(), parse_csv)
+        with open(self.source, encoding="utf-8") as f:
+            return dict(parser(f.read()))
+    
+    def reload(self) -> bool:
+        """
+        Перечитать источник
+        
+        Returns:
+            Заменен ли снимок
+        """
+        try:
+            locations = self._load()
+        except Exception as e:
+            logger.error("Failed to load sensor registry from %s: %s", self.source, e)
+            return False
+        if locations is not None:
+            self._loaded = True
+        if locations is None or locations == self._snapshot.locations:
+            return False
+        self._snapshot = RegistrySnapshot(locations)
+        logger.info("Sensor registry loaded from %s: %s sensors, %s locations",
+                    self.source, len(locations), len(self._snapshot.sensors))
+        return True
+    
+    def start(self) -> None:
+        """Запустить фоновую перезагрузку"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sensor-registry", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить фоновую перезагрузку"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self) -> None:
+        """Повторы до первой успешной загрузки, затем проверка источника раз в reload_seconds"""
+        delay = min(INITIAL_RETRY_SECONDS, self.reload_seconds)
+        while not self._loaded:
+            if self._stop.wait(delay):
+                return
+            self.reload()
+            delay = min(delay * 2, self.reload_seconds)
+        while not self._stop.wait(self.reload_seconds):
+            self.reload()
+    
+    def _restart_after_fork(self) -> None:
+        """Новый фоновый поток в дочернем процессе"""
+        self._stop = threading.Event()
+        if self._thread is not None:
+            self.start()
@@ -1,37 +1,31 @@
 from repositories.temperature_repository import TemperatureRepository
+from services.sensor_registry import SensorRegistry
+from metrics import STAGES
+from typing import List, Optional, Sequence
+from werkzeug.http import http_date
 import datetime
+import time
 
 
 class TemperatureService:
     """Сервисный слой для работы с температурными данными"""
     
-    def __init__(self, repository: TemperatureRepository):
+    def __init__(self, repository: TemperatureRepository, registry: Optional[SensorRegistry] = None):
         self.repository = repository
+        self.registry = registry or SensorRegistry()
     
     def get_temperature(self, location: str, sensor_id: str) -> dict:
-        temperature = self.repository.get_random_temperature()
-
         # If no location is provided, use a default based on sensor ID
         if location is None or location == "":
-            if sensor_id == "1":
-                location = "Living Room"
-            elif sensor_id == "2":
-                location = "Bedroom"
-            elif sensor_id == "3":
-                location = "Kitchen"
-            else:
-                location = "Unknown"
+            location = self.registry.location(sensor_id)
 
         # If no sensor ID is provided, generate one based on location
         if sensor_id is None or sensor_id == "":
-            if location == "Living Room":
-                sensor_id = "1"
-            elif location == "Bedroom":
-                sensor_id = "2"
-            elif location == "Kitchen":
-                sensor_id = "3"
-            else:    
-                sensor_id = "0"
+            sensor_id = self.registry.sensor_id(location)
+
+        start = time.perf_counter()
+        temperature = self.repository.get_temperature(sensor_id)
+        STAGES.observe("repository", time.perf_counter() - start)
 
         return {
             "value": temperature,
@@ -43,3 +37,37 @@ class TemperatureService:
             "sensor_type": "temperature",
             "description": "test_data"
         }
+    
+    def get_temperatures(self, sensor_ids: Sequence[str], locations: Sequence[str]) -> List[dict]:
+        """
+        Показания для списка датчиков и списка локаций
+        
+        Значения получаются одним вызовом репозитория, ответ собирается за один проход
+        с общей для пакета отметкой времени. Для датчика локация определяется по ID,
+        для локации - ID ее первого датчика, как в get_temperature, по одному снимку реестра.
+        
+        Отметка времени форматируется один раз на пакет так же, как ее кодирует jsonify
+        (HTTP-дата), а ключи идут в порядке сортировки, который jsonify все равно применяет.
+        """
+        registry = self.registry.snapshot()
+        targets = [(sensor_id, registry.location(sensor_id)) for sensor_id in sensor_ids]
+        targets += [(registry.sensor_id(location), location) for location in locations]
+        
+        start = time.perf_counter()
+        values = self.repository.get_temperatures([sensor_id for sensor_id, _ in targets])
+        STAGES.observe("repository", time.perf_counter() - start)
+        
+        timestamp = http_date(datetime.datetime.now())
+        return [
+            {
+                "description": "test_data",
+                "location": location,
+                "sensor_id": sensor_id,
+                "sensor_type": "temperature",
+                "status": "test_data",
+                "timestamp": timestamp,
+                "unit": "celsius",
+                "value": value
+            }
+            for value, (sensor_id, location) in zip(values, targets)
+        ]
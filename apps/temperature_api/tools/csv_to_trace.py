@@ -0,0 +1,95 @@
+"""
+Преобразование CSV трассы показаний в двоичный формат TraceTemperatureRepository
+
+Строки CSV: sensor_id,timestamp,value (строка заголовка пропускается). sensor_id - целое
+число, timestamp - секунды Unix (можно дробные) или дата ISO 8601 (без часового пояса - UTC),
+value - число. Файл читается частями, записи сортируются по датчику и времени в памяти
+(около 16 байт на запись).
+
+Запуск из apps/temperature_api:
+    python -m tools.csv_to_trace readings.csv readings.trace [--decimals N]
+"""
+
+import argparse
+import csv
+import sys
+from datetime import datetime, timezone
+from typing import Iterator, List, Tuple
+import numpy as np
+from repositories.trace_repository import write_trace
+
+# Строк CSV в одной части
+CHUNK_ROWS = 1_000_000
+
+
+def parse_timestamp(value: str) -> int:
+    """Время строки CSV в миллисекундах Unix"""
+    try:
+        return round(float(value) * 1000)
+    except ValueError:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return round(parsed.timestamp() * 1000)
+
+
+def decimals(value: str) -> int:
+    """Знаков после запятой в записи числа"""
+    _, _, fraction = value.partition(".")
+    return len(fraction.rstrip("0"))
+
+
+def read_chunks(path: str) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, int]]:
+    """Части CSV: массивы ID, времени, значений и максимальное число знаков после запятой"""
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        sensor_ids: List[int] = []
+        timestamps: List[int] = []
+        values: List[float] = []
+        precision = 0
+        for line, row in enumerate(reader, 1):
+            if not row:
+                continue
+            if len(row) != 3:
+                raise ValueError(f"{path}:{line}: expected sensor_id,timestamp,value")
+            sensor_id, timestamp, value = (field.strip() for field in row)
+            if line == 1 and not sensor_id.isdecimal():
+                continue
+            try:
+                sensor_ids.append(int(sensor_id))
+                timestamps.append(parse_timestamp(timestamp))
+                values.append(float(value))
+            except ValueError as e:
+                raise ValueError(f"{path}:{line}: {e}") from None
+            precision = max(precision, decimals(value))
+            if len(values) == CHUNK_ROWS:
+                yield np.array(sensor_ids, dtype=np.uint32), np.array(timestamps, dtype=np.int64), np.array(values, dtype=np.float32), precision
+                sensor_ids, timestamps, values = [], [], []
+        if values:
+            yield np.array(sensor_ids, dtype=np.uint32), np.array(timestamps, dtype=np.int64), np.array(values, dtype=np.float32), precision
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a CSV temperature trace to the binary trace format")
+    parser.add_argument("source", help="CSV file: sensor_id,timestamp,value")
+    parser.add_argument("target", help="Binary trace file")
+    parser.add_argument("--decimals", type=int, default=None,
+                        help="Value precision kept on read (default: detected from the CSV)")
+    args = parser.parse_args()
+
+    chunks = list(read_chunks(args.source))
+    if not chunks:
+        sys.exit(f"{args.source}: no readings")
+    sensor_ids, timestamps, values, precisions = zip(*chunks)
+    count = write_trace(
+        args.target,
+        np.concatenate(sensor_ids),
+        np.concatenate(timestamps),
+        np.concatenate(values),
+        args.decimals if args.decimals is not None else max(precisions),
+    )
+    print(f"{args.target}: {count} readings")
+
+
+if __name__ == '__main__':
+    main()
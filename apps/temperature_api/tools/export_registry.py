@@ -0,0 +1,37 @@
+"""
+Выгрузка реестра датчиков из sensors_api в CSV для SensorRegistry
+
+Постранично читает id и location всех датчиков (GET /api/v1/sensors?fields=id,location)
+и записывает строки sensor_id,location. Файл записывается во временный и переименовывается,
+поэтому temperature_api с REGISTRY_SOURCE на этот файл никогда не прочитает его наполовину.
+
+Запуск из apps/temperature_api:
+    python -m tools.export_registry http://localhost:8081 sensors.csv
+"""
+
+import argparse
+import csv
+import os
+from services.sensor_registry import fetch_sensors_api
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export sensor id -> location registry from sensors_api to CSV")
+    parser.add_argument("url", help="sensors_api base URL")
+    parser.add_argument("target", help="CSV file: sensor_id,location")
+    args = parser.parse_args()
+
+    temporary = f"{args.target}.tmp"
+    count = 0
+    with open(temporary, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(("sensor_id", "location"))
+        for sensor_id, location in fetch_sensors_api(args.url):
+            writer.writerow((sensor_id, location))
+            count += 1
+    os.replace(temporary, args.target)
+    print(f"{args.target}: {count} sensors")
+
+
+if __name__ == '__main__':
+    main()